@@ -0,0 +1,18 @@
+"""
+Backend modules the standalone app shares instead of keeping copies.
+
+Only stdlib-only modules of backend/celery_worker are imported from here.
+backend/ is appended (not prepended) to the import path so this package
+keeps precedence over backend/api.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
+
+from celery_worker.analysis_cache import AnalysisCache, analysis_cache_key  # noqa: E402
+from celery_worker.analysis_segments import (  # noqa: E402
+    IncrementalSegmentParser, build_segment_prompt, parse_segments, render_labeled_transcript, segment_prompt_template
+)
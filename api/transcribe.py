@@ -1,12 +1,21 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+import asyncio
 import logging
-import whisper
 import tempfile
 import os
-import requests
+import httpx
 import json
+from typing import Callable, Optional
 from dotenv import load_dotenv
+from .backend_modules import (
+    AnalysisCache, IncrementalSegmentParser, analysis_cache_key, build_segment_prompt, parse_segments,
+    render_labeled_transcript, segment_prompt_template
+)
+from .whisper_models import WHISPER_MODEL_NAME, ModelMemoryError, WhisperModelRegistry
+from .whisper_batching import WhisperBatchScheduler
+from .whisper_chunked import ChunkedTranscriber
+from .whisper_engines import load_audio
 
 # Load environment variables
 load_dotenv()
@@ -18,10 +27,21 @@ logger = logging.getLogger(__name__)
 # Create FastAPI app
 app = FastAPI(title="Comedy Transcription API")
 
-# Load Whisper model
-logger.info("Loading Whisper tiny model...")
-model = whisper.load_model("tiny")
-logger.info("Whisper model loaded successfully")
+# Long files in the default model size are split at pauses and transcribed across a
+# process pool (WHISPER_CHUNK_WORKERS)
+chunked_transcriber = ChunkedTranscriber(WHISPER_MODEL_NAME)
+
+# Whisper models are loaded on demand and kept resident within a memory budget, which
+# also covers the chunk workers' copies of the default model.
+# The default model is loaded in the background after startup, so the port opens
+# immediately; requests that arrive during warm-up wait for the load to finish
+whisper_models = WhisperModelRegistry(worker_copies=chunked_transcriber.model_copies)
+
+# Concurrent uploads are transcribed in shared batches of 30-second windows instead of
+# one model.transcribe per request. Opt-in: batched windows are cut blindly and decoded
+# without timestamps or temperature fallback, trading accuracy for throughput (see .env.example)
+WHISPER_BATCHING = os.getenv("WHISPER_BATCHING", "false").lower() == "true"
+batch_scheduler = WhisperBatchScheduler()
 
 # Load Gemini API key from environment variables
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -29,7 +49,43 @@ if not GEMINI_API_KEY:
     logger.error("GEMINI_API_KEY not found in environment variables!")
     raise ValueError("Please set GEMINI_API_KEY in your .env file")
 # Gemini API endpoint configuration
-GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+GEMINI_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent"
+
+# Analyses run concurrently on one shared keep-alive connection pool; beyond this
+# many in flight, further calls wait for a slot instead of opening more connections
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+
+gemini_http: Optional[httpx.AsyncClient] = None
+gemini_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# "labeled" (default): Gemini echoes the whole labeled transcript; "segments" (opt-in):
+# Gemini returns a short JSON list of segments by character offset and the labeled
+# transcript is rebuilt here
+ANALYSIS_OUTPUT_MODE = os.getenv("ANALYSIS_OUTPUT_MODE", "labeled")
+
+
+def connect_redis():
+    """Shared Redis when REDIS_URL is set and redis is installed; otherwise None"""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return None
+    try:
+        import redis
+        client = redis.from_url(redis_url)
+        client.ping()
+        return client
+    except Exception as e:
+        logger.warning(f"Analysis cache falling back to memory: {e}")
+        return None
+
+
+# Gemini results keyed by transcript, set list, prompt template and model. The backend's
+# cache, under its own key prefix so both apps can share a Redis without counting each
+# other's entries against their LRU cap
+analysis_cache = AnalysisCache(connect_redis(), key_prefix="transcribe_analysis")
 
 # Default prompt template - easily customizable
 DEFAULT_PROMPT_TEMPLATE = """You are a professional comedy show organizer. Analyze this transcript and perform the following tasks:
@@ -74,49 +130,230 @@ def format_transcript_for_display(transcript: str) -> str:
     
     return formatted.strip()
 
-async def analyze_with_gemini(transcript: str, set_list: str = "", custom_prompt: str = ""):
-    """Analyze transcript using Gemini Flash 2.0"""
-    try:
-        # Use custom prompt if provided, otherwise use default
-        prompt_template = custom_prompt if custom_prompt.strip() else DEFAULT_PROMPT_TEMPLATE
-        
-        # Format the prompt
-        set_list_text = set_list if set_list.strip() else "No set list provided."
-        full_prompt = prompt_template.format(set_list_text=set_list_text, transcript=transcript)
-        
-        # Prepare Gemini API request
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": full_prompt
-                }]
-            }]
-        }
-        
-        # Make API call to Gemini
-        response = requests.post(
-            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
-            headers=headers,
-            json=payload,
-            timeout=60
+class GeminiAPIError(Exception):
+    pass
+
+def get_gemini_http() -> httpx.AsyncClient:
+    # Created on first use so it also works where lifespan events do not run (serverless)
+    global gemini_http
+    if gemini_http is None:
+        gemini_http = httpx.AsyncClient(
+            headers={"Content-Type": "application/json"},
+            timeout=httpx.Timeout(GEMINI_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONCURRENCY,
+                max_keepalive_connections=GEMINI_MAX_CONCURRENCY,
+            ),
         )
+    return gemini_http
+
+def timed_segments(whisper_result: dict) -> list:
+    """{"start", "end", "text"} per segment, in seconds, whichever path transcribed the file"""
+    return [
+        {"start": round(segment["start"], 3), "end": round(segment["end"], 3), "text": segment["text"].strip()}
+        for segment in whisper_result.get("segments", [])
+    ]
+
+def transcribe_file(model_size: str, audio_path: str) -> dict:
+    """Blocking: runs in a worker thread, loading the model first if needed"""
+    audio = load_audio(audio_path)
+    if chunked_transcriber.applies_to(model_size, audio):
+        return chunked_transcriber.transcribe(audio)
+    with whisper_models.use(model_size) as engine:
+        # Engines that decode on their own (CTranslate2) are not batched here
+        if WHISPER_BATCHING and engine.batch_model is not None:
+            return batch_scheduler.transcribe(engine.batch_model, model_size, audio)
+        return engine.transcribe(audio)
+
+@app.on_event("startup")
+async def warm_up_whisper():
+    # Not awaited: startup completes (and the port opens) while the model loads.
+    # Where startup events do not run (serverless), the first request loads it.
+    def warm_up():
+        try:
+            with whisper_models.use(WHISPER_MODEL_NAME):
+                pass
+        except Exception as e:
+            logger.error(f"Whisper warm-up failed: {e}")
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+@app.on_event("shutdown")
+async def close_gemini_http():
+    if gemini_http is not None:
+        await gemini_http.aclose()
+
+@app.on_event("shutdown")
+async def stop_chunk_workers():
+    chunked_transcriber.shutdown()
+
+async def stream_gemini(payload: dict, on_text: Callable[[str], None]) -> str:
+    """Server-sent streaming generation, passing each piece of text to on_text as it arrives"""
+    parts = []
+    async with gemini_slots:
+        async with get_gemini_http().stream(
+            "POST", f"{GEMINI_STREAM_URL}?alt=sse&key={GEMINI_API_KEY}", json=payload
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"Gemini API error: {response.status_code} - {body.decode('utf-8', 'replace')}")
+                raise GeminiAPIError(f"API Error: {response.status_code}")
+            
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[len("data:"):])
+                for candidate in chunk.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            parts.append(part["text"])
+                            on_text(part["text"])
+    return "".join(parts)
+
+async def call_gemini(prompt: str, json_output: bool = False, on_text: Optional[Callable[[str], None]] = None) -> str:
+    """Generate text for a prompt; raises GeminiAPIError on non-200 responses. Streams to on_text if given."""
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    if json_output:
+        payload["generationConfig"] = {"responseMimeType": "application/json"}
+    
+    if on_text is not None:
+        return await stream_gemini(payload, on_text)
+    
+    async with gemini_slots:
+        response = await get_gemini_http().post(f"{GEMINI_API_URL}?key={GEMINI_API_KEY}", json=payload)
+    
+    if response.status_code != 200:
+        logger.error(f"Gemini API error: {response.status_code} - {response.text}")
+        raise GeminiAPIError(f"API Error: {response.status_code}")
+    
+    result = response.json()
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+async def analyze_segments(transcript: str, set_list: str, prompt_template: str,
+                           on_delta: Optional[Callable[[str], None]] = None):
+    """Offset-based analysis; None if Gemini's segment list is unusable"""
+    # Segments are rendered into labeled text as soon as each one is complete
+    parser = IncrementalSegmentParser(transcript) if on_delta else None
+    on_text = (lambda text: on_delta(parser.feed(text))) if parser else None
+    response_text = await call_gemini(
+        build_segment_prompt(prompt_template, transcript, set_list), json_output=True, on_text=on_text
+    )
+    try:
+        segments = parse_segments(response_text, transcript)
+    except ValueError as e:
+        logger.warning(f"Unusable Gemini segment output, falling back to labeled transcript: {e}")
+        return None
+    if parser:
+        on_delta(parser.finish())
+    return {
+        "success": True,
+        "analysis": render_labeled_transcript(transcript, segments),
+        "segments": segments,
+    }
+
+async def analyze_with_gemini(transcript: str, set_list: str = "", custom_prompt: str = "", output_mode: str = ANALYSIS_OUTPUT_MODE,
+                              on_delta: Optional[Callable[[str], None]] = None):
+    """
+    Analyze transcript using Gemini Flash 2.0
+    With on_delta, the labeled analysis is passed to it piece by piece as it is generated
+    """
+    try:
+        # Custom prompts are written for the labeled format
+        use_segments = output_mode == "segments" and not custom_prompt.strip()
         
-        if response.status_code == 200:
-            result = response.json()
-            analysis = result["candidates"][0]["content"]["parts"][0]["text"]
-            return {"success": True, "analysis": analysis}
+        # Use custom prompt if provided, otherwise use default
+        if use_segments:
+            prompt_template = segment_prompt_template(set_list)
         else:
-            logger.error(f"Gemini API error: {response.status_code} - {response.text}")
-            return {"success": False, "error": f"API Error: {response.status_code}"}
+            prompt_template = custom_prompt if custom_prompt.strip() else DEFAULT_PROMPT_TEMPLATE
+        
+        cache_key = analysis_cache_key(transcript, set_list, prompt_template, GEMINI_MODEL)
+        # The cache talks to Redis synchronously; keep its round trips off the event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, analysis_cache.get, cache_key)
+        if cached is not None:
+            logger.info("Reusing cached Gemini analysis")
+            return dict(cached, cached=True)
+        
+        analysis_result = await analyze_segments(transcript, set_list, prompt_template, on_delta) if use_segments else None
+        if analysis_result is None:
+            labeled_template = custom_prompt if custom_prompt.strip() else DEFAULT_PROMPT_TEMPLATE
+            
+            # Format the prompt
+            set_list_text = set_list if set_list.strip() else "No set list provided."
+            full_prompt = labeled_template.format(set_list_text=set_list_text, transcript=transcript)
+            # Partial segment output may already have been relayed, so the fallback is not streamed
+            on_text = None if use_segments else on_delta
+            analysis_result = {"success": True, "analysis": await call_gemini(full_prompt, on_text=on_text)}
+        
+        await loop.run_in_executor(None, analysis_cache.put, cache_key, analysis_result)
+        return analysis_result
             
+    except GeminiAPIError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
         logger.error(f"Gemini analysis error: {str(e)}")
         return {"success": False, "error": str(e)}
 
+async def cancel_on_disconnect(request: Request, coro, poll_seconds: float = 0.5):
+    """Await coro, cancelling it if the HTTP client goes away before it finishes"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling Gemini analysis")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def stream_transcription_ndjson(response_data: dict, analysis_args: Optional[dict]):
+    """
+    NDJSON lines: the transcription, then "analysis_delta" lines as the analysis is
+    generated, then the final "analysis" result. Each delta carries its character
+    offset in the partial analysis, so clients apply partial = partial[:offset] + text.
+    Starlette cancels this generator, and so the Gemini call, if the client disconnects.
+    """
+    yield json.dumps(dict(response_data, type="transcription")) + "\n"
+    if analysis_args is None:
+        return
+    
+    deltas = asyncio.Queue()
+    
+    async def run_analysis():
+        try:
+            return await analyze_with_gemini(**analysis_args, on_delta=deltas.put_nowait)
+        finally:
+            deltas.put_nowait(None)
+    
+    task = asyncio.ensure_future(run_analysis())
+    offset = 0
+    try:
+        while True:
+            text = await deltas.get()
+            if text is None:
+                break
+            if text:
+                yield json.dumps({"type": "analysis_delta", "offset": offset, "text": text}) + "\n"
+                offset += len(text)
+        analysis_result = await task
+        logger.info(f"Gemini analysis completed: {analysis_result['success']}")
+        yield json.dumps({"type": "analysis", "analysis": analysis_result}) + "\n"
+    except Exception as e:
+        logger.error(f"Streaming analysis failed: {e}")
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    finally:
+        if not task.done():
+            task.cancel()
+
 # Serve static files
 @app.get("/")
 async def root():
@@ -357,6 +594,7 @@ async def root():
             
             const formData = new FormData();
             formData.append('file', file);
+            formData.append('stream', 'true');
             
             // Add Gemini analysis options if enabled
             const enableGemini = document.getElementById('enableGemini').checked;
@@ -376,21 +614,45 @@ async def root():
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
                 
-                const result = await response.json();
-                
-                // Display transcription
-                resultDiv.className = 'result';
-                resultDiv.innerHTML = `<h3>📝 Transcription</h3><pre>${result.transcription || 'No transcription available'}</pre>`;
+                // One JSON object per line: transcription, analysis deltas, then the final analysis
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffered = '';
+                let partial = '';
                 
-                // Display analysis if available
-                if (result.analysis) {
-                    analysisDiv.style.display = 'block';
-                    if (result.analysis.success) {
-                        analysisContent.innerHTML = `<pre>${result.analysis.analysis}</pre>`;
-                    } else {
-                        analysisContent.innerHTML = `<p class="error">Analysis failed: ${result.analysis.error}</p>`;
+                const handleLine = (line) => {
+                    if (!line.trim()) return;
+                    const message = JSON.parse(line);
+                    if (message.type === 'transcription') {
+                        // Display transcription
+                        resultDiv.className = 'result';
+                        resultDiv.innerHTML = `<h3>📝 Transcription</h3><pre>${message.transcription || 'No transcription available'}</pre>`;
+                    } else if (message.type === 'analysis_delta') {
+                        partial = partial.slice(0, message.offset) + message.text;
+                        analysisDiv.style.display = 'block';
+                        analysisContent.innerHTML = '<pre></pre>';
+                        analysisContent.firstChild.textContent = partial;
+                    } else if (message.type === 'analysis') {
+                        analysisDiv.style.display = 'block';
+                        if (message.analysis.success) {
+                            analysisContent.innerHTML = `<pre>${message.analysis.analysis}</pre>`;
+                        } else {
+                            analysisContent.innerHTML = `<p class="error">Analysis failed: ${message.analysis.error}</p>`;
+                        }
+                    } else if (message.type === 'error') {
+                        throw new Error(message.error);
                     }
+                };
+                
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    buffered += decoder.decode(value, { stream: true });
+                    const lines = buffered.split('\\n');
+                    buffered = lines.pop();
+                    lines.forEach(handleLine);
                 }
+                handleLine(buffered);
                 
             } catch (error) {
                 resultDiv.className = 'result error';
@@ -414,19 +676,49 @@ async def api_status():
     logger.info("API status endpoint accessed")
     return {"message": "Comedy Transcription API", "status": "running"}
 
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the default Whisper model is loaded, 503 while warming up or after a failed load"""
+    models = whisper_models.status()
+    if WHISPER_BATCHING:
+        models["batching"] = batch_scheduler.stats()
+    models["chunk_workers"] = chunked_transcriber.workers if chunked_transcriber.enabled else 0
+    if whisper_models.is_loaded(WHISPER_MODEL_NAME):
+        return {"status": "ready", "models": models}
+    status = "failed" if WHISPER_MODEL_NAME in models["errors"] else "loading"
+    return JSONResponse(status_code=503, content={"status": status, "models": models})
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Gemini analysis cache hit ratio"""
+    return {"analysis": await asyncio.get_running_loop().run_in_executor(None, analysis_cache.stats)}
+
 @app.post("/api/transcribe")
 async def transcribe_audio(
+    request: Request,
     file: UploadFile = File(...),
     enable_analysis: str = Form("false"),
     set_list: str = Form(""),
-    custom_prompt: str = Form("")
+    custom_prompt: str = Form(""),
+    output_mode: str = Form(ANALYSIS_OUTPUT_MODE),
+    stream: str = Form("false"),
+    model_size: str = Form(WHISPER_MODEL_NAME)
 ):
-    """Transcribe audio using OpenAI Whisper and optionally analyze with Gemini Flash 2.0"""
+    """
+    Transcribe audio using OpenAI Whisper and optionally analyze with Gemini Flash 2.0
+    With stream=true the response is NDJSON and the analysis arrives as it is generated
+    """
     logger.info(f"Transcribe endpoint accessed with file: {file.filename}, analysis: {enable_analysis}")
     
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
+    if model_size not in whisper_models.allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model size '{model_size}'. Available: {', '.join(whisper_models.allowed)}"
+        )
+    
     # Check file size (limit to 50MB to prevent memory issues)
     content = await file.read()
     file_size_mb = len(content) / (1024 * 1024)
@@ -449,8 +741,19 @@ async def transcribe_audio(
         
         # Transcribe with Whisper
         try:
-            whisper_result = model.transcribe(temp_file_path)
+            # Off the event loop, so concurrent requests can join the same batches
+            whisper_result = await asyncio.get_running_loop().run_in_executor(
+                None, transcribe_file, model_size, temp_file_path
+            )
             transcript_text = whisper_result["text"].strip()
+        except ModelMemoryError as memory_error:
+            logger.error(f"No room to load Whisper {model_size}: {memory_error}")
+            if os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+            raise HTTPException(
+                status_code=503,
+                detail=f"Not enough memory to load the {model_size} model right now. Please try a smaller model or retry shortly."
+            )
         except Exception as whisper_error:
             logger.error(f"Whisper transcription failed for {file.filename}: {whisper_error}")
             # Clean up temp file
@@ -483,22 +786,42 @@ async def transcribe_audio(
             "filename": file.filename,
             "transcription": formatted_transcript,
             "language": whisper_result["language"],
+            "segments": timed_segments(whisper_result),
+            "model": model_size,
             "success": True
         }
         
+        if stream.lower() == "true":
+            analysis_args = None
+            if enable_analysis.lower() == "true":
+                analysis_args = {
+                    "transcript": transcript_text,
+                    "set_list": set_list,
+                    "custom_prompt": custom_prompt,
+                    "output_mode": output_mode,
+                }
+            return StreamingResponse(
+                stream_transcription_ndjson(response_data, analysis_args),
+                media_type="application/x-ndjson"
+            )
+        
         # Run Gemini analysis if requested
         if enable_analysis.lower() == "true":
             logger.info("Running Gemini analysis...")
-            analysis_result = await analyze_with_gemini(
+            analysis_result = await cancel_on_disconnect(request, analyze_with_gemini(
                 transcript=transcript_text,
                 set_list=set_list,
-                custom_prompt=custom_prompt
-            )
+                custom_prompt=custom_prompt,
+                output_mode=output_mode
+            ))
             response_data["analysis"] = analysis_result
             logger.info(f"Gemini analysis completed: {analysis_result['success']}")
         
         return response_data
         
+    except HTTPException:
+        # Re-raise HTTP exceptions as-is
+        raise
     except Exception as e:
         logger.error(f"Error processing {file.filename}: {str(e)}")
         
@@ -510,8 +833,8 @@ async def transcribe_audio(
 
 @app.get("/api/prompt")
 async def get_default_prompt():
-    """Get the current default prompt template"""
-    return {"prompt": DEFAULT_PROMPT_TEMPLATE}
+    """Get the current default prompt template (used in labeled output mode)"""
+    return {"prompt": DEFAULT_PROMPT_TEMPLATE, "output_mode": ANALYSIS_OUTPUT_MODE}
 
 @app.post("/api/prompt")  
 async def update_default_prompt(new_prompt: str = Form(...)):
@@ -0,0 +1,158 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import List
+
+from .whisper_engines import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Windows from concurrent requests are decoded together, up to this many per batch
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# How long the first window of a batch waits for others to join it
+WHISPER_BATCH_MAX_WAIT_MS = float(os.getenv("WHISPER_BATCH_MAX_WAIT_MS", "50"))
+
+# Whisper's own thresholds for treating a window as silence
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+class _Window:
+    def __init__(self, model_key: str, model, mel):
+        self.model_key = model_key
+        self.model = model
+        self.mel = mel
+        self.future = Future()
+
+
+class WhisperBatchScheduler:
+    """
+    Decodes 30-second mel windows from concurrent requests in padded batches.
+
+    transcribe() splits a file into windows and queues them; one scheduler
+    thread takes the oldest window, waits up to max_wait_ms for more windows
+    of the same model (up to batch_size), runs them through the encoder and
+    decoder together and routes each result back to its request. Windows are
+    decoded independently, without conditioning on the previous window's text.
+    """
+
+    def __init__(self, batch_size: int = WHISPER_BATCH_SIZE, max_wait_ms: float = WHISPER_BATCH_MAX_WAIT_MS):
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        # Windows taken from the queue for another model, decoded in a later batch
+        self._deferred = deque()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._batches = 0
+        self._windows = 0
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+                self._thread.start()
+
+    def transcribe(self, model, model_key: str, audio) -> dict:
+        """
+        Blocking: {"text", "language", "segments"} for a file path or 16 kHz
+        samples, with one segment per non-silent 30-second window (windows are
+        decoded without timestamps). The caller keeps the model acquired until
+        this returns.
+        """
+        import whisper
+
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+        windows = []
+        bounds = []
+        for start in range(0, max(len(audio), 1), whisper.audio.N_SAMPLES):
+            bounds.append((start, min(start + whisper.audio.N_SAMPLES, len(audio))))
+            chunk = whisper.pad_or_trim(audio[start:start + whisper.audio.N_SAMPLES])
+            mel = whisper.log_mel_spectrogram(chunk, n_mels=model.dims.n_mels)
+            windows.append(_Window(model_key, model, mel))
+
+        self._ensure_thread()
+        for window in windows:
+            self._queue.put(window)
+        results = [window.future.result() for window in windows]
+
+        segments = [
+            {"start": start / SAMPLE_RATE, "end": end / SAMPLE_RATE, "text": result.text.strip()}
+            for (start, end), result in zip(bounds, results)
+            if result.text.strip()
+            and not (result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD)
+        ]
+        languages = Counter(result.language for result in results if result.language)
+        return {
+            "text": " ".join(segment["text"] for segment in segments),
+            "language": languages.most_common(1)[0][0] if languages else "unknown",
+            "segments": segments,
+        }
+
+    def _next_window(self, timeout=None):
+        if self._deferred:
+            return self._deferred.popleft()
+        return self._queue.get(timeout=timeout)
+
+    def _collect(self) -> List[_Window]:
+        batch = [self._next_window()]
+        deadline = time.monotonic() + self.max_wait
+        skipped = []
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._deferred and self._queue.empty():
+                break
+            try:
+                window = self._next_window(timeout=max(remaining, 0))
+            except queue.Empty:
+                break
+            if window.model_key == batch[0].model_key:
+                batch.append(window)
+            else:
+                skipped.append(window)
+        # Keep other models' windows in arrival order for the next batches
+        self._deferred.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._decode(batch)
+            except Exception as e:
+                logger.error(f"Whisper batch of {len(batch)} windows failed: {e}")
+                for window in batch:
+                    window.future.set_exception(e)
+                continue
+            for window, result in zip(batch, results):
+                window.future.set_result(result)
+
+    def _decode(self, batch: List[_Window]):
+        import torch
+        import whisper
+
+        model = batch[0].model
+        started = time.monotonic()
+        mels = torch.stack([window.mel for window in batch]).to(model.device)
+        options = whisper.DecodingOptions(fp16=model.device.type != "cpu", without_timestamps=True)
+        with torch.no_grad():
+            results = whisper.decode(model, mels, options)
+        self._batches += 1
+        self._windows += len(batch)
+        logger.info(f"Decoded batch of {len(batch)} windows ({batch[0].model_key}) in {time.monotonic() - started:.2f}s")
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "windows": self._windows,
+            "average_batch_size": round(self._windows / self._batches, 2) if self._batches else 0.0,
+            "queued": self._queue.qsize() + len(self._deferred),
+            "batch_size": self.batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,160 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+from .whisper_engines import SAMPLE_RATE, WHISPER_ENGINE, load_engine
+
+logger = logging.getLogger(__name__)
+
+# Long files are split at pauses and their chunks transcribed in parallel by this many
+# processes, each holding its own copy of the model (so memory grows with the count).
+# 0 or 1 disables chunking
+WHISPER_CHUNK_WORKERS = int(os.getenv("WHISPER_CHUNK_WORKERS", "0"))
+# Files shorter than this are transcribed in one piece
+WHISPER_CHUNK_MIN_SECONDS = float(os.getenv("WHISPER_CHUNK_MIN_SECONDS", "600"))
+# A chunk boundary moves up to this far to land in the quietest stretch nearby
+WHISPER_CHUNK_SEARCH_SECONDS = float(os.getenv("WHISPER_CHUNK_SEARCH_SECONDS", "15"))
+
+# Chunks shorter than this cost more in boundary errors than they gain in parallelism
+MIN_CHUNK_SECONDS = 60
+ENERGY_FRAME_SECONDS = 0.05
+# Energy is averaged over this long, so a cut lands in a pause rather than between syllables
+PAUSE_SECONDS = 0.5
+
+
+def silence_split_points(audio: np.ndarray, chunk_seconds: float,
+                         search_seconds: float = WHISPER_CHUNK_SEARCH_SECONDS) -> List[int]:
+    """Sample offsets roughly every chunk_seconds, each moved to the quietest point within search_seconds"""
+    frame = int(ENERGY_FRAME_SECONDS * SAMPLE_RATE)
+    frame_count = len(audio) // frame
+    if frame_count == 0:
+        return []
+    energy = np.sqrt(np.mean(audio[:frame_count * frame].reshape(frame_count, frame) ** 2, axis=1))
+    window = max(1, int(PAUSE_SECONDS / ENERGY_FRAME_SECONDS))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+
+    chunk_frames = int(chunk_seconds / ENERGY_FRAME_SECONDS)
+    search_frames = int(search_seconds / ENERGY_FRAME_SECONDS)
+    points = []
+    previous = 0
+    # The last chunk is left at least half a chunk long
+    while previous + chunk_frames * 1.5 < frame_count:
+        target = previous + chunk_frames
+        low = max(previous + chunk_frames // 2, target - search_frames)
+        high = min(frame_count, target + search_frames)
+        cut = low + int(np.argmin(smoothed[low:high]))
+        points.append(cut * frame)
+        previous = cut
+    return points
+
+
+# Per-process engine, loaded once by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(engine: str, model_name: str, cpu_threads: int):
+    global _worker_engine
+    _worker_engine = load_engine(model_name, engine, cpu_threads)
+
+
+def _transcribe_chunk(audio: np.ndarray) -> dict:
+    result = _worker_engine.transcribe(audio)
+    return {
+        "text": result["text"],
+        "language": result.get("language"),
+        "segments": [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in result.get("segments", [])
+        ],
+    }
+
+
+class ChunkedTranscriber:
+    """
+    Transcribes one long file across CPU cores.
+
+    The audio is split at pauses into about one chunk per worker, the chunks
+    are transcribed concurrently in a process pool (each process loads its
+    own model and uses its share of the cores), and the segments are merged
+    with timestamps shifted by their chunk's start. Only one model size is
+    chunked, so the pool (and its per-worker copies) is started once and
+    kept; requests for other sizes are transcribed in one piece.
+    """
+
+    def __init__(self, model_name: str, workers: int = WHISPER_CHUNK_WORKERS,
+                 min_seconds: float = WHISPER_CHUNK_MIN_SECONDS, engine: str = WHISPER_ENGINE):
+        self.model_name = model_name
+        self.workers = workers
+        self.min_seconds = min_seconds
+        self.engine = engine
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    @property
+    def model_copies(self) -> int:
+        """Copies of the model the worker processes hold once started"""
+        return self.workers if self.enabled else 0
+
+    def applies_to(self, model_name: str, audio: np.ndarray) -> bool:
+        return self.enabled and model_name == self.model_name and len(audio) / SAMPLE_RATE >= self.min_seconds
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                logger.info(f"Starting {self.workers} chunk workers for Whisper {self.model_name} ({threads} threads each)")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # Forking a process that already holds torch threads can deadlock
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.engine, self.model_name, threads),
+                )
+            return self._pool
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """Blocking: {"text", "language", "segments"} for 16 kHz samples"""
+        duration = len(audio) / SAMPLE_RATE
+        chunk_seconds = max(MIN_CHUNK_SECONDS, duration / self.workers)
+        bounds = [0] + silence_split_points(audio, chunk_seconds) + [len(audio)]
+        chunks = list(zip(bounds, bounds[1:]))
+
+        started = time.monotonic()
+        pool = self._get_pool()
+        futures = [pool.submit(_transcribe_chunk, audio[start:end]) for start, end in chunks]
+        results = [future.result() for future in futures]
+        logger.info(f"Transcribed {duration:.0f}s in {len(chunks)} parallel chunks in {time.monotonic() - started:.1f}s")
+
+        segments = []
+        for (start, _), result in zip(chunks, results):
+            offset = start / SAMPLE_RATE
+            for segment in result["segments"]:
+                segments.append({
+                    "id": len(segments),
+                    "start": round(segment["start"] + offset, 3),
+                    "end": round(segment["end"] + offset, 3),
+                    "text": segment["text"],
+                })
+        languages = Counter(result["language"] for result in results if result["language"])
+        return {
+            "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+            "language": languages.most_common(1)[0][0] if languages else "unknown",
+            "segments": segments,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
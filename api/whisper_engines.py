@@ -0,0 +1,137 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Local inference engine, chosen per deployment:
+#   whisper         stock PyTorch Whisper (fp32 on CPU)
+#   whisper-int8    the same model with its linear layers dynamically quantized to int8
+#   faster-whisper  CTranslate2 (pip install faster-whisper)
+WHISPER_ENGINE = os.getenv("WHISPER_ENGINE", "whisper")
+# CTranslate2 weight type: int8, int8_float32, float32 (float16 needs a GPU)
+FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+# Intra-op threads for CTranslate2; 0 uses every core
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+
+SAMPLE_RATE = 16000
+
+
+class WhisperEngine:
+    """
+    Stock Whisper. Every engine loads one model size and offers
+    transcribe(audio) -> {"text", "language", "segments"} for a file path
+    or 16 kHz float32 samples, segments being {"start", "end", "text"} in
+    seconds. batch_model is the PyTorch model WhisperBatchScheduler can
+    decode with, or None if the engine does its own decoding.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_name: str, cpu_threads: int = WHISPER_CPU_THREADS):
+        self.model_name = model_name
+        self.cpu_threads = cpu_threads
+        self.model = self._load()
+
+    def _set_torch_threads(self):
+        if self.cpu_threads:
+            import torch
+            torch.set_num_threads(self.cpu_threads)
+
+    def _load(self):
+        # Importing whisper pulls in torch, which alone takes seconds
+        import whisper
+        self._set_torch_threads()
+        return whisper.load_model(self.model_name)
+
+    @property
+    def batch_model(self):
+        return self.model
+
+    def transcribe(self, audio) -> dict:
+        return self.model.transcribe(audio)
+
+
+class QuantizedWhisperEngine(WhisperEngine):
+    """Whisper with int8 dynamic quantization of its linear layers (CPU only)"""
+
+    name = "whisper-int8"
+
+    def _load(self):
+        import torch
+        import whisper
+
+        self._set_torch_threads()
+        model = whisper.load_model(self.model_name, device="cpu")
+        replace_linear_subclasses(model)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    @property
+    def batch_model(self):
+        # WhisperBatchScheduler's batched decode is only verified with the fp32 model
+        return None
+
+    def transcribe(self, audio) -> dict:
+        return self.model.transcribe(audio, fp16=False)
+
+
+def replace_linear_subclasses(model):
+    """
+    Swap every nn.Linear subclass for a plain nn.Linear sharing its parameters.
+    quantize_dynamic only converts exact nn.Linear modules, and Whisper's Linear
+    subclass only differs by casting its weights to the input dtype, a no-op in fp32.
+    """
+    import torch
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+
+
+class FasterWhisperEngine(WhisperEngine):
+    """CTranslate2 inference through faster-whisper"""
+
+    name = "faster-whisper"
+
+    def _load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("WHISPER_ENGINE=faster-whisper requires the faster-whisper package")
+        return WhisperModel(
+            self.model_name, device="cpu",
+            compute_type=FASTER_WHISPER_COMPUTE_TYPE, cpu_threads=self.cpu_threads
+        )
+
+    @property
+    def batch_model(self):
+        return None
+
+    def transcribe(self, audio) -> dict:
+        segments, info = self.model.transcribe(audio, beam_size=5)
+        # Segments are generated lazily; decoding happens while they are read
+        segments = [{"start": segment.start, "end": segment.end, "text": segment.text} for segment in segments]
+        text = " ".join(segment["text"].strip() for segment in segments)
+        return {"text": text, "language": info.language, "segments": segments}
+
+
+ENGINES = {engine.name: engine for engine in (WhisperEngine, QuantizedWhisperEngine, FasterWhisperEngine)}
+
+
+def load_engine(model_name: str, engine: str = WHISPER_ENGINE, cpu_threads: int = WHISPER_CPU_THREADS) -> WhisperEngine:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown WHISPER_ENGINE '{engine}'. Available: {', '.join(ENGINES)}")
+    return ENGINES[engine](model_name, cpu_threads)
+
+
+def load_audio(audio_path: str):
+    """16 kHz mono float32 samples, decoded with ffmpeg"""
+    import whisper
+    return whisper.load_audio(audio_path)
+
+
+def audio_duration_seconds(audio_path: str) -> float:
+    return len(load_audio(audio_path)) / SAMPLE_RATE
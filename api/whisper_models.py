@@ -0,0 +1,222 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from .whisper_engines import WHISPER_ENGINE, load_engine
+
+logger = logging.getLogger(__name__)
+
+# Sizes a request may ask for, and the one loaded at startup
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL_NAME", "tiny")
+WHISPER_MODELS = [
+    name.strip() for name in os.getenv("WHISPER_MODELS", "tiny,base,small").split(",") if name.strip()
+]
+# Resident models are evicted (least recently used first) to keep their combined size under this
+WHISPER_RSS_BUDGET_MB = int(os.getenv("WHISPER_RSS_BUDGET_MB", "2048"))
+# Memory left free on the host for uploads, decoding and other processes
+WHISPER_MEMORY_RESERVE_MB = int(os.getenv("WHISPER_MEMORY_RESERVE_MB", "256"))
+
+# Approximate resident size of each fp32 model on CPU, used until a load has been measured
+# (quantized engines need less, which the measurement then reflects)
+MODEL_RSS_ESTIMATES_MB = {
+    "tiny": 150, "tiny.en": 150,
+    "base": 290, "base.en": 290,
+    "small": 950, "small.en": 950,
+    "medium": 3000, "medium.en": 3000,
+    "turbo": 3200,
+    "large": 6000, "large-v1": 6000, "large-v2": 6000, "large-v3": 6000,
+}
+DEFAULT_RSS_ESTIMATE_MB = 1000
+
+
+class ModelMemoryError(Exception):
+    """Raised when a model cannot be loaded within the memory budget"""
+    pass
+
+
+def process_rss_mb() -> float:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class WhisperModelRegistry:
+    """
+    Keeps several Whisper models resident within an RSS budget.
+
+    acquire(name) returns the model (a WhisperEngine for the configured
+    engine), loading it on first use; callers
+    release(name) when done. Before a load, least recently used models that
+    no request is using are evicted until the resident models' sizes plus the
+    new model's fit the budget and the host has that much memory free. The
+    default model is pinned: it is never evicted, so /ready stays true once
+    warm-up has loaded it.
+
+    A model's size is its estimate until it has been loaded once, then the
+    RSS growth measured during that load. The budget is kept from these
+    recorded sizes rather than the live RSS, which the allocator does not
+    always lower after an eviction. worker_copies reserves room for that
+    many copies of the default model held by other processes (the chunk
+    workers), so they are counted against the same budget.
+    """
+
+    def __init__(self, allowed: Optional[List[str]] = None, budget_mb: int = WHISPER_RSS_BUDGET_MB,
+                 reserve_mb: int = WHISPER_MEMORY_RESERVE_MB, loader: Callable[[str], object] = load_engine,
+                 pinned: str = WHISPER_MODEL_NAME, worker_copies: int = 0):
+        self.allowed = list(allowed if allowed is not None else WHISPER_MODELS)
+        if pinned not in self.allowed:
+            self.allowed.append(pinned)
+        self.pinned = pinned
+        self.worker_copies = worker_copies
+        self.budget_mb = budget_mb
+        self.reserve_mb = reserve_mb
+        self.loader = loader
+        self._models = OrderedDict()  # name -> model, least recently used first
+        self._users: Dict[str, int] = {}
+        self._footprints_mb: Dict[str, float] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Loads are serialized so two of them never both fit into the same headroom
+        self._load_lock = threading.Lock()
+
+    def footprint_mb(self, name: str) -> float:
+        return self._footprints_mb.get(name, MODEL_RSS_ESTIMATES_MB.get(name, DEFAULT_RSS_ESTIMATE_MB))
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def resident_mb(self) -> float:
+        """Combined recorded size of the resident models"""
+        with self._lock:
+            return sum(self.footprint_mb(name) for name in self._models)
+
+    def reserved_mb(self) -> float:
+        """Room kept for the worker processes' copies of the default model"""
+        return self.worker_copies * self.footprint_mb(self.pinned)
+
+    def _take(self, name: str):
+        """The resident model, marked in use and most recently used; None if not loaded"""
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                self._models.move_to_end(name)
+                self._users[name] = self._users.get(name, 0) + 1
+            return model
+
+    def acquire(self, name: str):
+        """The model, loaded if needed; blocks while it loads. Pair with release(name)."""
+        if name not in self.allowed:
+            raise ValueError(f"Unknown Whisper model '{name}'. Available: {', '.join(self.allowed)}")
+
+        model = self._take(name)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            # Another request may have loaded it while we waited
+            model = self._take(name)
+            if model is not None:
+                return model
+            self._load(name)
+            return self._take(name)
+
+    def release(self, name: str):
+        with self._lock:
+            if self._users.get(name):
+                self._users[name] -= 1
+
+    @contextmanager
+    def use(self, name: str):
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def _load(self, name: str):
+        needed = self.footprint_mb(name)
+        self._make_room(name, needed)
+
+        logger.info(f"Loading Whisper {name} model (~{needed:.0f}MB)...")
+        rss_before = process_rss_mb()
+        started = time.monotonic()
+        try:
+            model = self.loader(name)
+        except Exception as e:
+            # The next request retries the load
+            self._errors[name] = str(e)
+            raise
+        self._load_seconds[name] = round(time.monotonic() - started, 2)
+        self._errors.pop(name, None)
+
+        measured = process_rss_mb() - rss_before
+        if measured > 0:
+            self._footprints_mb[name] = measured
+        with self._lock:
+            self._models[name] = model
+        logger.info(
+            f"Whisper {name} model loaded in {self._load_seconds[name]}s "
+            f"(+{measured:.0f}MB, process RSS {process_rss_mb():.0f}MB)"
+        )
+
+    def _fits(self, needed: float, freed: float) -> bool:
+        # Host memory is read live, with the evicted models credited since it may not show yet
+        available = psutil.virtual_memory().available / (1024 * 1024) + freed
+        return (
+            self.resident_mb() + self.reserved_mb() + needed <= self.budget_mb
+            and available - needed >= self.reserve_mb
+        )
+
+    def _make_room(self, name: str, needed: float):
+        freed = 0.0
+        while not self._fits(needed, freed):
+            with self._lock:
+                idle = [
+                    resident for resident in self._models
+                    if resident != self.pinned and not self._users.get(resident)
+                ]
+                if not idle:
+                    break
+                evicted = idle[0]
+                del self._models[evicted]
+            freed += self.footprint_mb(evicted)
+            # Dropping the last reference lets torch return the weights' memory
+            gc.collect()
+            logger.info(f"Evicted Whisper {evicted} model to make room for {name} (resident {self.resident_mb():.0f}MB)")
+
+        if not self._fits(needed, freed):
+            message = (
+                f"Not enough memory to load Whisper {name} (~{needed:.0f}MB): resident models "
+                f"{', '.join(self._models) or 'none'} take {self.resident_mb():.0f}MB and chunk workers "
+                f"{self.reserved_mb():.0f}MB of {self.budget_mb}MB budget"
+            )
+            self._errors[name] = message
+            raise ModelMemoryError(message)
+
+    def status(self) -> dict:
+        with self._lock:
+            resident = {
+                name: {
+                    "in_use": self._users.get(name, 0),
+                    "rss_mb": round(self.footprint_mb(name)),
+                    "load_seconds": self._load_seconds.get(name),
+                }
+                for name in self._models
+            }
+        return {
+            "engine": WHISPER_ENGINE,
+            "default": self.pinned,
+            "available": self.allowed,
+            "resident": resident,
+            "errors": dict(self._errors),
+            "resident_mb": round(self.resident_mb()),
+            "reserved_mb": round(self.reserved_mb()),
+            "process_rss_mb": round(process_rss_mb()),
+            "budget_mb": self.budget_mb,
+        }
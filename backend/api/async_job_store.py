@@ -0,0 +1,140 @@
+from typing import Dict, List, Optional
+
+from redis.exceptions import WatchError
+
+from celery_worker import job_records
+from celery_worker.job_index import (
+    DEFAULT_PAGE_SIZE, JOBS_BY_CREATED_KEY, JOBS_BY_UPDATED_KEY, IndexPageScan,
+    decode_ids, expired_job_ids, job_key, merge_page, page_query, queue_exists_checks,
+    queue_unindex_jobs, range_query, stale_jobs_query, status_index_key, timestamp_score
+)
+from celery_worker.job_store import JobStore, normalize_job
+
+from .blocking import run_blocking
+
+
+class AsyncRedisJobStore:
+    """
+    JobStore for async handlers on redis.asyncio. Shares the record layout
+    and index code with the sync RedisJobStore used by the worker; only the
+    round trips are awaited.
+    """
+
+    storage_type = "redis"
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    async def save(self, job: dict):
+        await self.save_many([job])
+
+    async def save_many(self, jobs: List[dict]):
+        pipe = self.redis_client.pipeline()
+        job_records.queue_write_jobs(pipe, [normalize_job(job) for job in jobs])
+        await pipe.execute()
+
+    async def update(self, job_id: str, **fields) -> Optional[dict]:
+        return (await self.update_many({job_id: fields})).get(job_id)
+
+    async def update_many(self, updates: Dict[str, dict]) -> Dict[str, dict]:
+        # Same WATCH/MULTI transaction as job_records.update_jobs_fields
+        updates = job_records.stamp_updates({job_id: normalize_job(fields) for job_id, fields in updates.items()})
+        job_ids = list(updates)
+        async with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    await pipe.watch(*[job_key(job_id) for job_id in job_ids])
+                    read_backs = [await pipe.hmget(job_key(job_id), *job_records.READ_BACK_FIELDS) for job_id in job_ids]
+                    current = job_records.merge_read_backs(updates, read_backs)
+                    if not current:
+                        await pipe.unwatch()
+                        return {}
+                    pipe.multi()
+                    job_records.queue_field_updates(pipe, updates, current)
+                    await pipe.execute()
+                    return current
+                except WatchError:
+                    continue
+
+    async def get(self, job_id: str, include_large: bool = True) -> Optional[dict]:
+        return (await self.get_many([job_id], include_large))[0]
+
+    async def get_many(self, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+        if not job_ids:
+            return []
+        pipe = self.redis_client.pipeline(transaction=False)
+        job_records.queue_read_jobs(pipe, job_ids, include_large)
+        return job_records.parse_read_jobs(job_ids, await pipe.execute(), include_large)
+
+    async def _load_indexed(self, job_ids: List[str], include_large: bool) -> List[dict]:
+        jobs = await self.get_many(job_ids, include_large)
+        missing = [job_id for job_id, job in zip(job_ids, jobs) if job is None]
+        if missing:
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_unindex_jobs(pipe, missing)
+            await pipe.execute()
+        return [job for job in jobs if job is not None]
+
+    async def _page_ids(self, index_key: str, min_score, max_score, cursor, limit: int):
+        scan = IndexPageScan(index_key, min_score, max_score, cursor, limit)
+        while not scan.done:
+            scan.feed(await self.redis_client.zrevrangebyscore(**scan.query()))
+        return scan.results
+
+    async def list(self, statuses=None, created_after=None, created_before=None,
+                   cursor=None, limit=DEFAULT_PAGE_SIZE, include_large=True) -> dict:
+        index_keys, min_score, max_score, limit = page_query(statuses, created_after, created_before, limit)
+        candidates = []
+        for index_key in index_keys:
+            candidates.extend(await self._page_ids(index_key, min_score, max_score, cursor, limit + 1))
+        job_ids, next_cursor = merge_page(candidates, limit)
+        return {"jobs": await self._load_indexed(job_ids, include_large), "next_cursor": next_cursor}
+
+    async def _ids_in_range(self, index_key: str, min_score="-inf", max_score="+inf", limit: Optional[int] = None):
+        return decode_ids(await self.redis_client.zrevrangebyscore(**range_query(index_key, min_score, max_score, limit)))
+
+    async def list_by_status(self, status: str, include_large: bool = False) -> List[dict]:
+        return await self._load_indexed(await self._ids_in_range(status_index_key(status)), include_large)
+
+    async def list_updated_since(self, since, limit: int = 50, include_large: bool = False) -> List[dict]:
+        job_ids = await self._ids_in_range(JOBS_BY_UPDATED_KEY, min_score=timestamp_score(since), limit=limit)
+        return await self._load_indexed(job_ids, include_large)
+
+    async def count(self) -> int:
+        return await self.redis_client.zcard(JOBS_BY_CREATED_KEY)
+
+    async def prune_expired(self, batch_size: int = 1000) -> int:
+        stale = decode_ids(await self.redis_client.zrangebyscore(**stale_jobs_query(batch_size)))
+        if not stale:
+            return 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        queue_exists_checks(pipe, stale)
+        expired = expired_job_ids(stale, await pipe.execute())
+        if expired:
+            pipe = self.redis_client.pipeline(transaction=False)
+            queue_unindex_jobs(pipe, expired)
+            await pipe.execute()
+        return len(expired)
+
+
+class ThreadedJobStore:
+    """Async facade over a sync JobStore (SQLite, memory) using the bounded I/O pool"""
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self.storage_type = store.storage_type
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            return await run_blocking(method, *args, **kwargs)
+
+        return call
+
+
+def create_async_job_store(job_store: JobStore, async_redis_client=None):
+    """The async counterpart of the API's job store"""
+    if job_store.storage_type == "redis" and async_redis_client is not None:
+        return AsyncRedisJobStore(async_redis_client)
+    return ThreadedJobStore(job_store)
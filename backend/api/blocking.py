@@ -0,0 +1,19 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import settings
+
+# Bounded pool for blocking SDK calls (google-cloud-storage, Celery publish, file I/O)
+# so they never run on the event loop and cannot exhaust the default executor
+_executor = ThreadPoolExecutor(max_workers=settings.blocking_io_workers, thread_name_prefix="blocking-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call in the bounded I/O pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_blocking_pool():
+    _executor.shutdown(wait=False)
@@ -33,11 +33,18 @@ class Settings:
         
         # Redis
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.redis_pool_size = int(os.getenv("REDIS_POOL_SIZE", "50"))
+        
+        # Threads for blocking SDK calls (GCS, Celery publish) made from async handlers
+        self.blocking_io_workers = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
         
         # API
         self.api_host = os.getenv("API_HOST", "0.0.0.0")
         self.api_port = int(os.getenv("API_PORT", "8000"))
         
+        # Uploads
+        self.max_upload_mb = int(os.getenv("MAX_UPLOAD_MB", "500"))
+        
         # CORS Configuration
         self.environment = os.getenv("ENVIRONMENT", "development")
         self.cors_origins = self._get_cors_origins()
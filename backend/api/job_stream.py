@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from celery_worker.job_events import (
+    ANALYSIS_DELTA_EVENT, TERMINAL_STATUSES, analysis_partial_key, job_event, job_event_channel
+)
+
+# Re-read the job record this often while waiting, in case a published event was missed
+EVENT_RECHECK_SECONDS = 15
+# Poll interval for the in-memory fallback (no Redis pub/sub)
+MEMORY_POLL_SECONDS = 0.5
+
+
+async def stream_job_events(job_id: str, get_job, async_redis=None):
+    """
+    Yield job event dicts as the job changes, ending after a terminal status.
+    `get_job` is an async callable returning the job record or None.
+
+    With Redis the stream is driven by pub/sub, so changes arrive the moment
+    the worker writes them; without it the job store is polled in-process.
+    Yields None as a keep-alive when nothing changed for a while.
+
+    Partial Gemini output is relayed as "analysis_delta" events while the job
+    is analyzed; a client joining mid-analysis first gets the text so far.
+    """
+    pubsub = None
+    if async_redis is not None:
+        # Subscribe before taking the snapshot so no change can slip in between
+        pubsub = async_redis.pubsub()
+        await pubsub.subscribe(job_event_channel(job_id))
+
+    loop = asyncio.get_running_loop()
+    try:
+        job = await get_job(job_id)
+        if not job:
+            return
+        last_event = job_event(job)
+        last_sent = loop.time()
+        yield last_event
+        if last_event["status"] in TERMINAL_STATUSES:
+            return
+
+        if pubsub is not None and last_event["stage"] == "analyze":
+            partial = await async_redis.get(analysis_partial_key(job_id))
+            if partial:
+                yield {
+                    "type": ANALYSIS_DELTA_EVENT, "job_id": job_id, "offset": 0,
+                    "text": partial.decode("utf-8") if isinstance(partial, bytes) else partial,
+                }
+
+        while True:
+            event = None
+            if pubsub is not None:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=EVENT_RECHECK_SECONDS)
+                if message and message.get("type") == "message":
+                    event = json.loads(message["data"])
+                    if event.get("type") == ANALYSIS_DELTA_EVENT:
+                        last_sent = loop.time()
+                        yield event
+                        continue
+            else:
+                await asyncio.sleep(MEMORY_POLL_SECONDS)
+
+            if event is None:
+                job = await get_job(job_id)
+                if not job:
+                    return
+                event = job_event(job)
+
+            if event == last_event:
+                if loop.time() - last_sent >= EVENT_RECHECK_SECONDS:
+                    last_sent = loop.time()
+                    yield None
+                continue
+
+            last_event = event
+            last_sent = loop.time()
+            yield event
+            if event["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        if pubsub is not None:
+            await pubsub.unsubscribe(job_event_channel(job_id))
+            await pubsub.close()
+
+
+def format_sse(event: dict) -> str:
+    """Encode a job event (or a keep-alive for None) as a Server-Sent Events frame"""
+    if event is None:
+        return ": keep-alive\n\n"
+    name = "analysis" if event.get("type") == ANALYSIS_DELTA_EVENT else "progress"
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
@@ -1,14 +1,34 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, status
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uuid
+import json
 import datetime
-from .models import TranscriptionJobResponse, JobStatusResponse, JobStatus, TranscriptionModel
+from typing import List, Optional
+from .models import (
+    TranscriptionJobResponse, JobStatusResponse, JobStatus, TranscriptionModel,
+    UploadSessionCreateRequest, UploadSessionResponse
+)
 from .config import settings
 from .logging_config import setup_logging, get_logger
+from .storage import open_upload_sink, stream_upload_to_storage, store_by_content_hash, UploadTooLargeError
+from .uploads import ResumableUploadManager, UploadSessionStore, UploadSessionError
+from .job_stream import stream_job_events, format_sse
+from .blocking import run_blocking, shutdown_blocking_pool
+from .async_job_store import create_async_job_store
 import tempfile
 import os
 import redis
+import redis.asyncio as aioredis
 from celery import Celery
+from celery_worker.job_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from celery_worker.job_events import AnalysisDeltaPublisher
+from celery_worker.job_store import create_job_store
+from celery_worker.transcript_cache import TranscriptCache
+from celery_worker.analysis_cache import AnalysisCache
+from celery_worker.single_flight import SingleFlight
+from celery_worker.rate_limiter import RateLimiter
+from celery_worker.whisper_client import WHISPER_MODEL
 
 # Set up logging
 setup_logging(settings.environment)
@@ -61,7 +81,7 @@ except Exception as e:
 
 # Import Celery tasks
 try:
-    from celery_worker.tasks import process_transcription_job
+    from celery_worker.tasks import process_transcription_job, clear_analysis_checkpoints
     CELERY_AVAILABLE = True
     logger.info("Celery tasks imported successfully")
 except Exception as e:
@@ -104,49 +124,43 @@ if GOOGLE_DRIVE_AVAILABLE:
         GOOGLE_DRIVE_AVAILABLE = False
         drive_client = None
 
-# Redis-based job storage for production scalability
-def get_job_from_redis(job_id: str):
-    """Get job data from Redis"""
-    if not redis_client:
-        return None
-    try:
-        job_data = redis_client.get(f"job:{job_id}")
-        if job_data:
-            return json.loads(job_data)
-        return None
-    except Exception as e:
-        logger.error(f"Failed to get job {job_id} from Redis: {e}")
-        return None
+# Job records shared with the Celery worker: Redis in production, SQLite or memory
+# for single-node and development setups (JOB_STORE=redis|sqlite|memory)
+job_store = create_job_store(redis_client)
+logger.info(f"Job store: {job_store.storage_type}")
 
-def save_job_to_redis(job_id: str, job_data: dict):
-    """Save job data to Redis with 1 hour TTL"""
-    if not redis_client:
-        return False
-    try:
-        redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-        return True
-    except Exception as e:
-        logger.error(f"Failed to save job {job_id} to Redis: {e}")
-        return False
+# Handlers talk to Redis through redis.asyncio on one shared, bounded pool; the sync
+# client above is kept for the direct-processing threads and the transcript cache
+async_redis_client = None
+async_pubsub_client = None
+if redis_client:
+    async_redis_client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool.from_url(
+        settings.redis_url, max_connections=settings.redis_pool_size, timeout=10
+    ))
+    # Event streams hold their pub/sub connection for the whole stream, so they
+    # get a separate client and cannot starve the request pool
+    async_pubsub_client = aioredis.from_url(settings.redis_url)
 
-def list_jobs_from_redis():
-    """List all jobs from Redis"""
-    if not redis_client:
-        return []
-    try:
-        job_keys = redis_client.keys("job:*")
-        jobs = []
-        for key in job_keys:
-            job_data = redis_client.get(key)
-            if job_data:
-                jobs.append(json.loads(job_data))
-        return sorted(jobs, key=lambda x: x.get("created_at", ""), reverse=True)
-    except Exception as e:
-        logger.error(f"Failed to list jobs from Redis: {e}")
-        return []
+async_job_store = create_async_job_store(job_store, async_redis_client)
+
+@app.on_event("shutdown")
+async def close_clients():
+    if async_redis_client:
+        await async_redis_client.close()
+        await async_redis_client.connection_pool.disconnect()
+    if async_pubsub_client:
+        await async_pubsub_client.close()
+    shutdown_blocking_pool()
 
-# Fallback in-memory storage for development
-jobs_db = {}
+# (audio hash, Whisper model) -> transcript index shared with the Celery workers
+transcript_cache = TranscriptCache(redis_client)
+# Gemini results by (transcript, set list, prompt, model), shared with the workers
+analysis_cache = AnalysisCache(redis_client)
+# Identical Gemini calls in flight in the API or the workers are made once
+single_flight = SingleFlight(redis_client)
+# Provider quotas are shared with the workers
+openai_rate_limiter = RateLimiter("openai", redis_client)
+gemini_rate_limiter = RateLimiter("gemini", redis_client)
 
 # Local file storage for development
 LOCAL_UPLOAD_DIR = "temp_uploads"
@@ -154,6 +168,24 @@ if not GCS_AVAILABLE:
     os.makedirs(LOCAL_UPLOAD_DIR, exist_ok=True)
     print(f"INFO: Using local file storage: {LOCAL_UPLOAD_DIR}")
 
+ALLOWED_AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.mp4', '.webm'}
+
+# Resumable upload sessions live in Redis when available, otherwise in memory
+upload_manager = ResumableUploadManager(
+    UploadSessionStore(async_redis_client),
+    LOCAL_UPLOAD_DIR,
+    bucket if GCS_AVAILABLE and bucket else None
+)
+
+def validate_audio_filename(filename: str):
+    """Raise a 400 if the filename does not have a supported audio extension"""
+    file_ext = '.' + filename.split('.')[-1].lower()
+    if file_ext not in ALLOWED_AUDIO_EXTENSIONS:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file type. Allowed: {', '.join(ALLOWED_AUDIO_EXTENSIONS)}"
+        )
+
 @app.get("/")
 async def root():
     return {"message": "AI Transcription Service", "status": "running"}
@@ -219,8 +251,15 @@ async def debug_queue():
     """Debug endpoint to check queue status and find stuck jobs"""
     current_time = datetime.datetime.now()
     
-    # Get all jobs from Redis or memory
-    all_jobs = list_jobs_from_redis() if redis_client else list(jobs_db.values())
+    # Only processing jobs and the last hour of updates are needed, both straight from the indexes
+    await async_job_store.prune_expired()
+    total_jobs = await async_job_store.count()
+    all_jobs = await async_job_store.list_by_status("processing")
+    processing_ids = {job.get("job_id") for job in all_jobs}
+    all_jobs += [
+        job for job in await async_job_store.list_updated_since(current_time - datetime.timedelta(hours=1))
+        if job.get("job_id") not in processing_ids
+    ]
     
     stuck_jobs = []
     processing_jobs = []
@@ -262,19 +301,27 @@ async def debug_queue():
             recent_jobs.append(job_info)
     
     return {
-        "total_jobs": len(all_jobs),
+        "total_jobs": total_jobs,
         "stuck_jobs": stuck_jobs,
         "processing_jobs": processing_jobs,
         "recent_jobs": recent_jobs[:10],  # Limit to 10 most recent
-        "storage_type": "redis" if redis_client else "memory",
+        "storage_type": job_store.storage_type,
         "timestamp": current_time.isoformat()
     }
 
+@app.get("/debug/cache")
+async def debug_cache():
+    """Debug endpoint to check transcript and analysis cache savings"""
+    return {
+        "transcripts": await run_blocking(transcript_cache.stats),
+        "analyses": await run_blocking(analysis_cache.stats),
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
 @app.post("/debug/reset-job/{job_id}")
 async def reset_stuck_job(job_id: str):
     """Reset a stuck job back to queued status"""
-    # Get job from Redis or memory
-    job = get_job_from_redis(job_id) if redis_client else jobs_db.get(job_id)
+    job = await async_job_store.get(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -289,10 +336,7 @@ async def reset_stuck_job(job_id: str):
     })
     
     # Save back to storage
-    if redis_client:
-        save_job_to_redis(job_id, job)
-    else:
-        jobs_db[job_id] = job
+    await async_job_store.save(job)
     
     # Restart processing
     file_path = job.get("file_key", job.get("file_path", ""))
@@ -300,13 +344,28 @@ async def reset_stuck_job(job_id: str):
     set_list = job.get("set_list", "")
     custom_prompt = job.get("custom_prompt", "")
     
-    # Restart direct processing
-    import threading
-    threading.Thread(
-        target=process_transcription_direct,
-        args=(job_id, file_path, model, set_list, custom_prompt),
-        daemon=True
-    ).start()
+    if CELERY_AVAILABLE and job.get("storage_type") == "gcs":
+        # The pipeline resumes after the last checkpointed stage; the analysis is always redone
+        if redis_client:
+            await run_blocking(clear_analysis_checkpoints, redis_client, job_id)
+        await run_blocking(
+            process_transcription_job.delay,
+            job_id=job_id,
+            gcs_file_path=file_path,
+            filename=job.get("filename", ""),
+            model=model.value,
+            set_list=set_list,
+            custom_prompt=custom_prompt,
+            audio_sha256=job.get("audio_sha256")
+        )
+    else:
+        # Restart direct processing
+        import threading
+        threading.Thread(
+            target=process_transcription_direct,
+            args=(job_id, file_path, model, set_list, custom_prompt),
+            daemon=True
+        ).start()
     
     return {
         "message": f"Job {job_id} has been reset and restarted",
@@ -318,44 +377,80 @@ async def reset_stuck_job(job_id: str):
 async def cleanup_old_jobs():
     """Clean up old completed/failed jobs (older than 1 hour)"""
     current_time = datetime.datetime.now()
-    cleanup_count = 0
-    
-    if redis_client:
-        # For Redis, jobs auto-expire after 1 hour, but we can list what's there
-        all_jobs = list_jobs_from_redis()
-        return {
-            "message": "Redis jobs auto-expire after 1 hour",
-            "current_jobs": len(all_jobs),
-            "timestamp": current_time.isoformat()
-        }
+    
+    # Jobs expire after JOB_TTL_SECONDS in every store; drop what has expired
+    cleanup_count = await async_job_store.prune_expired()
+    return {
+        "message": f"Cleaned up {cleanup_count} expired jobs",
+        "remaining_jobs": await async_job_store.count(),
+        "timestamp": current_time.isoformat()
+    }
+
+async def enqueue_transcription_job(job_id: str, filename: str, stored: dict, model: str, set_list: str = "", custom_prompt: str = ""):
+    """
+    Create the job record for a stored upload and hand it to Celery or direct processing.
+    `stored` is the result of streaming the upload into storage.
+    """
+    file_path = stored["path"]
+    file_storage_type = stored["storage_type"]
+    
+    # Create job record
+    job_data = {
+        "job_id": job_id,
+        "status": "queued",
+        "filename": filename,
+        "file_key": file_path,
+        "storage_type": file_storage_type,
+        "size_bytes": stored["size"],
+        "audio_sha256": stored["sha256"],
+        "model": model,
+        "set_list": set_list,
+        "custom_prompt": custom_prompt,
+        "created_at": datetime.datetime.now().isoformat(),
+        "updated_at": datetime.datetime.now().isoformat(),
+        "progress": 0,
+        "message": "Job queued",
+        "result": None,
+        "error": None
+    }
+    
+    await async_job_store.save(job_data)
+    
+    # Queue job for processing with Celery
+    if CELERY_AVAILABLE and file_storage_type == "gcs":
+        # Production: Use Celery with GCS (publishing to the broker blocks, so keep it off the loop)
+        task = await run_blocking(
+            process_transcription_job.delay,
+            job_id=job_id,
+            gcs_file_path=file_path,
+            filename=filename,
+            model=model,
+            set_list=set_list,
+            custom_prompt=custom_prompt,
+            audio_sha256=stored["sha256"]
+        )
+        message = "Transcription job queued for processing"
+        logger.info(f"Job {job_id} queued with Celery task {task.id}")
     else:
-        # For memory storage, manually clean up old jobs
-        jobs_to_remove = []
-        for job_id, job in jobs_db.items():
-            if job.get("status") in ["completed", "failed"]:
-                completed_at = job.get("completed_at")
-                if completed_at:
-                    try:
-                        completion_time = datetime.datetime.fromisoformat(completed_at)
-                        hours_since_completion = (current_time - completion_time).total_seconds() / 3600
-                        if hours_since_completion > 1:
-                            jobs_to_remove.append(job_id)
-                    except:
-                        pass
-        
-        # Remove old jobs
-        for job_id in jobs_to_remove:
-            del jobs_db[job_id]
-            cleanup_count += 1
-        
-        return {
-            "message": f"Cleaned up {cleanup_count} old jobs",
-            "remaining_jobs": len(jobs_db),
-            "timestamp": current_time.isoformat()
-        }
+        # Development fallback: Direct processing
+        import threading
+        threading.Thread(
+            target=process_transcription_direct,
+            args=(job_id, file_path, model, set_list, custom_prompt),
+            daemon=True
+        ).start()
+        message = "Transcription started (development mode)"
+        logger.info(f"Job {job_id} started with direct processing")
+    
+    return TranscriptionJobResponse(
+        job_id=job_id,
+        status=JobStatus.QUEUED,
+        message=message
+    )
 
 @app.post("/v1/transcripts", status_code=status.HTTP_202_ACCEPTED, response_model=TranscriptionJobResponse)
 async def create_transcription_job(
+    request: Request,
     file: UploadFile = File(...),
     model: str = "openai-whisper",
     set_list: str = "",
@@ -382,12 +477,15 @@ async def create_transcription_job(
         raise HTTPException(status_code=400, detail="No file provided")
     
     # Validate file type
-    allowed_extensions = {'.mp3', '.wav', '.m4a', '.flac', '.mp4', '.webm'}
-    file_ext = '.' + file.filename.split('.')[-1].lower()
-    if file_ext not in allowed_extensions:
+    validate_audio_filename(file.filename)
+    
+    # Reject obviously oversized requests before copying any bytes
+    max_upload_bytes = settings.max_upload_mb * 1024 * 1024
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_upload_bytes:
         raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file type. Allowed: {', '.join(allowed_extensions)}"
+            status_code=413,
+            detail=f"File too large. Maximum upload size is {settings.max_upload_mb}MB"
         )
     
     # Generate unique job ID and file key
@@ -395,87 +493,37 @@ async def create_transcription_job(
     file_key = f"uploads/{job_id}-{file.filename}"
     
     try:
-        # Read file contents
-        contents = await file.read()
-        file_storage_type = None
-        
         # Declare globals for modification
         global GOOGLE_DRIVE_AVAILABLE, GCS_AVAILABLE
         
-        # Upload to Google Cloud Storage (production-first approach)
+        # Stream the upload to Google Cloud Storage (production-first approach)
+        # or to local disk, in bounded chunks
         if GCS_AVAILABLE and bucket:
-            try:
-                blob = bucket.blob(file_key)
-                blob.upload_from_string(contents, content_type=file.content_type or 'application/octet-stream')
-                file_path = file_key  # GCS path
-                file_storage_type = "gcs"
-                logger.info(f"File uploaded to GCS: gs://{bucket_name}/{file_key}")
-            except Exception as e:
-                logger.error(f"GCS upload failed: {e}")
-                raise HTTPException(status_code=500, detail=f"File storage failed: {str(e)}")
+            sink = await run_blocking(open_upload_sink, file_key, bucket, file.content_type)
         else:
             # Fallback for development
-            os.makedirs(LOCAL_UPLOAD_DIR, exist_ok=True)
-            file_path = os.path.join(LOCAL_UPLOAD_DIR, f"{job_id}-{file.filename}")
-            with open(file_path, "wb") as f:
-                f.write(contents)
-            file_storage_type = "local"
-            logger.info(f"File saved locally: {file_path}")
+            sink = await run_blocking(open_upload_sink, os.path.join(LOCAL_UPLOAD_DIR, f"{job_id}-{file.filename}"))
         
-        # Create job record
-        job_data = {
-            "job_id": job_id,
-            "status": "queued",
-            "filename": file.filename,
-            "file_key": file_key if file_storage_type == "gcs" else file_path,
-            "storage_type": file_storage_type,
-            "model": model,
-            "set_list": set_list,
-            "custom_prompt": custom_prompt,
-            "created_at": datetime.datetime.now().isoformat(),
-            "updated_at": datetime.datetime.now().isoformat(),
-            "progress": 0,
-            "message": "Job queued",
-            "result": None,
-            "error": None
-        }
+        try:
+            stored = await stream_upload_to_storage(file, sink, max_upload_bytes)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            logger.error(f"File storage failed: {e}")
+            raise HTTPException(status_code=500, detail=f"File storage failed: {str(e)}")
         
-        # Save job to Redis (or fallback to memory)
-        if redis_client:
-            save_job_to_redis(job_id, job_data)
+        file_path = stored["path"]
+        file_storage_type = stored["storage_type"]
+        if file_storage_type == "gcs":
+            logger.info(f"File uploaded to GCS: gs://{bucket_name}/{file_key} ({stored['size']} bytes)")
         else:
-            jobs_db[job_id] = job_data
+            logger.info(f"File saved locally: {file_path} ({stored['size']} bytes)")
         
-        # Queue job for processing with Celery
-        if CELERY_AVAILABLE and file_storage_type == "gcs":
-            # Production: Use Celery with GCS
-            task = process_transcription_job.delay(
-                job_id=job_id,
-                gcs_file_path=file_key,
-                filename=file.filename,
-                model=model,
-                set_list=set_list,
-                custom_prompt=custom_prompt
-            )
-            message = "Transcription job queued for processing"
-            logger.info(f"Job {job_id} queued with Celery task {task.id}")
-        else:
-            # Development fallback: Direct processing
-            import threading
-            threading.Thread(
-                target=process_transcription_direct,
-                args=(job_id, file_path, model, set_list, custom_prompt),
-                daemon=True
-            ).start()
-            message = "Transcription started (development mode)"
-            logger.info(f"Job {job_id} started with direct processing")
-        
-        return TranscriptionJobResponse(
-            job_id=job_id,
-            status=JobStatus.QUEUED,
-            message=message
-        )
+        stored = await run_blocking(store_by_content_hash, stored, file.filename, bucket, LOCAL_UPLOAD_DIR)
+        return await enqueue_transcription_job(job_id, file.filename, stored, model, set_list, custom_prompt)
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         error_msg = f"Failed to process upload: {str(e)}"
@@ -488,13 +536,121 @@ async def create_transcription_job(
             detail=error_msg
         )
 
+def _upload_session_response(session: dict) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=session["upload_id"],
+        filename=session["filename"],
+        offset=session["offset"],
+        total_size=session["total_size"],
+        status=session["status"],
+        job_id=session.get("job_id")
+    )
+
+def _upload_session_error(e: UploadSessionError) -> HTTPException:
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@app.post("/v1/uploads", status_code=status.HTTP_201_CREATED, response_model=UploadSessionResponse)
+async def create_upload_session(request: UploadSessionCreateRequest):
+    """
+    Start a resumable upload. Send the file with PUT /v1/uploads/{upload_id}
+    chunks, then finalize it with POST /v1/uploads/{upload_id}/complete
+    """
+    validate_audio_filename(request.filename)
+    if request.total_size is not None and request.total_size > settings.max_upload_mb * 1024 * 1024:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum upload size is {settings.max_upload_mb}MB"
+        )
+    
+    session = await upload_manager.create_session(request.filename, request.content_type, request.total_size)
+    return _upload_session_response(session)
+
+@app.get("/v1/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(upload_id: str):
+    """
+    Get the committed offset of a resumable upload - resume by sending bytes from here
+    """
+    try:
+        return _upload_session_response(await upload_manager.get_session(upload_id))
+    except UploadSessionError as e:
+        raise _upload_session_error(e)
+
+@app.put("/v1/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(upload_id: str, request: Request):
+    """
+    Append a byte range to a resumable upload.
+    The raw octet-stream body must start at the committed offset and be
+    described by a 'Content-Range: bytes start-end/total' header.
+    """
+    try:
+        session = await upload_manager.write_chunk(
+            upload_id,
+            request.headers.get("content-range"),
+            request.stream(),
+            settings.max_upload_mb * 1024 * 1024
+        )
+    except UploadSessionError as e:
+        raise _upload_session_error(e)
+    
+    return _upload_session_response(session)
+
+@app.post("/v1/uploads/{upload_id}/complete", status_code=status.HTTP_202_ACCEPTED, response_model=TranscriptionJobResponse)
+async def complete_upload(
+    upload_id: str,
+    model: str = "openai-whisper",
+    set_list: str = "",
+    custom_prompt: str = ""
+):
+    """
+    Assemble a finished resumable upload and create its transcription job
+    """
+    try:
+        TranscriptionModel(model)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid model: {model}. Valid models: {[m.value for m in TranscriptionModel]}")
+    
+    try:
+        # Held until the session is marked completed, so concurrent finalizes create one job
+        async with upload_manager.locked(upload_id):
+            session = await upload_manager.get_session(upload_id)
+        
+            # Finalizing twice (e.g. the client retried after a dropped response) returns the same job
+            if session["status"] == "completed":
+                return TranscriptionJobResponse(
+                    job_id=session["job_id"],
+                    status=JobStatus.QUEUED,
+                    message="Upload already finalized"
+                )
+        
+            job_id = str(uuid.uuid4())
+            filename = session["filename"]
+            if upload_manager.storage_type == "gcs":
+                destination = f"uploads/{job_id}-{filename}"
+            else:
+                destination = os.path.join(LOCAL_UPLOAD_DIR, f"{job_id}-{filename}")
+        
+            stored = await upload_manager.finalize(upload_id, destination)
+            logger.info(f"Resumable upload {upload_id} assembled at {stored['path']} ({stored['size']} bytes)")
+            stored = await run_blocking(store_by_content_hash, stored, filename, upload_manager.bucket, LOCAL_UPLOAD_DIR)
+        
+            response = await enqueue_transcription_job(job_id, filename, stored, model, set_list, custom_prompt)
+            await upload_manager.mark_completed(upload_id, job_id)
+            return response
+        
+    except UploadSessionError as e:
+        raise _upload_session_error(e)
+    except Exception as e:
+        error_msg = f"Failed to finalize upload: {str(e)}"
+        logger.error(f"Upload {upload_id} finalize error: {error_msg}")
+        raise HTTPException(status_code=500, detail=error_msg)
+
 @app.get("/v1/transcripts/{job_id}", response_model=JobStatusResponse)
 async def get_transcription_status(job_id: str):
     """
     Get transcription job status and result
     """
-    # Try Redis first, fallback to in-memory
-    job = get_job_from_redis(job_id) if redis_client else jobs_db.get(job_id)
+    job = await async_job_store.get(job_id)
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -508,14 +664,65 @@ async def get_transcription_status(job_id: str):
         completed_at=job.get("completed_at")
     )
 
+async def get_job(job_id: str):
+    """Current job record without transcript and analysis"""
+    return await async_job_store.get(job_id, include_large=False)
+
+@app.get("/v1/transcripts/{job_id}/events")
+async def stream_transcription_events(job_id: str):
+    """
+    Server-Sent Events stream of job progress, message and stage changes.
+    The stream ends after the job completes or fails; fetch the result with
+    GET /v1/transcripts/{job_id}. Polling that endpoint remains supported.
+    """
+    if not await get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        async for event in stream_job_events(job_id, get_job, async_pubsub_client):
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/v1/transcripts/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """
+    WebSocket variant of the job event stream
+    """
+    await websocket.accept()
+    if not await get_job(job_id):
+        await websocket.close(code=4404, reason="Job not found")
+        return
+    
+    try:
+        async for event in stream_job_events(job_id, get_job, async_pubsub_client):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/v1/jobs")
-async def list_jobs():
+async def list_jobs(
+    status: Optional[List[str]] = Query(None, description="Only jobs with these statuses"),
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     """
-    List all transcription jobs
+    List transcription jobs, newest first.
+    Pass the returned next_cursor back as `cursor` to get the following page.
     """
-    # Try Redis first, fallback to in-memory
-    jobs = list_jobs_from_redis() if redis_client else list(jobs_db.values())
-    return {"jobs": jobs}
+    statuses = [s.strip() for value in status or [] for s in value.split(",") if s.strip()] or None
+    try:
+        return await async_job_store.list(statuses, created_after, created_before, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 from pydantic import BaseModel
 
@@ -531,11 +738,10 @@ async def run_gemini_analysis(request: GeminiAnalysisRequest):
     """
     print(f"BACKEND: Running Gemini analysis for job {request.job_id}")
     
-    if request.job_id not in jobs_db:
+    job = await async_job_store.get(request.job_id)
+    if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs_db[request.job_id]
-    
     if job["status"] != JobStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Job must be completed to run analysis")
     
@@ -546,16 +752,21 @@ async def run_gemini_analysis(request: GeminiAnalysisRequest):
     
     try:
         from celery_worker.gemini_client import GeminiClient
-        gemini_client = GeminiClient(api_key=settings.gemini_api_key)
+        gemini_client = GeminiClient(
+            api_key=settings.gemini_api_key, cache=analysis_cache,
+            single_flight=single_flight, rate_limiter=gemini_rate_limiter
+        )
         
         print(f"BACKEND: Analyzing transcript ({len(transcript)} chars)")
         print(f"BACKEND: Set list: {len(request.set_list)} chars")
         print(f"BACKEND: Custom prompt: {len(request.custom_prompt)} chars")
         
-        analysis_result = gemini_client.analyze_transcript(transcript, request.set_list, request.custom_prompt)
+        analysis_result = await run_blocking(
+            gemini_client.analyze_transcript, transcript, request.set_list, request.custom_prompt
+        )
         
         # Store analysis result in job
-        jobs_db[request.job_id]["analysis"] = analysis_result
+        await async_job_store.update(request.job_id, analysis=analysis_result)
         
         print(f"SUCCESS: Gemini analysis completed for job {request.job_id}")
         return analysis_result
@@ -571,12 +782,12 @@ def get_file_for_transcription(job_id: str):
     Get file content for transcription based on storage type
     Returns: (file_path, cleanup_function)
     """
-    if job_id not in jobs_db:
+    job = job_store.get(job_id, include_large=False)
+    if not job:
         raise ValueError(f"Job {job_id} not found")
     
-    job = jobs_db[job_id]
     storage_type = job.get("storage_type", "local")
-    file_path = job["file_path"]
+    file_path = job.get("file_key", job.get("file_path"))
     
     if storage_type == "google_drive":
         # Download from Google Drive to temp file
@@ -622,15 +833,29 @@ def get_file_for_transcription(job_id: str):
             pass
         return file_path, no_cleanup
 
+def get_cached_transcript(job_id: str):
+    """Look up an existing Whisper transcript for the job's audio content"""
+    audio_hash = job_store.get(job_id, include_large=False).get("audio_sha256")
+    if not audio_hash:
+        return None
+    return transcript_cache.get(audio_hash, WHISPER_MODEL)
+
+def transcode_for_whisper(job_id: str, local_file_path: str) -> str:
+    """Transcode the job's audio to 16 kHz mono speech-grade audio, reusing cached output"""
+    from celery_worker.audio_transcoder import AudioTranscoder
+    job_store.update(job_id, message="Optimizing audio for transcription...")
+    transcoder = AudioTranscoder(bucket=bucket if GCS_AVAILABLE else None)
+    return transcoder.transcode(local_file_path, job_store.get(job_id, include_large=False).get("audio_sha256"))
+
 def update_job_status(job_id: str, status: JobStatus, result: str = None, error: str = None):
-    if job_id in jobs_db:
-        jobs_db[job_id]["status"] = status
-        if result:
-            jobs_db[job_id]["result"] = result
-        if error:
-            jobs_db[job_id]["error"] = error
-        if status in [JobStatus.COMPLETED, JobStatus.FAILED]:
-            jobs_db[job_id]["completed_at"] = datetime.datetime.now().isoformat()
+    fields = {"status": status}
+    if result:
+        fields["result"] = result
+    if error:
+        fields["error"] = error
+    if status in [JobStatus.COMPLETED, JobStatus.FAILED]:
+        fields["completed_at"] = datetime.datetime.now().isoformat()
+    job_store.update(job_id, **fields)
 
 # Direct transcription processing for development (without Celery)  
 def process_transcription_direct(job_id: str, file_path: str, model: TranscriptionModel, set_list: str = "", custom_prompt: str = ""):
@@ -646,13 +871,11 @@ def process_transcription_direct(job_id: str, file_path: str, model: Transcripti
         cleanup_func = None
         try:
             # Update status to processing
-            if job_id in jobs_db:
-                jobs_db[job_id]["status"] = JobStatus.PROCESSING
-                jobs_db[job_id]["updated_at"] = datetime.datetime.now().isoformat()
-                jobs_db[job_id]["message"] = "Starting transcription..."
-            else:
-                logger.error(f"Job {job_id} not found in jobs_db during processing start")
+            job = job_store.get(job_id, include_large=False)
+            if not job:
+                logger.error(f"Job {job_id} not found in job store during processing start")
                 return
+            job_store.update(job_id, status=JobStatus.PROCESSING, message="Starting transcription...")
             
             transcript = None
             analysis = None
@@ -668,21 +891,24 @@ def process_transcription_direct(job_id: str, file_path: str, model: Transcripti
             if model == TranscriptionModel.OPENAI_WHISPER:
                 try:
                     # Update progress
-                    jobs_db[job_id]["message"] = "Preparing audio file..."
-                    jobs_db[job_id]["progress"] = 10
+                    job_store.update(job_id, message="Preparing audio file...", progress=10)
                     
-                    # Get file for transcription (handles different storage types)
-                    local_file_path, cleanup_func = get_file_for_transcription(job_id)
+                    # Reuse an existing transcript of the same audio instead of calling Whisper again
+                    transcript = get_cached_transcript(job_id)
                     
                     print(f"BACKEND DEBUG: Initializing WhisperClient with API key present: {'YES' if settings.openai_api_key else 'NO'}")
                     
+                    if transcript is not None:
+                        print(f"SUCCESS: Reused cached transcript for job {job_id}")
                     # Check if we should use mock mode for testing
-                    if not settings.openai_api_key or settings.openai_api_key == "test":
+                    elif not settings.openai_api_key or settings.openai_api_key == "test":
                         print("BACKEND DEBUG: Using mock transcription mode (no valid API key)")
                         
+                        # Get file for transcription (handles different storage types)
+                        local_file_path, cleanup_func = get_file_for_transcription(job_id)
+                        
                         # Update progress for mock processing
-                        jobs_db[job_id]["message"] = "Processing with mock transcription..."
-                        jobs_db[job_id]["progress"] = 50
+                        job_store.update(job_id, message="Processing with mock transcription...", progress=50)
                         
                         # Simulate processing time
                         time.sleep(2)
@@ -701,7 +927,7 @@ But seriously folks, technology these days... My phone knows everything about me
 
 Thank you, you've been a wonderful audience!
 
-[End of mock transcription - uploaded file: """ + jobs_db[job_id]['filename'] + """]"""
+[End of mock transcription - uploaded file: """ + job['filename'] + """]"""
                         
                         if cleanup_func:
                             cleanup_func()
@@ -709,14 +935,17 @@ Thank you, you've been a wonderful audience!
                     else:
                         from celery_worker.whisper_client import WhisperClient
                         
+                        # Get file for transcription (handles different storage types)
+                        local_file_path, cleanup_func = get_file_for_transcription(job_id)
+                        
                         # Update progress
-                        jobs_db[job_id]["message"] = "Transcribing with OpenAI Whisper..."
-                        jobs_db[job_id]["progress"] = 30
+                        job_store.update(job_id, message="Transcribing with OpenAI Whisper...", progress=30)
                         
-                        whisper_client = WhisperClient(api_key=settings.openai_api_key)
+                        whisper_client = WhisperClient(api_key=settings.openai_api_key, rate_limiter=openai_rate_limiter)
                         
                         print(f"BACKEND DEBUG: Starting transcription for file: {local_file_path}")
-                        transcript = whisper_client.transcribe_audio(local_file_path)
+                        transcript = whisper_client.transcribe_audio(transcode_for_whisper(job_id, local_file_path))
+                        transcript_cache.put(job.get("audio_sha256"), whisper_client.model, transcript)
                         
                         # Clean up temp file if needed
                         if cleanup_func:
@@ -743,26 +972,29 @@ Thank you, you've been a wonderful audience!
             elif model == TranscriptionModel.WHISPER_PLUS_GEMINI:
                 try:
                     # Update progress
-                    jobs_db[job_id]["message"] = "Preparing for Whisper + Gemini processing..."
-                    jobs_db[job_id]["progress"] = 10
-                    
-                    # Get file for transcription (handles different storage types)
-                    local_file_path, cleanup_func = get_file_for_transcription(job_id)
+                    job_store.update(job_id, message="Preparing for Whisper + Gemini processing...", progress=10)
                     
                     # Update progress
-                    jobs_db[job_id]["message"] = "Transcribing with OpenAI Whisper..."
-                    jobs_db[job_id]["progress"] = 30
+                    job_store.update(job_id, message="Transcribing with OpenAI Whisper...", progress=30)
                     
-                    # First transcribe with Whisper
-                    if not settings.openai_api_key or settings.openai_api_key == "test":
+                    # First transcribe with Whisper, unless this audio was already transcribed
+                    transcript = get_cached_transcript(job_id)
+                    if transcript is not None:
+                        print(f"SUCCESS: Reused cached transcript for job {job_id}")
+                    elif not settings.openai_api_key or settings.openai_api_key == "test":
                         # Mock transcription
                         time.sleep(2)
                         transcript = "Mock comedy performance transcript for Gemini analysis."
                         print("BACKEND DEBUG: Using mock transcription for Whisper + Gemini mode")
                     else:
                         from celery_worker.whisper_client import WhisperClient
-                        whisper_client = WhisperClient(api_key=settings.openai_api_key)
-                        transcript = whisper_client.transcribe_audio(local_file_path)
+                        
+                        # Get file for transcription (handles different storage types)
+                        local_file_path, cleanup_func = get_file_for_transcription(job_id)
+                        
+                        whisper_client = WhisperClient(api_key=settings.openai_api_key, rate_limiter=openai_rate_limiter)
+                        transcript = whisper_client.transcribe_audio(transcode_for_whisper(job_id, local_file_path))
+                        transcript_cache.put(job.get("audio_sha256"), whisper_client.model, transcript)
                     
                     # Clean up temp file if needed
                     if cleanup_func:
@@ -771,8 +1003,7 @@ Thank you, you've been a wonderful audience!
                     print(f"SUCCESS: Whisper transcription completed for job {job_id}")
                     
                     # Update progress for Gemini analysis
-                    jobs_db[job_id]["message"] = "Analyzing with Gemini..."
-                    jobs_db[job_id]["progress"] = 70
+                    job_store.update(job_id, message="Analyzing with Gemini...", progress=70, stage="analyze")
                     
                     # Then analyze with Gemini
                     print(f"BACKEND DEBUG: Starting Gemini analysis for job {job_id}")
@@ -780,8 +1011,14 @@ Thank you, you've been a wonderful audience!
                     print(f"BACKEND DEBUG: Set list length: {len(set_list)} chars")
                     
                     from celery_worker.gemini_client import GeminiClient
-                    gemini_client = GeminiClient(api_key=settings.gemini_api_key)
-                    analysis_result = gemini_client.analyze_transcript(transcript, set_list, custom_prompt)
+                    gemini_client = GeminiClient(
+                        api_key=settings.gemini_api_key, cache=analysis_cache,
+                        single_flight=single_flight, rate_limiter=gemini_rate_limiter
+                    )
+                    analysis_result = gemini_client.analyze_transcript(
+                        transcript, set_list, custom_prompt,
+                        on_delta=AnalysisDeltaPublisher(redis_client, job_id).publish
+                    )
                     analysis = analysis_result
                     
                     print(f"BACKEND DEBUG: Gemini response: {type(analysis_result)}")
@@ -812,19 +1049,16 @@ Thank you, you've been a wonderful audience!
                 return
             
             # Update with success
-            if job_id in jobs_db:
-                jobs_db[job_id].update({
-                    "status": JobStatus.COMPLETED,
-                    "result": transcript,
-                    "analysis": analysis,
-                    "progress": 100,
-                    "message": "Processing complete",
-                    "completed_at": datetime.datetime.now().isoformat(),
-                    "updated_at": datetime.datetime.now().isoformat()
-                })
-                print(f"SUCCESS: Job {job_id} completed successfully")
-            else:
-                print(f"WARNING: Job {job_id} not found in jobs_db during completion")
+            job_store.update(
+                job_id,
+                status=JobStatus.COMPLETED,
+                result=transcript,
+                analysis=analysis,
+                progress=100,
+                message="Processing complete",
+                completed_at=datetime.datetime.now().isoformat()
+            )
+            print(f"SUCCESS: Job {job_id} completed successfully")
                 
         except Exception as e:
             import traceback
@@ -841,16 +1075,13 @@ Thank you, you've been a wonderful audience!
             
             # Always update job status to failed
             try:
-                if job_id in jobs_db:
-                    jobs_db[job_id].update({
-                        "status": JobStatus.FAILED,
-                        "error": error_msg,
-                        "message": f"Processing failed: {error_msg}",
-                        "completed_at": datetime.datetime.now().isoformat(),
-                        "updated_at": datetime.datetime.now().isoformat()
-                    })
-                else:
-                    print(f"WARNING: Job {job_id} not found in jobs_db during error handling")
+                job_store.update(
+                    job_id,
+                    status=JobStatus.FAILED,
+                    error=error_msg,
+                    message=f"Processing failed: {error_msg}",
+                    completed_at=datetime.datetime.now().isoformat()
+                )
             except Exception as status_error:
                 print(f"Failed to update job status: {status_error}")
     
@@ -864,25 +1095,23 @@ Thank you, you've been a wonderful audience!
             except TimeoutError:
                 error_msg = f"Processing timed out after {timeout_seconds} seconds"
                 print(f"ERROR: {error_msg}")
-                if job_id in jobs_db:
-                    jobs_db[job_id].update({
-                        "status": JobStatus.FAILED,
-                        "error": error_msg,
-                        "message": "Processing timed out",
-                        "completed_at": datetime.datetime.now().isoformat(),
-                        "updated_at": datetime.datetime.now().isoformat()
-                    })
+                job_store.update(
+                    job_id,
+                    status=JobStatus.FAILED,
+                    error=error_msg,
+                    message="Processing timed out",
+                    completed_at=datetime.datetime.now().isoformat()
+                )
             except Exception as e:
                 error_msg = f"Thread execution failed: {str(e)}"
                 print(f"ERROR: {error_msg}")
-                if job_id in jobs_db:
-                    jobs_db[job_id].update({
-                        "status": JobStatus.FAILED,
-                        "error": error_msg,
-                        "message": "Thread execution failed",
-                        "completed_at": datetime.datetime.now().isoformat(),
-                        "updated_at": datetime.datetime.now().isoformat()
-                    })
+                job_store.update(
+                    job_id,
+                    status=JobStatus.FAILED,
+                    error=error_msg,
+                    message="Thread execution failed",
+                    completed_at=datetime.datetime.now().isoformat()
+                )
     
     # Start the timeout-protected thread
     thread = threading.Thread(target=run_with_timeout, daemon=True)
@@ -5,6 +5,7 @@ from enum import Enum
 class JobStatus(str, Enum):
     QUEUED = "queued"
     PROCESSING = "processing"
+    RETRYING = "retrying"
     COMPLETED = "completed"
     FAILED = "failed"
 
@@ -38,4 +39,16 @@ class UsageResponse(BaseModel):
     minutes_remaining: int
     billing_period_start: str
     billing_period_end: str
- 
\ No newline at end of file
+ 
+class UploadSessionCreateRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    total_size: Optional[int] = None
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    offset: int
+    total_size: Optional[int] = None
+    status: str
+    job_id: Optional[str] = None
@@ -0,0 +1,169 @@
+import hashlib
+import os
+
+from fastapi import UploadFile
+
+from .blocking import run_blocking
+from .logging_config import get_logger
+
+logger = get_logger("transcription_service")
+
+# Size of each read from the incoming upload - bounds per-request memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# GCS resumable uploads require chunk sizes that are a multiple of 256 KB
+GCS_WRITE_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size cap"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File exceeds maximum upload size of {max_bytes // (1024 * 1024)}MB")
+
+
+class LocalFileSink:
+    """Writes upload chunks to a file under the local upload directory"""
+
+    storage_type = "local"
+
+    def __init__(self, file_path: str):
+        self.path = file_path
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._file = open(file_path, "wb")
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class GCSBlobSink:
+    """Writes upload chunks to a GCS object using a resumable upload session"""
+
+    storage_type = "gcs"
+
+    def __init__(self, bucket, blob_name: str, content_type: str = None):
+        self.path = blob_name
+        self._blob = bucket.blob(blob_name)
+        self._writer = self._blob.open(
+            "wb",
+            chunk_size=GCS_WRITE_CHUNK_SIZE,
+            content_type=content_type or "application/octet-stream",
+        )
+
+    def write(self, chunk: bytes):
+        self._writer.write(chunk)
+
+    def commit(self):
+        self._writer.close()
+
+    def abort(self):
+        # Closing finalizes the resumable session, so remove the partial object afterwards
+        try:
+            self._writer.close()
+            self._blob.delete()
+        except Exception as e:
+            logger.warning(f"Failed to discard partial GCS upload {self.path}: {e}")
+
+
+def open_upload_sink(destination: str, bucket=None, content_type: str = None):
+    """Open a GCS sink when a bucket is available, otherwise a local file sink"""
+    if bucket is not None:
+        return GCSBlobSink(bucket, destination, content_type)
+    return LocalFileSink(destination)
+
+
+async def iter_upload_chunks(upload: UploadFile):
+    """Yield an UploadFile's content in UPLOAD_CHUNK_SIZE pieces"""
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_chunks_to_storage(chunks, sink, max_bytes: int) -> dict:
+    """
+    Copy an async iterator of byte chunks into a sink.
+
+    The size cap is enforced as bytes are copied and the SHA-256 of the
+    content is computed along the way, so the data is never held in memory.
+    Sink writes run in the blocking I/O pool, off the event loop.
+    Returns: {"path", "storage_type", "size", "sha256"}
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            digest.update(chunk)
+            await run_blocking(sink.write, chunk)
+        await run_blocking(sink.commit)
+    except BaseException:
+        await run_blocking(sink.abort)
+        raise
+
+    return {
+        "path": sink.path,
+        "storage_type": sink.storage_type,
+        "size": size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+async def stream_upload_to_storage(upload: UploadFile, sink, max_bytes: int) -> dict:
+    """Copy a multipart UploadFile into storage in bounded chunks"""
+    return await stream_chunks_to_storage(iter_upload_chunks(upload), sink, max_bytes)
+
+
+def content_key(sha256: str, filename: str) -> str:
+    """Content-addressed object name for an upload"""
+    extension = os.path.splitext(filename)[1].lower()
+    return f"audio/{sha256}{extension}"
+
+
+def store_by_content_hash(stored: dict, filename: str, bucket=None, local_dir: str = "") -> dict:
+    """
+    Move a stored upload to its content-addressed key.
+
+    Re-uploads of the same recording collapse onto a single stored copy;
+    `deduplicated` is True when that copy already existed.
+    """
+    key = content_key(stored["sha256"], filename)
+    deduplicated = False
+
+    if stored["storage_type"] == "gcs":
+        source_blob = bucket.blob(stored["path"])
+        if bucket.blob(key).exists():
+            source_blob.delete()
+            deduplicated = True
+        else:
+            bucket.rename_blob(source_blob, key)
+        new_path = key
+    else:
+        new_path = os.path.join(local_dir, key)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        if os.path.exists(new_path):
+            os.remove(stored["path"])
+            deduplicated = True
+        else:
+            os.replace(stored["path"], new_path)
+
+    if deduplicated:
+        logger.info(f"Upload deduplicated onto existing content key {key}")
+    return dict(stored, path=new_path, deduplicated=deduplicated)
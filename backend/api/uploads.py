@@ -0,0 +1,323 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+
+from .blocking import run_blocking
+from .logging_config import get_logger
+from .storage import UPLOAD_CHUNK_SIZE, UploadTooLargeError, open_upload_sink, stream_chunks_to_storage
+
+logger = get_logger("transcription_service")
+
+# Resumable upload sessions live for a day, long enough to resume after a dropped connection
+UPLOAD_SESSION_TTL = 24 * 3600
+
+# Only bounds how long a crashed request keeps its session locked; a chunk
+# or finalize normally releases the lock when it finishes
+UPLOAD_LOCK_SECONDS = 15 * 60
+
+# Deletes a lock only while it still holds the releasing request's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# GCS compose accepts at most 32 source objects per call
+GCS_COMPOSE_MAX_SOURCES = 32
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadSessionError(Exception):
+    """Raised when a resumable upload request conflicts with the session state"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: int = None):
+        self.status_code = status_code
+        self.offset = offset
+        super().__init__(message)
+
+
+def parse_content_range(header_value: str):
+    """
+    Parse a 'Content-Range: bytes start-end/total' header.
+    Returns: (start, end, total) where total is None for '*'
+    """
+    match = CONTENT_RANGE_PATTERN.match((header_value or "").strip())
+    if not match:
+        raise UploadSessionError("Content-Range header must look like 'bytes start-end/total'")
+    start, end = int(match.group(1)), int(match.group(2))
+    total = None if match.group(3) == "*" else int(match.group(3))
+    if end < start or (total is not None and end >= total):
+        raise UploadSessionError("Invalid Content-Range byte positions")
+    return start, end, total
+
+
+class UploadSessionStore:
+    """Persists resumable upload sessions in Redis (redis.asyncio), or in memory for development"""
+
+    def __init__(self, redis_client=None, ttl_seconds: int = UPLOAD_SESSION_TTL,
+                 lock_seconds: int = UPLOAD_LOCK_SECONDS):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self._sessions = {}
+        self._locked = set()
+
+    async def get(self, upload_id: str):
+        if not self.redis_client:
+            return self._sessions.get(upload_id)
+        session_data = await self.redis_client.get(f"upload:{upload_id}")
+        return json.loads(session_data) if session_data else None
+
+    async def save(self, session: dict):
+        session["updated_at"] = datetime.datetime.now().isoformat()
+        if not self.redis_client:
+            self._sessions[session["upload_id"]] = session
+            return
+        await self.redis_client.setex(f"upload:{session['upload_id']}", self.ttl_seconds, json.dumps(session))
+
+    @asynccontextmanager
+    async def lock(self, upload_id: str):
+        """
+        Exclusive access to a session for one chunk write or finalize, so two
+        requests never read the same offset and both commit. Raises
+        UploadSessionError (409) while another request holds it.
+        """
+        busy = UploadSessionError("Another request is writing to this upload; retry shortly", status_code=409)
+        if not self.redis_client:
+            if upload_id in self._locked:
+                raise busy
+            self._locked.add(upload_id)
+            try:
+                yield
+            finally:
+                self._locked.discard(upload_id)
+            return
+
+        lock_key = f"upload:{upload_id}:lock"
+        token = uuid.uuid4().hex
+        if not await self.redis_client.set(lock_key, token, nx=True, ex=self.lock_seconds):
+            raise busy
+        try:
+            yield
+        finally:
+            await self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+
+class ResumableUploadManager:
+    """
+    Chunked, resumable uploads for long recordings.
+
+    Each PUT chunk is streamed into its own part (a local file or a GCS
+    object) and only counted towards the committed offset once it has been
+    fully received, so an interrupted chunk is simply re-sent from the last
+    committed offset. Finalizing concatenates the parts (GCS compose for the
+    cloud backend) into the regular upload location; the parts are deleted
+    only once the session is marked completed, so a finalize that fails
+    before its job is created can be retried. Chunk writes and finalizing
+    hold the session's lock. Storage calls run in the blocking I/O pool so
+    they never stall the event loop.
+    """
+
+    def __init__(self, session_store: UploadSessionStore, local_dir: str, bucket=None):
+        self.session_store = session_store
+        self.local_dir = local_dir
+        self.bucket = bucket
+
+    @property
+    def storage_type(self):
+        return "gcs" if self.bucket is not None else "local"
+
+    def _part_prefix(self, upload_id: str) -> str:
+        if self.bucket is not None:
+            return f"uploads/partial/{upload_id}"
+        return os.path.join(self.local_dir, "partial", upload_id)
+
+    def _part_path(self, upload_id: str, start: int) -> str:
+        if self.bucket is not None:
+            return f"{self._part_prefix(upload_id)}/{start:015d}"
+        return os.path.join(self._part_prefix(upload_id), f"{start:015d}")
+
+    async def create_session(self, filename: str, content_type: str = None, total_size: int = None) -> dict:
+        now = datetime.datetime.now().isoformat()
+        session = {
+            "upload_id": str(uuid.uuid4()),
+            "filename": filename,
+            "content_type": content_type or "application/octet-stream",
+            "total_size": total_size,
+            "offset": 0,
+            "parts": [],
+            "storage_type": self.storage_type,
+            "status": "uploading",
+            "job_id": None,
+            "created_at": now,
+        }
+        await self.session_store.save(session)
+        logger.info(f"Resumable upload {session['upload_id']} created for {filename}")
+        return session
+
+    async def get_session(self, upload_id: str) -> dict:
+        session = await self.session_store.get(upload_id)
+        if not session:
+            raise UploadSessionError("Upload session not found", status_code=404)
+        return session
+
+    def locked(self, upload_id: str):
+        """The session's lock, for callers that finalize (see UploadSessionStore.lock)"""
+        return self.session_store.lock(upload_id)
+
+    async def write_chunk(self, upload_id: str, content_range: str, chunks, max_bytes: int) -> dict:
+        """Stream one byte range into a part and advance the committed offset"""
+        async with self.locked(upload_id):
+            return await self._write_chunk(upload_id, content_range, chunks, max_bytes)
+
+    async def _write_chunk(self, upload_id: str, content_range: str, chunks, max_bytes: int) -> dict:
+        session = await self.get_session(upload_id)
+        if session["status"] != "uploading":
+            raise UploadSessionError("Upload session is already finalized", status_code=409, offset=session["offset"])
+
+        start, end, total = parse_content_range(content_range)
+        if start != session["offset"]:
+            raise UploadSessionError(
+                f"Chunk starts at byte {start} but the committed offset is {session['offset']}",
+                status_code=409,
+                offset=session["offset"],
+            )
+        if total is not None:
+            if session["total_size"] is not None and total != session["total_size"]:
+                raise UploadSessionError("Total size does not match the upload session")
+            session["total_size"] = total
+        if session["total_size"] is not None and end >= session["total_size"]:
+            raise UploadSessionError("Chunk extends past the declared total size")
+        if end + 1 > max_bytes:
+            raise UploadSessionError("Upload exceeds maximum upload size", status_code=413)
+
+        expected_size = end - start + 1
+        part_path = self._part_path(upload_id, start)
+        sink = await run_blocking(open_upload_sink, part_path, self.bucket, "application/octet-stream")
+        try:
+            stored = await stream_chunks_to_storage(chunks, sink, expected_size)
+        except UploadTooLargeError:
+            raise UploadSessionError(
+                f"Chunk body is larger than the {expected_size} bytes declared in Content-Range",
+                offset=session["offset"],
+            )
+
+        if stored["size"] != expected_size:
+            await run_blocking(self._delete_paths, [part_path])
+            raise UploadSessionError(
+                f"Received {stored['size']} bytes but Content-Range declared {expected_size}",
+                offset=session["offset"],
+            )
+
+        session["parts"].append({"start": start, "size": stored["size"], "path": part_path})
+        session["offset"] = end + 1
+        await self.session_store.save(session)
+        return session
+
+    async def finalize(self, upload_id: str, destination: str) -> dict:
+        """
+        Concatenate the committed parts into `destination`. The caller holds
+        locked(upload_id) through mark_completed.
+        Returns: {"path", "storage_type", "size", "sha256"}
+        """
+        session = await self.get_session(upload_id)
+        if session["status"] != "uploading":
+            raise UploadSessionError("Upload session is already finalized", status_code=409, offset=session["offset"])
+        if not session["parts"]:
+            raise UploadSessionError("No data has been uploaded")
+        if session["total_size"] is not None and session["offset"] != session["total_size"]:
+            raise UploadSessionError(
+                f"Upload incomplete: {session['offset']} of {session['total_size']} bytes received",
+                status_code=409,
+                offset=session["offset"],
+            )
+
+        part_paths = [part["path"] for part in sorted(session["parts"], key=lambda p: p["start"])]
+        return await run_blocking(self._assemble, upload_id, part_paths, destination, session["content_type"])
+
+    async def mark_completed(self, upload_id: str, job_id: str):
+        """Record the job created from this upload so a repeated finalize is idempotent, then drop the parts"""
+        session = await self.get_session(upload_id)
+        part_paths = [part["path"] for part in session["parts"]]
+        session["status"] = "completed"
+        session["job_id"] = job_id
+        session["parts"] = []
+        await self.session_store.save(session)
+        await run_blocking(self._delete_parts, upload_id, part_paths)
+
+    def _assemble(self, upload_id: str, part_paths, destination: str, content_type: str) -> dict:
+        if self.bucket is not None:
+            return self._assemble_gcs(part_paths, destination, content_type)
+        return self._assemble_local(part_paths, destination)
+
+    def _delete_parts(self, upload_id: str, part_paths):
+        self._delete_paths(part_paths)
+        if self.bucket is None:
+            shutil.rmtree(self._part_prefix(upload_id), ignore_errors=True)
+
+    def _assemble_local(self, part_paths, destination: str) -> dict:
+        digest = hashlib.sha256()
+        size = 0
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        with open(destination, "wb") as output:
+            for part_path in part_paths:
+                with open(part_path, "rb") as part:
+                    while True:
+                        chunk = part.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        size += len(chunk)
+                        output.write(chunk)
+        return {"path": destination, "storage_type": "local", "size": size, "sha256": digest.hexdigest()}
+
+    def _assemble_gcs(self, part_paths, destination: str, content_type: str) -> dict:
+        sources = [self.bucket.blob(path) for path in part_paths]
+        intermediates = []
+        compose_round = 0
+
+        # Compose in rounds of at most 32 sources until one call can produce the final object
+        while len(sources) > GCS_COMPOSE_MAX_SOURCES:
+            next_sources = []
+            for group_start in range(0, len(sources), GCS_COMPOSE_MAX_SOURCES):
+                group = sources[group_start:group_start + GCS_COMPOSE_MAX_SOURCES]
+                intermediate = self.bucket.blob(f"{destination}.compose-{compose_round}-{group_start:06d}")
+                intermediate.compose(group)
+                intermediates.append(intermediate.name)
+                next_sources.append(intermediate)
+            sources = next_sources
+            compose_round += 1
+
+        final_blob = self.bucket.blob(destination)
+        final_blob.content_type = content_type
+        final_blob.compose(sources)
+        self._delete_paths(intermediates)
+
+        # Parts cannot be hashed incrementally across requests, so hash the composed object in one pass
+        digest = hashlib.sha256()
+        size = 0
+        with final_blob.open("rb", chunk_size=UPLOAD_CHUNK_SIZE * 8) as reader:
+            while True:
+                chunk = reader.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+        return {"path": destination, "storage_type": "gcs", "size": size, "sha256": digest.hexdigest()}
+
+    def _delete_paths(self, paths):
+        for path in paths:
+            try:
+                if self.bucket is not None:
+                    self.bucket.blob(path).delete()
+                else:
+                    os.remove(path)
+            except Exception as e:
+                logger.warning(f"Failed to delete upload part {path}: {e}")
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Analyses depend on the prompt and model as well as the transcript, so they
+# live shorter than transcripts and the cache is capped at a number of entries
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Collapse whitespace so re-pasted or re-wrapped input maps to the same key"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def normalize_set_list(set_list: Optional[str]) -> str:
+    """One normalized title per line, blank lines dropped"""
+    lines = (normalize_text(line) for line in (set_list or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def analysis_cache_key(transcript: str, set_list: str, prompt_template: str, model: str) -> str:
+    """Cache key from the hashes of each normalized input and the model name"""
+    parts = [
+        _digest(normalize_text(transcript)),
+        _digest(normalize_set_list(set_list)),
+        _digest(normalize_text(prompt_template)),
+        model,
+    ]
+    return _digest(":".join(parts))
+
+
+class AnalysisCache:
+    """
+    (transcript, set list, prompt template, model) -> Gemini analysis result.
+
+    Entries expire after ttl_seconds; past max_entries the least recently
+    used ones are evicted. Backed by Redis so the API and every worker share
+    entries and hit/miss counters, with a process-wide fallback like
+    TranscriptCache. Only successful analyses are stored.
+
+    key_prefix namespaces the Redis keys and the in-memory fallback, so
+    separate apps sharing one Redis keep their own LRU caps and counters.
+    """
+
+    # In-memory fallback shared by every instance in the process with the same
+    # prefix: prefix -> {"entries": key -> (expires_at, result), "stats": counts}
+    _memory_caches = {}
+    _memory_lock = threading.Lock()
+
+    def __init__(self, redis_client=None, ttl_seconds: int = ANALYSIS_CACHE_TTL,
+                 max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES, key_prefix: str = "analysis"):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.key_prefix = key_prefix
+        self.stats_key = f"{key_prefix}_cache:stats"
+        # Sorted set of cache keys scored by last access time, for LRU eviction
+        self.lru_key = f"{key_prefix}_cache:lru"
+        with self._memory_lock:
+            memory = self._memory_caches.setdefault(
+                key_prefix, {"entries": OrderedDict(), "stats": {"hits": 0, "misses": 0}}
+            )
+        self._memory_entries = memory["entries"]
+        self._memory_stats = memory["stats"]
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.key_prefix}:{key}"
+
+    def _record(self, outcome: str):
+        if self.redis_client:
+            try:
+                self.redis_client.hincrby(self.stats_key, outcome, 1)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to record analysis cache {outcome}: {e}")
+        with self._memory_lock:
+            self._memory_stats[outcome] += 1
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the stored analysis result or None, counting the lookup as a hit or miss"""
+        result = None
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(self._entry_key(key))
+                # Refresh the recency of entries that are still tracked
+                pipe.zadd(self.lru_key, {key: time.time()}, xx=True)
+                cached, _ = pipe.execute()
+                if cached is not None:
+                    result = json.loads(cached)
+            except Exception as e:
+                logger.warning(f"Analysis cache lookup failed: {e}")
+        else:
+            with self._memory_lock:
+                entry = self._memory_entries.get(key)
+                if entry and entry[0] > time.time():
+                    self._memory_entries.move_to_end(key)
+                    result = entry[1]
+                elif entry:
+                    del self._memory_entries[key]
+
+        self._record("hits" if result is not None else "misses")
+        if result is not None:
+            logger.info(f"Analysis cache hit for {key[:12]}")
+        return result
+
+    def put(self, key: str, result: dict):
+        if not result or not result.get("success"):
+            return
+        if self.redis_client:
+            try:
+                self._put_redis(key, result)
+            except Exception as e:
+                logger.warning(f"Failed to store analysis in cache: {e}")
+            return
+        with self._memory_lock:
+            self._memory_entries[key] = (time.time() + self.ttl_seconds, result)
+            self._memory_entries.move_to_end(key)
+            while len(self._memory_entries) > self.max_entries:
+                self._memory_entries.popitem(last=False)
+
+    def _put_redis(self, key: str, result: dict):
+        now = time.time()
+        pipe = self.redis_client.pipeline()
+        pipe.setex(self._entry_key(key), self.ttl_seconds, json.dumps(result))
+        pipe.zadd(self.lru_key, {key: now})
+        # Entries not accessed for a full TTL have expired anyway
+        pipe.zremrangebyscore(self.lru_key, "-inf", now - self.ttl_seconds)
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+
+        if size > self.max_entries:
+            evicted = self.redis_client.zpopmin(self.lru_key, size - self.max_entries)
+            keys = [member.decode("utf-8") if isinstance(member, bytes) else member for member, _ in evicted]
+            if keys:
+                self.redis_client.delete(*[self._entry_key(k) for k in keys])
+                logger.info(f"Evicted {len(keys)} least recently used analyses")
+
+    def stats(self) -> dict:
+        entries = 0
+        if self.redis_client:
+            try:
+                raw = self.redis_client.hgetall(self.stats_key)
+                counts = {
+                    (k.decode() if isinstance(k, bytes) else k): int(v)
+                    for k, v in raw.items()
+                }
+                entries = self.redis_client.zcard(self.lru_key)
+            except Exception as e:
+                logger.warning(f"Failed to read analysis cache stats: {e}")
+                counts = {}
+        else:
+            with self._memory_lock:
+                counts = dict(self._memory_stats)
+                entries = len(self._memory_entries)
+
+        hits = counts.get("hits", 0)
+        misses = counts.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,289 @@
+import bisect
+import json
+import logging
+import re
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Instead of echoing the whole transcript with labels inserted, Gemini returns a
+# short JSON list of segments by character offset and the labeled transcript is
+# rebuilt locally, so output tokens no longer grow with the length of the set.
+# Opt-in with ANALYSIS_OUTPUT_MODE=segments. Shared with the standalone api/ app
+# through api/backend_modules.py, so keep this module stdlib-only.
+
+SEGMENT_LABELS = {
+    "joke": "Joke",
+    "new_bit": "NEW BIT",
+    "riff": "Riff",
+}
+
+# Placeholders are filled with str.replace since set lists and the JSON example contain braces
+SEGMENT_PROMPT_HEADER = """You are a professional comedy show organizer. The transcript below is split into sentences, each prefixed with its character offset in the transcript, e.g. [120].
+Divide the transcript into segments:
+"""
+
+SEGMENT_SET_LIST_TASKS = """1. Match complete segments of the transcript to these bits from the provided set list:
+{set_list}
+   Label them "joke" with the matched set list title.
+2. Identify any other structured comedy bits that aren't in the set list and label them "new_bit" with a concise descriptive title (3–5 words) based on their content.
+3. Label short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit "riff", with an empty title.
+"""
+
+SEGMENT_NO_SET_LIST_TASKS = """1. Identify structured comedy bits and label them "new_bit" with a concise descriptive title (3–5 words) based on their content.
+2. Label short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit "riff", with an empty title.
+"""
+
+SEGMENT_FORMAT = """
+Output Requirements:
+- Return ONLY a JSON array, with no other text: [{"label": "joke" | "new_bit" | "riff", "title": "...", "start_char": 0, "end_char": 120}]
+- start_char is the offset of the segment's first sentence; end_char is the offset of the first sentence after it, or {length} at the end of the transcript.
+- Only use offsets shown in brackets (or {length}).
+- Label ENTIRE comedy bits from setup to punchline - do NOT cut jokes in the middle.
+- Segments must be in transcript order and must not overlap.
+- Do NOT repeat the transcript text.
+
+Transcript ({length} characters):
+{transcript}"""
+
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+# Unpunctuated stretches are broken at whitespace so every offset the model can cite stays close
+MAX_SENTENCE_CHARS = 400
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def segment_prompt_template(set_list: str = "") -> str:
+    """The segment prompt before the set list and transcript are filled in"""
+    tasks = SEGMENT_SET_LIST_TASKS if set_list and set_list.strip() else SEGMENT_NO_SET_LIST_TASKS
+    return SEGMENT_PROMPT_HEADER + tasks + SEGMENT_FORMAT
+
+
+def sentence_offsets(transcript: str) -> List[int]:
+    """Character offsets where sentences start"""
+    starts = [0]
+    for match in _SENTENCE_END.finditer(transcript):
+        if match.end() < len(transcript):
+            starts.append(match.end())
+
+    offsets = []
+    for start, end in zip(starts, starts[1:] + [len(transcript)]):
+        offsets.append(start)
+        last = start
+        for match in _WHITESPACE_RUN.finditer(transcript, start, end):
+            if match.end() - last >= MAX_SENTENCE_CHARS and match.end() < end:
+                offsets.append(match.end())
+                last = match.end()
+    return offsets
+
+
+def annotate_transcript(transcript: str) -> str:
+    """One sentence per line, prefixed with its offset, so the model can cite exact positions"""
+    offsets = sentence_offsets(transcript) + [len(transcript)]
+    return "\n".join(
+        f"[{start}] {transcript[start:end].strip()}"
+        for start, end in zip(offsets, offsets[1:])
+    )
+
+
+def build_segment_prompt(template: str, transcript: str, set_list: str = "") -> str:
+    return (
+        template
+        .replace("{set_list}", set_list or "")
+        .replace("{length}", str(len(transcript)))
+        .replace("{transcript}", annotate_transcript(transcript))
+    )
+
+
+def _snap(offset: int, boundaries: List[int]) -> int:
+    """Nearest sentence boundary, so a slightly-off offset never splits a word"""
+    position = bisect.bisect_left(boundaries, offset)
+    candidates = boundaries[max(position - 1, 0):position + 1]
+    return min(candidates, key=lambda boundary: abs(boundary - offset))
+
+
+def coerce_segment(item, boundaries: List[int]) -> Optional[dict]:
+    """One model-reported segment, validated and snapped to sentence boundaries; None if unusable"""
+    if not isinstance(item, dict):
+        return None
+    label = str(item.get("label", "")).strip().lower().replace(" ", "_").replace("-", "_")
+    if label not in SEGMENT_LABELS:
+        return None
+    try:
+        start = _snap(int(item["start_char"]), boundaries)
+        end = _snap(int(item["end_char"]), boundaries)
+    except (KeyError, TypeError, ValueError):
+        return None
+    if end <= start:
+        return None
+    title = "" if label == "riff" else str(item.get("title") or "").strip()
+    return {"label": label, "title": title, "start_char": start, "end_char": end}
+
+
+def parse_segments(response_text: str, transcript: str) -> List[dict]:
+    """
+    Validate the model's segment list against the transcript.
+    Returns: [{"label", "title", "start_char", "end_char"}] in order, non-overlapping.
+    Raises ValueError if the response is not a usable segment list.
+    """
+    try:
+        items = json.loads(_CODE_FENCE.sub("", response_text.strip()))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Segment response is not JSON: {e}")
+    if isinstance(items, dict):
+        items = items.get("segments", [])
+    if not isinstance(items, list):
+        raise ValueError("Segment response is not a list")
+
+    boundaries = sentence_offsets(transcript) + [len(transcript)]
+    candidates = [segment for segment in (coerce_segment(item, boundaries) for item in items) if segment]
+
+    if items and not candidates:
+        raise ValueError("Segment response has no usable segments")
+
+    segments = []
+    cursor = 0
+    for segment in sorted(candidates, key=lambda s: (s["start_char"], s["end_char"])):
+        # Overlapping segments are clipped to start where the previous one ended
+        segment["start_char"] = max(segment["start_char"], cursor)
+        if segment["end_char"] <= segment["start_char"]:
+            continue
+        segments.append(segment)
+        cursor = segment["end_char"]
+    return segments
+
+
+def segment_heading(segment: dict) -> str:
+    heading = SEGMENT_LABELS[segment["label"]]
+    if segment["label"] == "riff" or not segment["title"]:
+        return f"**{heading}**"
+    return f"**{heading}: {segment['title']}**"
+
+
+class IncrementalSegmentParser:
+    """
+    Turns a streamed segment list into labeled transcript text as it arrives.
+    feed() returns the text to append for each segment completed so far, and
+    finish() the rest of the transcript; together they give the same layout
+    as render_labeled_transcript (the final parse_segments result is still
+    authoritative if the model emitted segments out of order).
+    """
+
+    def __init__(self, transcript: str):
+        self.transcript = transcript
+        self.boundaries = sentence_offsets(transcript) + [len(transcript)]
+        self.buffer = ""
+        self.position = 0
+        self.cursor = 0
+        self.started = False
+        self._decoder = json.JSONDecoder()
+
+    def _emit(self, parts: List[str]) -> str:
+        text = "\n\n".join(part for part in parts if part)
+        if text and self.started:
+            text = "\n\n" + text
+        self.started = self.started or bool(text)
+        return text
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        parts = []
+        while True:
+            start = self.buffer.find("{", self.position)
+            if start == -1:
+                break
+            try:
+                item, end = self._decoder.raw_decode(self.buffer, start)
+            except json.JSONDecodeError:
+                # The object is still incomplete; wait for more text
+                break
+            self.position = end
+            segment = coerce_segment(item, self.boundaries)
+            if not segment or segment["end_char"] <= self.cursor:
+                continue
+            segment_start = max(segment["start_char"], self.cursor)
+            parts.append(self.transcript[self.cursor:segment_start].strip())
+            parts.append(f"{segment_heading(segment)}\n{self.transcript[segment_start:segment['end_char']].strip()}")
+            self.cursor = segment["end_char"]
+        return self._emit(parts)
+
+    def finish(self) -> str:
+        return self._emit([self.transcript[self.cursor:].strip()])
+
+
+def render_labeled_transcript(transcript: str, segments: List[dict]) -> str:
+    """The original transcript with each segment's label inserted before it; only whitespace at the breaks changes"""
+    parts = []
+    cursor = 0
+    for segment in segments:
+        parts.append(transcript[cursor:segment["start_char"]].strip())
+        parts.append(f"{segment_heading(segment)}\n{transcript[segment['start_char']:segment['end_char']].strip()}")
+        cursor = segment["end_char"]
+    parts.append(transcript[cursor:].strip())
+    return "\n\n".join(part for part in parts if part)
+
+
+def plan_windows(transcript: str, window_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) windows of about window_chars, cut at sentence boundaries,
+    each overlapping the previous one by about overlap_chars. A transcript
+    that fits in one window (with some slack) is not split.
+    """
+    length = len(transcript)
+    if length <= window_chars * 1.25:
+        return [(0, length)]
+
+    boundaries = sentence_offsets(transcript) + [length]
+    windows = []
+    start = 0
+    while length - start > window_chars * 1.25:
+        end = _snap(start + window_chars, boundaries)
+        if end <= start:
+            end = boundaries[bisect.bisect_right(boundaries, start)]
+        windows.append((start, end))
+        next_start = _snap(end - overlap_chars, boundaries)
+        start = next_start if start < next_start < end else end
+    windows.append((start, length))
+    return windows
+
+
+def merge_window_segments(transcript: str, windows: List[Tuple[int, int]], window_segments: List[List[dict]]) -> List[dict]:
+    """
+    Merge per-window segments (offsets relative to their window) into one
+    list for the whole transcript. Each overlap is split at a sentence
+    boundary near its middle and each side keeps its own window's labels,
+    so nothing is labeled twice. A bit cut by a split point, labeled the same
+    way on both sides, is joined back into one segment.
+    """
+    boundaries = sentence_offsets(transcript) + [len(transcript)]
+    cuts = [0]
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        cuts.append(max(cuts[-1], _snap((previous_end + next_start) // 2, boundaries)))
+    cuts.append(len(transcript))
+
+    owned = []
+    for index, ((window_start, _), segments) in enumerate(zip(windows, window_segments)):
+        for segment in segments:
+            start = max(segment["start_char"] + window_start, cuts[index])
+            end = min(segment["end_char"] + window_start, cuts[index + 1])
+            if end > start:
+                owned.append(dict(segment, start_char=start, end_char=end))
+    owned.sort(key=lambda s: s["start_char"])
+
+    interior_cuts = set(cuts[1:-1])
+    merged = []
+    for segment in owned:
+        previous = merged[-1] if merged else None
+        if (
+            previous
+            and previous["end_char"] == segment["start_char"]
+            and segment["start_char"] in interior_cuts
+            and previous["label"] == segment["label"]
+            and (segment["label"] != "joke" or previous["title"].lower() == segment["title"].lower())
+        ):
+            # Keep the first window's title for a new bit both windows saw a part of
+            previous["end_char"] = segment["end_char"]
+            continue
+        merged.append(segment)
+    return merged
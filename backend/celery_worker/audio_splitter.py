@@ -0,0 +1,93 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Silence detection thresholds tuned for club recordings (crowd noise between bits)
+SILENCE_NOISE_DB = os.getenv("SILENCE_NOISE_DB", "-35dB")
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "0.5"))
+
+# How far from the ideal cut point we are willing to look for a silence
+SPLIT_SEARCH_WINDOW = 60.0
+
+SILENCE_START_PATTERN = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END_PATTERN = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+def is_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def probe_duration(file_path: str) -> float:
+    """Duration of an audio file in seconds"""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+        check=True, capture_output=True, text=True, timeout=60
+    )
+    return float(output.stdout.strip())
+
+
+def detect_silences(file_path: str) -> List[Tuple[float, float]]:
+    """Return (start, end) pairs of silent stretches found by ffmpeg's silencedetect filter"""
+    output = subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-hide_banner", "-i", file_path,
+            "-af", f"silencedetect=noise={SILENCE_NOISE_DB}:d={SILENCE_MIN_SECONDS}",
+            "-f", "null", "-",
+        ],
+        capture_output=True, text=True, timeout=15 * 60
+    )
+    starts = [max(0.0, float(v)) for v in SILENCE_START_PATTERN.findall(output.stderr)]
+    ends = [float(v) for v in SILENCE_END_PATTERN.findall(output.stderr)]
+    return list(zip(starts, ends))
+
+
+def plan_split_points(duration: float, silences: List[Tuple[float, float]], target_seconds: float) -> List[float]:
+    """
+    Pick cut points roughly every `target_seconds`, moved to the middle of the
+    nearest silence within SPLIT_SEARCH_WINDOW so words are not cut in half.
+    """
+    points = []
+    previous = 0.0
+    ideal = target_seconds
+    while duration - previous > target_seconds * 1.25:
+        candidates = [
+            (start + end) / 2 for start, end in silences
+            if abs((start + end) / 2 - ideal) <= SPLIT_SEARCH_WINDOW and (start + end) / 2 > previous
+        ]
+        cut = min(candidates, key=lambda mid: abs(mid - ideal)) if candidates else ideal
+        points.append(round(cut, 3))
+        previous = cut
+        ideal = cut + target_seconds
+    return points
+
+
+def split_audio(file_path: str, split_points: List[float], output_dir: str) -> List[dict]:
+    """
+    Cut `file_path` at `split_points` without re-encoding.
+    Returns: [{"index", "path", "offset", "duration"}] in playback order
+    """
+    duration = probe_duration(file_path)
+    boundaries = [0.0] + list(split_points) + [duration]
+    extension = os.path.splitext(file_path)[1]
+    chunks = []
+
+    for index in range(len(boundaries) - 1):
+        start, end = boundaries[index], boundaries[index + 1]
+        chunk_path = os.path.join(output_dir, f"chunk_{index:03d}{extension}")
+        subprocess.run(
+            [
+                "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+                "-ss", f"{start:.3f}", "-i", file_path, "-t", f"{end - start:.3f}",
+                "-vn", "-c", "copy", chunk_path,
+            ],
+            check=True, capture_output=True, timeout=10 * 60
+        )
+        chunks.append({"index": index, "path": chunk_path, "offset": start, "duration": end - start})
+
+    logger.info(f"Split {os.path.basename(file_path)} ({duration:.0f}s) into {len(chunks)} chunks")
+    return chunks
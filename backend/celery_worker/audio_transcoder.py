@@ -0,0 +1,168 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from typing import Optional
+
+from .transcript_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Speech-grade output: Whisper resamples to 16 kHz mono internally, so nothing is lost
+TRANSCODE_SAMPLE_RATE = 16000
+TRANSCODE_FORMAT = os.getenv("TRANSCODE_FORMAT", "opus")
+TRANSCODE_CACHE_DIR = os.getenv("TRANSCODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "transcode_cache"))
+TRANSCODE_CACHE_MAX_MB = int(os.getenv("TRANSCODE_CACHE_MAX_MB", "2048"))
+# Artifacts used (created, fetched or hit) within this long are never pruned, since a job
+# may still be reading the path transcode() returned; the cache can exceed its budget meanwhile
+TRANSCODE_CACHE_GRACE_SECONDS = int(os.getenv("TRANSCODE_CACHE_GRACE_SECONDS", str(2 * 3600)))
+TRANSCODE_TIMEOUT = 15 * 60  # 15 minutes
+
+# In-progress files are written under this prefix and skipped by cache pruning
+PARTIAL_PREFIX = ".partial-"
+
+OUTPUT_FORMATS = {
+    "opus": {
+        "extension": ".ogg",
+        "codec_args": ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"],
+    },
+    "mp3": {
+        "extension": ".mp3",
+        "codec_args": ["-c:a", "libmp3lame", "-b:a", "32k"],
+    },
+}
+
+
+class AudioTranscoder:
+    """
+    Converts uploads (WAV, FLAC, MP4 video, ...) to compact 16 kHz mono
+    Opus or MP3 before they are sent to Whisper.
+
+    Results are cached by content hash in a local directory and, when a
+    bucket is given, under transcoded/ in GCS so retries on any worker and
+    later re-analysis reuse the same artifact.
+    """
+
+    def __init__(self, output_format: str = TRANSCODE_FORMAT, cache_dir: str = TRANSCODE_CACHE_DIR, bucket=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported transcode format: {output_format}. Valid formats: {list(OUTPUT_FORMATS)}")
+        self.output_format = output_format
+        self.extension = OUTPUT_FORMATS[output_format]["extension"]
+        self.cache_dir = cache_dir
+        self.bucket = bucket
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def is_available() -> bool:
+        return shutil.which("ffmpeg") is not None
+
+    def cache_name(self, content_hash: str) -> str:
+        return f"{content_hash}-{TRANSCODE_SAMPLE_RATE // 1000}k-mono{self.extension}"
+
+    def gcs_key(self, content_hash: str) -> str:
+        return f"transcoded/{self.cache_name(content_hash)}"
+
+    def transcode(self, input_path: str, content_hash: Optional[str] = None) -> str:
+        """
+        Return the path of a speech-grade copy of `input_path`.
+        The returned file belongs to the cache and must not be deleted by the caller.
+        Falls back to the original file if ffmpeg is unavailable or fails.
+        """
+        if not self.is_available():
+            logger.warning("ffmpeg not found - sending original audio to Whisper")
+            return input_path
+
+        content_hash = content_hash or file_sha256(input_path)
+        cached_path = self.fetch_cached(content_hash)
+        if cached_path:
+            return cached_path
+        cached_path = os.path.join(self.cache_dir, self.cache_name(content_hash))
+
+        # Write to a temp name first so concurrent readers never see a partial file
+        fd, partial_path = tempfile.mkstemp(dir=self.cache_dir, prefix=PARTIAL_PREFIX, suffix=self.extension)
+        os.close(fd)
+        command = [
+            "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+            "-i", input_path,
+            "-vn", "-ac", "1", "-ar", str(TRANSCODE_SAMPLE_RATE),
+            *OUTPUT_FORMATS[self.output_format]["codec_args"],
+            partial_path,
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            stderr = getattr(e, "stderr", b"") or b""
+            logger.warning(f"Transcoding failed, sending original audio: {stderr.decode(errors='ignore')[:500] or e}")
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+            return input_path
+
+        os.replace(partial_path, cached_path)
+        logger.info(
+            f"Transcoded {os.path.basename(input_path)}: "
+            f"{os.path.getsize(input_path) / 1e6:.1f}MB -> {os.path.getsize(cached_path) / 1e6:.1f}MB"
+        )
+        self._upload_to_gcs(content_hash, cached_path)
+        self._prune_cache()
+        return cached_path
+
+    def fetch_cached(self, content_hash: str) -> Optional[str]:
+        """Local path of an already transcoded artifact, pulled from GCS if needed, or None"""
+        cached_path = os.path.join(self.cache_dir, self.cache_name(content_hash))
+        if os.path.exists(cached_path):
+            logger.info(f"Transcode cache hit (local) for {content_hash[:12]}")
+            os.utime(cached_path)
+            return cached_path
+        if self._download_from_gcs(content_hash, cached_path):
+            logger.info(f"Transcode cache hit (GCS) for {content_hash[:12]}")
+            return cached_path
+        return None
+
+    def _download_from_gcs(self, content_hash: str, destination: str) -> bool:
+        if self.bucket is None:
+            return False
+        try:
+            blob = self.bucket.blob(self.gcs_key(content_hash))
+            if not blob.exists():
+                return False
+            partial_path = os.path.join(self.cache_dir, f"{PARTIAL_PREFIX}{uuid.uuid4().hex}{self.extension}")
+            blob.download_to_filename(partial_path)
+            os.replace(partial_path, destination)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to fetch transcoded audio from GCS: {e}")
+            return False
+
+    def _upload_to_gcs(self, content_hash: str, path: str):
+        if self.bucket is None:
+            return
+        try:
+            content_type = "audio/ogg" if self.extension == ".ogg" else "audio/mpeg"
+            self.bucket.blob(self.gcs_key(content_hash)).upload_from_filename(path, content_type=content_type)
+        except Exception as e:
+            logger.warning(f"Failed to store transcoded audio in GCS: {e}")
+
+    def _prune_cache(self):
+        """Drop least recently used artifacts once the local cache exceeds its budget, sparing recently used ones"""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(PARTIAL_PREFIX):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                if os.path.isfile(path):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            budget = TRANSCODE_CACHE_MAX_MB * 1024 * 1024
+            in_use_after = time.time() - TRANSCODE_CACHE_GRACE_SECONDS
+            for used_at, size, path in sorted(entries):
+                if total <= budget or used_at > in_use_after:
+                    break
+                os.unlink(path)
+                total -= size
+        except OSError as e:
+            logger.warning(f"Failed to prune transcode cache: {e}")
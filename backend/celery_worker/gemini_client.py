@@ -1,19 +1,123 @@
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .analysis_cache import analysis_cache_key
+from .analysis_segments import (
+    IncrementalSegmentParser, build_segment_prompt, merge_window_segments, parse_segments,
+    plan_windows, render_labeled_transcript, segment_prompt_template
+)
+from .rate_limiter import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
+# "labeled" (default): Gemini echoes the whole transcript with labels (always used for custom prompts).
+# "segments" (opt-in): Gemini returns offset-based segments and the labeled transcript is rebuilt locally.
+ANALYSIS_OUTPUT_MODE = os.getenv("ANALYSIS_OUTPUT_MODE", "labeled")
+
+# Output budget for a segment list, which stays small regardless of the transcript length
+SEGMENT_OUTPUT_TOKENS = 2000
+
+# Long transcripts are analyzed in overlapping windows of about this many characters
+# (roughly 15 minutes of speech), concurrently, so latency stays bounded as sets grow
+GEMINI_WINDOW_CHARS = int(os.getenv("GEMINI_WINDOW_CHARS", "12000"))
+GEMINI_WINDOW_OVERLAP_CHARS = int(os.getenv("GEMINI_WINDOW_OVERLAP_CHARS", "1500"))
+GEMINI_MAX_PARALLEL = int(os.getenv("GEMINI_MAX_PARALLEL", "4"))
+
+# Finish reasons that mean the output was cut off by a filter rather than completed
+BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"}
+
+# Default instructions; {set_list} is substituted with str.replace since set lists may contain braces
+SET_LIST_PROMPT_TEMPLATE = """You are a professional comedy show organizer. Analyze this transcript and perform the following tasks:
+1. Match segments of the transcript to these bits from the provided set list:
+{set_list}
+   Label these matched segments as '**Joke: [Matched Set List Title]**'.
+2. Identify any other structured comedy bits in the transcript that aren't in the set list, and for each one, generate a concise descriptive title (3–5 words) based on its content, then label the segment as **NEW BIT: [Descriptive Title]**.
+3. For any short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit, label them as '**Riff**'.
+"""
+
+NO_SET_LIST_PROMPT_TEMPLATE = """You are a professional comedy show organizer. Analyze this transcript and perform the following tasks:
+1. Identify structured comedy bits in the transcript, and for each one, generate a concise descriptive title (3–5 words) based on its content, then label the segment as **NEW BIT: [Descriptive Title]**.
+2. For any short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit, label them as '**Riff**'.
+"""
+
+FORMATTING_REQUIREMENTS = """
+Formatting Requirements:
+- IMPORTANT: You MUST return the *entire original transcript text* with your labels inserted directly before the relevant segments.
+- Do NOT alter or remove any part of the original transcript text itself.
+- Maintain the original sequence of the transcript.
+- Do not add any introductory or concluding remarks, only the labeled transcript.
+"""
+
+class GeminiEmptyResponseError(Exception):
+    """Raised when Gemini returns no usable text: the prompt or the output was blocked, or nothing was generated"""
+    pass
+
+
+def _reason_name(reason) -> str:
+    # Proto enums carry a name; plain ints and strings are used as they are
+    return str(getattr(reason, "name", reason) or "")
+
+
+def _chunk_text(chunk) -> str:
+    """
+    Text of a response or streamed chunk, read from its parts. chunk.text
+    raises ValueError on chunks without text parts (safety-blocked, or
+    carrying only a finish reason); those contribute nothing here.
+    """
+    texts = []
+    for candidate in getattr(chunk, "candidates", None) or []:
+        content = getattr(candidate, "content", None)
+        for part in getattr(content, "parts", None) or []:
+            text = getattr(part, "text", None)
+            if text:
+                texts.append(text)
+    return "".join(texts)
+
+
+def _blocked_reason(chunk) -> str:
+    """Why a response or chunk was blocked, or "" if it was not"""
+    feedback = getattr(chunk, "prompt_feedback", None)
+    block_reason = _reason_name(getattr(feedback, "block_reason", None))
+    if block_reason and block_reason != "BLOCK_REASON_UNSPECIFIED":
+        return f"prompt blocked: {block_reason}"
+    for candidate in getattr(chunk, "candidates", None) or []:
+        finish_reason = _reason_name(getattr(candidate, "finish_reason", None))
+        if finish_reason in BLOCKED_FINISH_REASONS:
+            return f"output blocked: {finish_reason}"
+    return ""
+
+
 class GeminiClient:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache=None, single_flight=None, rate_limiter=None, output_mode=None):
         # Get API key from parameter or environment
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.model = GEMINI_MODEL
+        # Optional AnalysisCache; repeated analyses of the same input skip the API call
+        self.cache = cache
+        # Optional SingleFlight; identical analyses already running elsewhere are awaited
+        self.single_flight = single_flight
+        # Optional RateLimiter shared by all workers; every request takes capacity first
+        self.rate_limiter = rate_limiter
+        self.output_mode = output_mode or ANALYSIS_OUTPUT_MODE
         
         # Enable mock mode if no API key or explicitly set to "test"  
         self.mock_mode = not self.api_key or self.api_key == "test"
         
-        if not self.mock_mode:
+        # genai.configure and the GenerativeModel (with its gRPC channel) are set
+        # up once per client, so reusing the client keeps the connection warm
+        self._model_client = None
+        
+    def _get_model_client(self):
+        if self._model_client is None:
             # Using google-generativeai library instead of direct HTTP requests
-            pass
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._model_client = genai.GenerativeModel(self.model)
+        return self._model_client
         
     def transcribe_audio(self, file_path: str) -> str:
         """
@@ -24,15 +128,19 @@ class GeminiClient:
         # We'll use it for post-processing Whisper transcripts
         raise NotImplementedError("Gemini Flash 2.0 is used for text analysis, not direct audio transcription")
     
-    def analyze_comedy_performance(self, transcript: str, set_list: str = "", custom_prompt: str = "") -> dict:
+    def analyze_comedy_performance(self, transcript: str, set_list: str = "", custom_prompt: str = "",
+                                   on_delta: Optional[Callable[[str], None]] = None) -> dict:
         """
         Alias for analyze_transcript for compatibility
         """
-        return self.analyze_transcript(transcript, set_list, custom_prompt)
+        return self.analyze_transcript(transcript, set_list, custom_prompt, on_delta)
     
-    def analyze_transcript(self, transcript: str, set_list: str = "", custom_prompt: str = "") -> dict:
+    def analyze_transcript(self, transcript: str, set_list: str = "", custom_prompt: str = "",
+                           on_delta: Optional[Callable[[str], None]] = None) -> dict:
         """
         Analyze transcript using Gemini Flash 2.0 for comedy analysis
+        With on_delta, generation is streamed and on_delta(text) receives the
+        labeled output piece by piece as it arrives (cached results arrive whole).
         """
         logger.info("GEMINI DEBUG - Starting analysis")
         logger.info(f"   Transcript length: {len(transcript)} chars")
@@ -65,46 +173,154 @@ Set List Provided: {"Yes" if set_list.strip() else "No"}
 Custom Prompt: {"Yes" if custom_prompt.strip() else "No"}"""
             return {"success": True, "analysis": mock_analysis}
         
+        prompt_template = self._prompt_template(set_list, custom_prompt)
+        cache_key = analysis_cache_key(transcript, set_list, prompt_template, self.model)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, cached=True)
+        
+        def generate():
+            return self._generate_analysis(transcript, set_list, custom_prompt, prompt_template, cache_key, on_delta)
+        
+        if self.single_flight:
+            # Only successful analyses are handed to waiting callers; on errors they make their own call
+            return self.single_flight.run(f"gemini:{cache_key}", generate, share=lambda result: result.get("success"))
+        return generate()
+    
+    def _generate_analysis(self, transcript: str, set_list: str, custom_prompt: str, prompt_template: str,
+                           cache_key: str, on_delta: Optional[Callable[[str], None]] = None) -> dict:
         try:
             # Use the same google-generativeai library as main.py for consistency
-            import google.generativeai as genai
-            genai.configure(api_key=self.api_key)
+            model_client = self._get_model_client()
             
-            model_client = genai.GenerativeModel('gemini-2.0-flash-exp')
-            
-            # Use the same prompt structure as main.py
-            prompt_instruction = "You are a professional comedy show organizer. Analyze this transcript and perform the following tasks:\n"
-            if set_list and set_list.strip():
-                prompt_instruction += f"1. Match segments of the transcript to these bits from the provided set list:\n{set_list}\n   Label these matched segments as '**Joke: [Matched Set List Title]**'.\n"
-                prompt_instruction += "2. Identify any other structured comedy bits in the transcript that aren't in the set list, and for each one, generate a concise descriptive title (3–5 words) based on its content, then label the segment as **NEW BIT: [Descriptive Title]**.\n"
-                prompt_instruction += "3. For any short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit, label them as '**Riff**'.\n"
+            if self._uses_segments(custom_prompt):
+                result = self._analyze_segments(model_client, transcript, set_list, prompt_template, on_delta)
+                if result is None:
+                    # Partial segment output was already relayed, so the fallback is not streamed
+                    result = self._analyze_labeled(model_client, transcript, set_list, custom_prompt)
             else:
-                prompt_instruction += "1. Identify structured comedy bits in the transcript, and for each one, generate a concise descriptive title (3–5 words) based on its content, then label the segment as **NEW BIT: [Descriptive Title]**.\n"
-                prompt_instruction += "2. For any short, unrelated comments or brief audience interactions that are not part of a structured joke or new bit, label them as '**Riff**'.\n"
-
-            prompt_instruction += """
-Formatting Requirements:
-- IMPORTANT: You MUST return the *entire original transcript text* with your labels inserted directly before the relevant segments.
-- Do NOT alter or remove any part of the original transcript text itself.
-- Maintain the original sequence of the transcript.
-- Do not add any introductory or concluding remarks, only the labeled transcript.
-"""
-
-            prompt = f"{prompt_instruction}\n\nTranscript to analyze:\n{transcript}"
+                result = self._analyze_labeled(model_client, transcript, set_list, custom_prompt, on_delta)
             
-            # Use custom prompt if provided
-            if custom_prompt and custom_prompt.strip():
-                prompt = custom_prompt.format(transcript=transcript, set_list=set_list)
-            
-            response = model_client.generate_content(prompt, request_options={"timeout": 60})
-            analysis = response.text
-            
-            return {"success": True, "analysis": analysis}
+            if self.cache:
+                self.cache.put(cache_key, result)
+            return result
                 
         except Exception as e:
             logger.error(f"Gemini analysis error: {str(e)}")
+            # ResourceExhausted (429): our pacing overshot; back off in every worker
+            if self.rate_limiter and getattr(e, "code", None) == 429:
+                self.rate_limiter.drain()
             return {"success": False, "error": str(e)}
     
+    def _generate(self, model_client, prompt: str, output_tokens: int, on_text: Optional[Callable[[str], None]] = None) -> str:
+        if self.rate_limiter:
+            self.rate_limiter.acquire(requests=1, tokens=estimate_tokens(prompt) + output_tokens)
+        if on_text is None:
+            chunks = [model_client.generate_content(prompt, request_options={"timeout": 60})]
+        else:
+            # Streamed: relay each piece as it is generated
+            chunks = model_client.generate_content(prompt, stream=True, request_options={"timeout": 60})
+        
+        parts = []
+        blocked = ""
+        for chunk in chunks:
+            text = _chunk_text(chunk)
+            if text:
+                parts.append(text)
+                if on_text:
+                    on_text(text)
+            blocked = blocked or _blocked_reason(chunk)
+        
+        # Reported as its own error, not as unusable (segment) output
+        if blocked:
+            raise GeminiEmptyResponseError(f"Gemini response {blocked}")
+        if not parts:
+            raise GeminiEmptyResponseError("Gemini returned an empty response")
+        return "".join(parts)
+    
+    def _analyze_segments(self, model_client, transcript: str, set_list: str, prompt_template: str,
+                          on_delta: Optional[Callable[[str], None]] = None):
+        """Offset-based analysis; None if the response cannot be used (the caller falls back to labeled mode)"""
+        windows = plan_windows(transcript, GEMINI_WINDOW_CHARS, GEMINI_WINDOW_OVERLAP_CHARS)
+        if len(windows) > 1:
+            segments = self._analyze_windows(model_client, transcript, set_list, prompt_template, windows, on_delta)
+        else:
+            # Segments are rendered into labeled text as soon as each one is complete
+            parser = IncrementalSegmentParser(transcript) if on_delta else None
+            on_text = (lambda text: on_delta(parser.feed(text))) if parser else None
+            try:
+                segments = self._window_segments(model_client, transcript, set_list, prompt_template, on_text)
+            except ValueError as e:
+                logger.warning(f"Unusable Gemini segment output, falling back to labeled transcript: {e}")
+                return None
+            if parser:
+                on_delta(parser.finish())
+        return {
+            "success": True,
+            "analysis": render_labeled_transcript(transcript, segments),
+            "segments": segments,
+        }
+    
+    def _window_segments(self, model_client, text: str, set_list: str, prompt_template: str,
+                         on_text: Optional[Callable[[str], None]] = None) -> list:
+        # Every window gets the full set list, so matching stays consistent across windows
+        prompt = build_segment_prompt(prompt_template, text, set_list)
+        return parse_segments(self._generate(model_client, prompt, SEGMENT_OUTPUT_TOKENS, on_text), text)
+    
+    def _analyze_windows(self, model_client, transcript: str, set_list: str, prompt_template: str, windows: list,
+                         on_delta: Optional[Callable[[str], None]] = None) -> list:
+        """Map: segment each window concurrently. Reduce: merge, deduplicating the overlaps."""
+        logger.info(f"Analyzing {len(transcript)} chars in {len(windows)} overlapping windows")
+        
+        # The first window is streamed as a preview; the merged result replaces it on completion
+        first_window_parser = IncrementalSegmentParser(transcript[windows[0][0]:windows[0][1]]) if on_delta else None
+        
+        def analyze_window(window):
+            text = transcript[window[0]:window[1]]
+            on_text = None
+            if first_window_parser and window == windows[0]:
+                on_text = lambda piece: on_delta(first_window_parser.feed(piece))
+            try:
+                return self._window_segments(model_client, text, set_list, prompt_template, on_text)
+            except ValueError as e:
+                # A labeled fallback would echo the whole window; ask for segments once more instead
+                logger.warning(f"Unusable segment output for window {window}, retrying: {e}")
+                return self._window_segments(model_client, text, set_list, prompt_template)
+        
+        with ThreadPoolExecutor(max_workers=min(GEMINI_MAX_PARALLEL, len(windows))) as executor:
+            window_segments = list(executor.map(analyze_window, windows))
+        return merge_window_segments(transcript, windows, window_segments)
+    
+    def _analyze_labeled(self, model_client, transcript: str, set_list: str, custom_prompt: str,
+                         on_delta: Optional[Callable[[str], None]] = None) -> dict:
+        if custom_prompt and custom_prompt.strip():
+            prompt = custom_prompt.format(transcript=transcript, set_list=set_list)
+        else:
+            prompt_instruction = self._labeled_template(set_list).replace("{set_list}", set_list)
+            prompt = f"{prompt_instruction}\n\nTranscript to analyze:\n{transcript}"
+        
+        # The response repeats the whole transcript with labels, so count it as output too
+        analysis = self._generate(model_client, prompt, estimate_tokens(transcript), on_delta)
+        return {"success": True, "analysis": analysis}
+    
+    def _uses_segments(self, custom_prompt: str = "") -> bool:
+        # Custom prompts are written for the labeled format
+        return self.output_mode == "segments" and not (custom_prompt and custom_prompt.strip())
+    
+    @staticmethod
+    def _labeled_template(set_list: str = "") -> str:
+        template = SET_LIST_PROMPT_TEMPLATE if set_list and set_list.strip() else NO_SET_LIST_PROMPT_TEMPLATE
+        return template + FORMATTING_REQUIREMENTS
+    
+    def _prompt_template(self, set_list: str = "", custom_prompt: str = "") -> str:
+        """The prompt before the transcript and set list are filled in"""
+        if custom_prompt and custom_prompt.strip():
+            return custom_prompt
+        if self._uses_segments(custom_prompt):
+            return segment_prompt_template(set_list)
+        return self._labeled_template(set_list)
+    
     def enhanced_transcribe_and_analyze(self, file_path: str, set_list: str = "", custom_prompt: str = "") -> dict:
         """
         This would be used if we want to combine Whisper + Gemini in one step
@@ -0,0 +1,72 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields pushed to clients on every change; the full result is fetched from GET /v1/transcripts/{job_id}
+JOB_EVENT_FIELDS = ("job_id", "status", "progress", "message", "stage", "error", "updated_at")
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def job_event_channel(job_id: str) -> str:
+    """Redis pub/sub channel the worker and API publish job changes to"""
+    return f"job-events:{job_id}"
+
+
+def job_event(job: dict) -> dict:
+    event = {field: job.get(field) for field in JOB_EVENT_FIELDS}
+    # Enum statuses from the direct-processing path serialize as their value
+    event["status"] = getattr(event["status"], "value", event["status"])
+    return event
+
+
+def publish_job_event(redis_client, job: dict):
+    """Publish a job change; failures never block the job update itself"""
+    if not redis_client:
+        return
+    try:
+        redis_client.publish(job_event_channel(job["job_id"]), json.dumps(job_event(job)))
+    except Exception as e:
+        logger.warning(f"Failed to publish event for job {job.get('job_id')}: {e}")
+
+
+# Partial Gemini output is published as "analysis_delta" events on the job's channel.
+# Each carries the character offset of its text in the partial analysis, so clients
+# apply it as partial = partial[:offset] + text; repeats and restarts (offset 0) are safe.
+ANALYSIS_DELTA_EVENT = "analysis_delta"
+
+
+def analysis_partial_key(job_id: str) -> str:
+    """The partial analysis so far, for clients that subscribe mid-stream"""
+    return f"job:{job_id}:analysis_partial"
+
+
+class AnalysisDeltaPublisher:
+    """Relays streamed analysis text for one job as it is generated"""
+
+    def __init__(self, redis_client, job_id: str, ttl_seconds: int = 3600):
+        self.redis_client = redis_client
+        self.job_id = job_id
+        self.ttl_seconds = ttl_seconds
+        self.offset = 0
+        if redis_client:
+            try:
+                # A retried analysis starts over
+                redis_client.delete(analysis_partial_key(job_id))
+            except Exception as e:
+                logger.warning(f"Failed to reset partial analysis for job {job_id}: {e}")
+
+    def publish(self, text: str):
+        """Append text to the partial analysis; failures never interrupt the analysis"""
+        if not text or not self.redis_client:
+            return
+        event = {"type": ANALYSIS_DELTA_EVENT, "job_id": self.job_id, "offset": self.offset, "text": text}
+        self.offset += len(text)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.append(analysis_partial_key(self.job_id), text)
+            pipe.expire(analysis_partial_key(self.job_id), self.ttl_seconds)
+            pipe.publish(job_event_channel(self.job_id), json.dumps(event))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to publish partial analysis for job {self.job_id}: {e}")
@@ -0,0 +1,299 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes over job:{job_id} records, so listing never scans the keyspace.
+# Members are job ids; scores are created_at / updated_at as epoch seconds.
+JOBS_BY_CREATED_KEY = "jobs:by_created"
+JOBS_BY_UPDATED_KEY = "jobs:by_updated"
+JOB_STATUSES = ("queued", "processing", "retrying", "completed", "failed")
+
+# Job records expire after an hour; index entries older than this are pruned lazily
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def status_index_key(status: str) -> str:
+    """Per-status index, a sorted set by created_at so status filters keep their order"""
+    return f"jobs:status:{status}"
+
+
+def status_value(status) -> Optional[str]:
+    # Enum statuses from the direct-processing path serialize as their value
+    return getattr(status, "value", status)
+
+
+def stage_failure_fields(stage: str, error: str, will_retry: bool, completed_at: Optional[str] = None) -> dict:
+    """Job fields for a failed pipeline stage: "retrying" while a retry is scheduled, "failed" once they run out"""
+    if will_retry:
+        return {
+            "status": "retrying",
+            "message": f"{stage.capitalize()} failed, retrying: {error}",
+            "stage": stage,
+        }
+    return {
+        "status": "failed",
+        "progress": 0,
+        "message": f"Processing failed: {error}",
+        "error": error,
+        "stage": stage,
+        "completed_at": completed_at or datetime.utcnow().isoformat(),
+    }
+
+
+def timestamp_score(timestamp) -> float:
+    """
+    Epoch seconds for an ISO timestamp (naive timestamps are treated as UTC,
+    which keeps the score order identical to the string order the API used).
+    """
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        parsed = timestamp
+    else:
+        parsed = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def index_job(pipe, job: dict):
+    """Queue index updates for a job on a Redis pipeline (call next to the record write)"""
+    job_id = job["job_id"]
+    created_at = job.get("created_at") or datetime.utcnow().isoformat()
+    created_score = timestamp_score(created_at)
+    updated_score = timestamp_score(job.get("updated_at") or created_at)
+    status = status_value(job.get("status"))
+
+    pipe.zadd(JOBS_BY_CREATED_KEY, {job_id: created_score})
+    pipe.zadd(JOBS_BY_UPDATED_KEY, {job_id: updated_score})
+    for other in JOB_STATUSES:
+        if other != status:
+            pipe.zrem(status_index_key(other), job_id)
+    if status:
+        pipe.zadd(status_index_key(status), {job_id: created_score})
+
+
+def queue_unindex_jobs(pipe, job_ids: List[str]):
+    """Queue removal of job ids from every index"""
+    pipe.zrem(JOBS_BY_CREATED_KEY, *job_ids)
+    pipe.zrem(JOBS_BY_UPDATED_KEY, *job_ids)
+    for status in JOB_STATUSES:
+        pipe.zrem(status_index_key(status), *job_ids)
+
+
+def unindex_jobs(redis_client, job_ids: Iterable[str]):
+    """Remove job ids from every index"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    queue_unindex_jobs(pipe, job_ids)
+    pipe.execute()
+
+
+def expiry_cutoff() -> float:
+    """Index score below which a job's record has expired unless it was refreshed"""
+    return datetime.now(timezone.utc).timestamp() - JOB_TTL_SECONDS
+
+
+# Pruning and paging are split into the Redis calls to make (the *_query helpers
+# return ZRANGEBYSCORE/ZREVRANGEBYSCORE keyword arguments) and the handling of
+# their replies, so the sync functions here and AsyncRedisJobStore differ only
+# in whether the calls are awaited.
+
+
+def stale_jobs_query(batch_size: int = 1000) -> dict:
+    """ZRANGEBYSCORE arguments for the oldest index entries past the expiry cutoff"""
+    return {"name": JOBS_BY_UPDATED_KEY, "min": "-inf", "max": expiry_cutoff(), "start": 0, "num": batch_size}
+
+
+def queue_exists_checks(pipe, job_ids: List[str]):
+    # A job can still be alive if its record was refreshed without touching the index
+    for job_id in job_ids:
+        pipe.exists(job_key(job_id))
+
+
+def expired_job_ids(job_ids: List[str], alive: list) -> List[str]:
+    return [job_id for job_id, exists in zip(job_ids, alive) if not exists]
+
+
+def prune_expired_jobs(redis_client, batch_size: int = 1000) -> int:
+    """Drop index entries for jobs whose records have expired"""
+    stale = decode_ids(redis_client.zrangebyscore(**stale_jobs_query(batch_size)))
+    if not stale:
+        return 0
+    pipe = redis_client.pipeline(transaction=False)
+    queue_exists_checks(pipe, stale)
+    expired = expired_job_ids(stale, pipe.execute())
+    unindex_jobs(redis_client, expired)
+    return len(expired)
+
+
+def encode_cursor(score: float, job_id: str) -> str:
+    return f"{score!r}:{job_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        score, job_id = cursor.split(":", 1)
+        return float(score), job_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def decode_ids(members) -> List[str]:
+    return [_decode(member) for member in members]
+
+
+def collect_rows_after(rows, after, results: list, limit: int):
+    """
+    Append ZREVRANGEBYSCORE (member, score) rows that come after the cursor
+    position `after` to `results`, up to `limit`. Ties on the score are
+    ordered by job id descending, matching ZREVRANGEBYSCORE.
+    """
+    for member, score in rows:
+        job_id = _decode(member)
+        if after and score == after[0] and job_id >= after[1]:
+            continue
+        results.append((job_id, score))
+        if len(results) == limit:
+            break
+
+
+class IndexPageScan:
+    """
+    Reads up to `limit` (job_id, score) pairs from one index, newest first,
+    after `cursor`. Callers loop while not done, running
+    ZREVRANGEBYSCORE(**query()) and passing the rows to feed(); the pairs
+    collected end up in `results`.
+    """
+
+    def __init__(self, index_key: str, min_score, max_score, cursor: Optional[str], limit: int):
+        self.after = decode_cursor(cursor) if cursor else None
+        if self.after and self.after[0] < max_score:
+            max_score = self.after[0]
+        self.index_key = index_key
+        self.min_score = min_score
+        self.max_score = max_score
+        self.limit = limit
+        self.batch = limit + 1
+        self.offset = 0
+        self.results: List[Tuple[str, float]] = []
+        self.done = False
+
+    def query(self) -> dict:
+        return {
+            "name": self.index_key, "max": self.max_score, "min": self.min_score,
+            "start": self.offset, "num": self.batch, "withscores": True,
+        }
+
+    def feed(self, rows):
+        collect_rows_after(rows, self.after, self.results, self.limit)
+        self.offset += self.batch
+        self.done = len(self.results) >= self.limit or len(rows) < self.batch
+
+
+def _page_ids(redis_client, index_key: str, min_score, max_score, cursor, limit: int) -> List[Tuple[str, float]]:
+    """Up to `limit` (job_id, score) pairs from one index, newest first, after `cursor`"""
+    scan = IndexPageScan(index_key, min_score, max_score, cursor, limit)
+    while not scan.done:
+        scan.feed(redis_client.zrevrangebyscore(**scan.query()))
+    return scan.results
+
+
+def page_query(statuses=None, created_after=None, created_before=None, limit: int = DEFAULT_PAGE_SIZE):
+    """Indexes and score range for a page request. Returns: (index_keys, min_score, max_score, limit)"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    min_score = timestamp_score(created_after) if created_after else "-inf"
+    max_score = timestamp_score(created_before) if created_before else float("inf")
+    index_keys = [status_index_key(s) for s in statuses] if statuses else [JOBS_BY_CREATED_KEY]
+    return index_keys, min_score, max_score, limit
+
+
+def merge_page(candidates: List[Tuple[str, float]], limit: int) -> Tuple[List[str], Optional[str]]:
+    """
+    Merge per-index candidates (each fetched with limit + 1) into one page.
+    Returns: (job_ids, next_cursor or None)
+    """
+    candidates.sort(key=lambda item: (item[1], item[0]), reverse=True)
+    page = candidates[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(candidates) > limit and page else None
+    return [job_id for job_id, _ in page], next_cursor
+
+
+def page_job_ids(
+    redis_client,
+    statuses: Optional[List[str]] = None,
+    created_after=None,
+    created_before=None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Ids of one page of jobs, newest first, optionally filtered by status and creation time.
+    Returns: (job_ids, next_cursor or None)
+    """
+    index_keys, min_score, max_score, limit = page_query(statuses, created_after, created_before, limit)
+    # Each status index is already ordered; merge their heads and keep the newest
+    candidates = []
+    for index_key in index_keys:
+        candidates.extend(_page_ids(redis_client, index_key, min_score, max_score, cursor, limit + 1))
+    return merge_page(candidates, limit)
+
+
+def list_memory_job_page(
+    jobs: Iterable[dict],
+    statuses: Optional[List[str]] = None,
+    created_after=None,
+    created_before=None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict:
+    """page_job_ids for the in-memory development store, with the same cursor format"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    min_score = timestamp_score(created_after) if created_after else float("-inf")
+    max_score = timestamp_score(created_before) if created_before else float("inf")
+    after = decode_cursor(cursor) if cursor else None
+
+    candidates = []
+    for job in jobs:
+        if statuses and status_value(job.get("status")) not in statuses:
+            continue
+        score = timestamp_score(job.get("created_at") or 0)
+        if not min_score <= score <= max_score:
+            continue
+        if after and (score, job["job_id"]) >= after:
+            continue
+        candidates.append((score, job["job_id"], job))
+    candidates.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+    page = candidates[:limit]
+    next_cursor = encode_cursor(page[-1][0], page[-1][1]) if len(candidates) > limit else None
+    return {"jobs": [job for _, _, job in page], "next_cursor": next_cursor}
+
+
+def range_query(index_key: str, min_score="-inf", max_score="+inf", limit: Optional[int] = None) -> dict:
+    """ZREVRANGEBYSCORE arguments for job ids within a score range, newest first"""
+    query = {"name": index_key, "max": max_score, "min": min_score}
+    if limit is not None:
+        query.update(start=0, num=limit)
+    return query
+
+
+def job_ids_in_range(redis_client, index_key: str, min_score="-inf", max_score="+inf", limit: Optional[int] = None) -> List[str]:
+    """Job ids from one index within a score range, newest first"""
+    return decode_ids(redis_client.zrevrangebyscore(**range_query(index_key, min_score, max_score, limit)))
@@ -0,0 +1,206 @@
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import redis
+
+from .job_events import JOB_EVENT_FIELDS, publish_job_event
+from .job_index import JOB_TTL_SECONDS, index_job, job_key, page_job_ids, unindex_jobs
+
+logger = logging.getLogger(__name__)
+
+# job:{job_id} is a hash of small fields, each JSON-encoded so types round-trip.
+# Large fields live in their own string keys so progress writes never touch them.
+LARGE_FIELDS = ("result", "analysis")
+
+# Fields read before a partial update (under WATCH) to refresh the indexes and publish the event
+READ_BACK_FIELDS = JOB_EVENT_FIELDS + ("created_at",)
+
+# The queue_* / parse_* helpers only build and decode pipelines, so the same
+# layout code serves the sync client (worker, direct path) and redis.asyncio (API).
+
+
+def large_field_key(job_id: str, field: str) -> str:
+    return f"job:{job_id}:{field}"
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _decode_hash(raw: dict) -> dict:
+    return {_decode(field): json.loads(value) for field, value in raw.items()}
+
+
+def _queue_large_fields(pipe, job_id: str, fields: dict) -> int:
+    """Queue writes for the large fields present in `fields`; returns the number of commands"""
+    queued = 0
+    for field in LARGE_FIELDS:
+        if field not in fields:
+            continue
+        if fields[field] is None:
+            pipe.delete(large_field_key(job_id, field))
+        else:
+            pipe.setex(large_field_key(job_id, field), JOB_TTL_SECONDS, json.dumps(fields[field]))
+        queued += 1
+    return queued
+
+
+def _queue_expire(pipe, job_id: str) -> int:
+    # Large-field keys share the record's lifetime; EXPIRE on a missing key is a no-op
+    pipe.expire(job_key(job_id), JOB_TTL_SECONDS)
+    for field in LARGE_FIELDS:
+        pipe.expire(large_field_key(job_id, field), JOB_TTL_SECONDS)
+    return 1 + len(LARGE_FIELDS)
+
+
+def queue_write_jobs(pipe, jobs: List[dict]):
+    """Queue complete job records, replacing any previous ones"""
+    for job in jobs:
+        job_id = job["job_id"]
+        small = {field: json.dumps(value) for field, value in job.items() if field not in LARGE_FIELDS}
+        pipe.delete(job_key(job_id))
+        pipe.hset(job_key(job_id), mapping=small)
+        _queue_large_fields(pipe, job_id, {field: job.get(field) for field in LARGE_FIELDS})
+        _queue_expire(pipe, job_id)
+        index_job(pipe, job)
+        publish_job_event(pipe, job)
+
+
+# A partial update is one WATCH/MULTI transaction: the job hashes are watched, their
+# indexed fields read, the merged result computed here, and the field writes, index
+# updates and event publish committed together. A concurrent write to the same job
+# aborts the transaction and it is retried from a fresh read, so indexes always
+# reflect the last committed write. Unknown or expired jobs are skipped.
+
+
+def stamp_updates(updates: Dict[str, dict]) -> Dict[str, dict]:
+    now = datetime.utcnow().isoformat()
+    return {job_id: dict(fields, updated_at=fields.get("updated_at") or now) for job_id, fields in updates.items()}
+
+
+def merge_read_backs(updates: Dict[str, dict], read_backs: list) -> Dict[str, dict]:
+    """Each existing job's READ_BACK_FIELDS after its update; jobs without a record are left out"""
+    current = {}
+    for (job_id, fields), values in zip(updates.items(), read_backs):
+        job = {
+            field: json.loads(value) if value is not None else None
+            for field, value in zip(READ_BACK_FIELDS, values)
+        }
+        if job["job_id"] is None:
+            continue
+        job.update({field: fields[field] for field in READ_BACK_FIELDS if field in fields})
+        current[job_id] = job
+    return current
+
+
+def queue_field_updates(pipe, updates: Dict[str, dict], current: Dict[str, dict]):
+    """Queue the writes, index updates and events for the jobs in `current` (inside MULTI)"""
+    for job_id, job in current.items():
+        fields = updates[job_id]
+        small = {field: json.dumps(value) for field, value in fields.items() if field not in LARGE_FIELDS}
+        pipe.hset(job_key(job_id), mapping=small)
+        _queue_large_fields(pipe, job_id, fields)
+        _queue_expire(pipe, job_id)
+        index_job(pipe, job)
+        publish_job_event(pipe, job)
+
+
+def queue_read_jobs(pipe, job_ids: List[str], include_large: bool = True):
+    for job_id in job_ids:
+        pipe.hgetall(job_key(job_id))
+    if include_large:
+        pipe.mget([large_field_key(job_id, field) for job_id in job_ids for field in LARGE_FIELDS])
+
+
+def parse_read_jobs(job_ids: List[str], results: list, include_large: bool = True) -> List[Optional[dict]]:
+    """Decode the results of queue_read_jobs; None for ids that no longer exist"""
+    large_values = results[len(job_ids)] if include_large else []
+    jobs = []
+    for position, raw in enumerate(results[:len(job_ids)]):
+        if not raw:
+            jobs.append(None)
+            continue
+        job = _decode_hash(raw)
+        if include_large:
+            offset = position * len(LARGE_FIELDS)
+            for field, value in zip(LARGE_FIELDS, large_values[offset:offset + len(LARGE_FIELDS)]):
+                job[field] = json.loads(value) if value is not None else None
+        jobs.append(job)
+    return jobs
+
+
+def write_job(redis_client, job: dict):
+    """Write a complete job record (creation, reset), replacing any previous one"""
+    write_jobs(redis_client, [job])
+
+
+def write_jobs(redis_client, jobs: List[dict]):
+    """write_job for several jobs in one pipelined transaction"""
+    pipe = redis_client.pipeline()
+    queue_write_jobs(pipe, jobs)
+    pipe.execute()
+
+
+def update_job_fields(redis_client, job_id: str, **fields) -> Optional[dict]:
+    """
+    Write only the given fields of an existing job. Returns the job's event
+    fields after the update, or None if the job does not exist (or expired).
+    """
+    return update_jobs_fields(redis_client, {job_id: fields}).get(job_id)
+
+
+def update_jobs_fields(redis_client, updates: Dict[str, dict]) -> Dict[str, dict]:
+    """Partial updates for several jobs in one transaction; returns the updated jobs' event fields"""
+    updates = stamp_updates(updates)
+    job_ids = list(updates)
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(*[job_key(job_id) for job_id in job_ids])
+                read_backs = [pipe.hmget(job_key(job_id), *READ_BACK_FIELDS) for job_id in job_ids]
+                current = merge_read_backs(updates, read_backs)
+                if not current:
+                    pipe.unwatch()
+                    return {}
+                pipe.multi()
+                queue_field_updates(pipe, updates, current)
+                pipe.execute()
+                return current
+            except redis.WatchError:
+                # Another write to one of these jobs landed first; re-read and retry
+                continue
+
+
+def read_jobs(redis_client, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+    """Load job records in one pipelined round trip; None for ids that no longer exist"""
+    if not job_ids:
+        return []
+    pipe = redis_client.pipeline(transaction=False)
+    queue_read_jobs(pipe, job_ids, include_large)
+    return parse_read_jobs(job_ids, pipe.execute(), include_large)
+
+
+def read_job(redis_client, job_id: str, include_large: bool = True) -> Optional[dict]:
+    return read_jobs(redis_client, [job_id], include_large)[0]
+
+
+def load_indexed_jobs(redis_client, job_ids: List[str], include_large: bool = True) -> List[dict]:
+    """read_jobs for ids taken from an index, unindexing ids whose records have expired"""
+    jobs = read_jobs(redis_client, job_ids, include_large)
+    missing = [job_id for job_id, job in zip(job_ids, jobs) if job is None]
+    if missing:
+        unindex_jobs(redis_client, missing)
+    return [job for job in jobs if job is not None]
+
+
+def list_job_page(redis_client, statuses=None, created_after=None, created_before=None,
+                  cursor=None, limit=None, include_large: bool = True) -> dict:
+    """
+    One page of jobs, newest first.
+    Returns: {"jobs": [...], "next_cursor": str | None}
+    """
+    kwargs = {"limit": limit} if limit else {}
+    job_ids, next_cursor = page_job_ids(redis_client, statuses, created_after, created_before, cursor, **kwargs)
+    return {"jobs": load_indexed_jobs(redis_client, job_ids, include_large), "next_cursor": next_cursor}
@@ -0,0 +1,496 @@
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from . import job_records
+from .job_events import publish_job_event
+from .job_index import (
+    JOB_TTL_SECONDS, JOBS_BY_CREATED_KEY, JOBS_BY_UPDATED_KEY, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    decode_cursor, encode_cursor, job_ids_in_range, job_key, list_memory_job_page, prune_expired_jobs,
+    status_index_key, status_value, timestamp_score, unindex_jobs
+)
+
+logger = logging.getLogger(__name__)
+
+# redis | sqlite | memory; by default Redis when a client is available, otherwise memory
+JOB_STORE_BACKEND = os.getenv("JOB_STORE", "")
+JOB_STORE_SQLITE_PATH = os.getenv("JOB_STORE_SQLITE_PATH", "jobs.sqlite3")
+
+# Minimum spacing between coalesced progress writes for one job
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "1.0"))
+
+# Writing any of these flushes immediately: clients must never miss a state change
+URGENT_FIELDS = ("status", "error", "stage", "completed_at") + job_records.LARGE_FIELDS
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def normalize_job(job: dict) -> dict:
+    """Same schema in every backend: plain string statuses, JSON-compatible values"""
+    job = dict(job)
+    if "status" in job:
+        job["status"] = status_value(job["status"])
+    return job
+
+
+def strip_large_fields(job: dict) -> dict:
+    return {field: value for field, value in job.items() if field not in job_records.LARGE_FIELDS}
+
+
+class JobStore:
+    """
+    Job records shared by the API, the Celery worker and the direct-processing path.
+
+    Every backend stores the same schema (the job dict written by the API,
+    with `result` and `analysis` as large fields that listings can skip) and
+    offers the same batched operations.
+    """
+
+    storage_type = "base"
+
+    # Redis client for pub/sub job events, when the backend has one
+    redis_client = None
+
+    def save(self, job: dict):
+        """Write a complete job record, replacing any previous one"""
+        self.save_many([job])
+
+    def save_many(self, jobs: List[dict]):
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        """
+        Write only the given fields of an existing job; returns it without its
+        large fields, or None if the job does not exist (or expired)
+        """
+        return self.update_many({job_id: fields}).get(job_id)
+
+    def update_many(self, updates: Dict[str, dict]) -> Dict[str, dict]:
+        """update() for several jobs; unknown or expired ids are skipped"""
+        raise NotImplementedError
+
+    def get(self, job_id: str, include_large: bool = True) -> Optional[dict]:
+        return self.get_many([job_id], include_large)[0]
+
+    def get_many(self, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+        """Records in the order of `job_ids`, None for unknown or expired ids"""
+        raise NotImplementedError
+
+    def list(self, statuses: Optional[List[str]] = None, created_after=None, created_before=None,
+             cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, include_large: bool = True) -> dict:
+        """
+        One page of jobs, newest first.
+        Returns: {"jobs": [...], "next_cursor": str | None}
+        """
+        raise NotImplementedError
+
+    def list_by_status(self, status: str, include_large: bool = False) -> List[dict]:
+        raise NotImplementedError
+
+    def list_updated_since(self, since, limit: int = 50, include_large: bool = False) -> List[dict]:
+        """Jobs updated at or after `since`, most recently updated first"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def delete(self, job_ids: List[str]):
+        raise NotImplementedError
+
+    def prune_expired(self) -> int:
+        """Drop records (or index entries) past JOB_TTL_SECONDS; returns how many"""
+        raise NotImplementedError
+
+
+class RedisJobStore(JobStore):
+    """Hash-per-job records with sorted-set indexes (see job_records and job_index)"""
+
+    storage_type = "redis"
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def save_many(self, jobs: List[dict]):
+        job_records.write_jobs(self.redis_client, [normalize_job(job) for job in jobs])
+
+    def update_many(self, updates: Dict[str, dict]) -> Dict[str, dict]:
+        return job_records.update_jobs_fields(
+            self.redis_client, {job_id: normalize_job(fields) for job_id, fields in updates.items()}
+        )
+
+    def get_many(self, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+        return job_records.read_jobs(self.redis_client, job_ids, include_large)
+
+    def list(self, statuses=None, created_after=None, created_before=None,
+             cursor=None, limit=DEFAULT_PAGE_SIZE, include_large=True) -> dict:
+        return job_records.list_job_page(
+            self.redis_client, statuses, created_after, created_before, cursor, limit, include_large
+        )
+
+    def list_by_status(self, status: str, include_large: bool = False) -> List[dict]:
+        job_ids = job_ids_in_range(self.redis_client, status_index_key(status))
+        return job_records.load_indexed_jobs(self.redis_client, job_ids, include_large)
+
+    def list_updated_since(self, since, limit: int = 50, include_large: bool = False) -> List[dict]:
+        job_ids = job_ids_in_range(self.redis_client, JOBS_BY_UPDATED_KEY, min_score=timestamp_score(since), limit=limit)
+        return job_records.load_indexed_jobs(self.redis_client, job_ids, include_large)
+
+    def count(self) -> int:
+        return self.redis_client.zcard(JOBS_BY_CREATED_KEY)
+
+    def delete(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        keys = [job_key(job_id) for job_id in job_ids]
+        keys += [job_records.large_field_key(job_id, field) for job_id in job_ids for field in job_records.LARGE_FIELDS]
+        self.redis_client.delete(*keys)
+        unindex_jobs(self.redis_client, job_ids)
+
+    def prune_expired(self) -> int:
+        # Records expire on their own; only the index entries need cleaning up
+        return prune_expired_jobs(self.redis_client)
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store for development without Redis"""
+
+    storage_type = "memory"
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, job_id: str) -> bool:
+        return job_id in self._jobs and self._expires.get(job_id, 0) > time.time()
+
+    def save_many(self, jobs: List[dict]):
+        with self._lock:
+            for job in jobs:
+                job = normalize_job(copy.deepcopy(job))
+                self._jobs[job["job_id"]] = job
+                self._expires[job["job_id"]] = time.time() + self.ttl_seconds
+
+    def update_many(self, updates: Dict[str, dict]) -> Dict[str, dict]:
+        results = {}
+        with self._lock:
+            for job_id, fields in updates.items():
+                if not self._alive(job_id):
+                    continue
+                job = self._jobs[job_id]
+                job.update(normalize_job(copy.deepcopy(fields)))
+                if "updated_at" not in fields:
+                    job["updated_at"] = _now_iso()
+                self._expires[job_id] = time.time() + self.ttl_seconds
+                results[job_id] = strip_large_fields(copy.deepcopy(job))
+        return results
+
+    def get_many(self, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+        with self._lock:
+            jobs = [copy.deepcopy(self._jobs[job_id]) if self._alive(job_id) else None for job_id in job_ids]
+        if not include_large:
+            jobs = [strip_large_fields(job) if job else None for job in jobs]
+        return jobs
+
+    def _snapshot(self, include_large: bool) -> List[dict]:
+        with self._lock:
+            jobs = [copy.deepcopy(job) for job_id, job in self._jobs.items() if self._alive(job_id)]
+        return jobs if include_large else [strip_large_fields(job) for job in jobs]
+
+    def list(self, statuses=None, created_after=None, created_before=None,
+             cursor=None, limit=DEFAULT_PAGE_SIZE, include_large=True) -> dict:
+        return list_memory_job_page(
+            self._snapshot(include_large), statuses, created_after, created_before, cursor, limit
+        )
+
+    def list_by_status(self, status: str, include_large: bool = False) -> List[dict]:
+        return [job for job in self._snapshot(include_large) if job.get("status") == status]
+
+    def list_updated_since(self, since, limit: int = 50, include_large: bool = False) -> List[dict]:
+        since_score = timestamp_score(since)
+        jobs = [
+            job for job in self._snapshot(include_large)
+            if timestamp_score(job.get("updated_at") or job.get("created_at")) >= since_score
+        ]
+        jobs.sort(key=lambda job: timestamp_score(job.get("updated_at") or job.get("created_at")), reverse=True)
+        return jobs[:limit]
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(1 for job_id in self._jobs if self._alive(job_id))
+
+    def delete(self, job_ids: List[str]):
+        with self._lock:
+            for job_id in job_ids:
+                self._jobs.pop(job_id, None)
+                self._expires.pop(job_id, None)
+
+    def prune_expired(self) -> int:
+        with self._lock:
+            expired = [job_id for job_id in self._jobs if not self._alive(job_id)]
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._expires.pop(job_id, None)
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Single-node store in a SQLite database in WAL mode, so the API and a
+    local worker can share jobs without Redis. Small fields are kept as a
+    JSON document; status and timestamps are columns backing the indexes.
+    When a Redis client is given, committed changes are also published as
+    job events like RedisJobStore does; without one, event streams poll.
+    """
+
+    storage_type = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT,
+            created_score REAL NOT NULL,
+            updated_score REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            fields TEXT NOT NULL,
+            result TEXT,
+            analysis TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_by_created ON jobs (created_score, job_id);
+        CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_score, job_id);
+        CREATE INDEX IF NOT EXISTS jobs_by_updated ON jobs (updated_score);
+    """
+
+    def __init__(self, path: str = JOB_STORE_SQLITE_PATH, ttl_seconds: int = JOB_TTL_SECONDS, redis_client=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed while a writer commits
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _row(self, job: dict):
+        small = strip_large_fields(job)
+        created_at = job.get("created_at") or _now_iso()
+        return (
+            job["job_id"],
+            job.get("status"),
+            timestamp_score(created_at),
+            timestamp_score(job.get("updated_at") or created_at),
+            time.time() + self.ttl_seconds,
+            json.dumps(small),
+            json.dumps(job.get("result")) if job.get("result") is not None else None,
+            json.dumps(job.get("analysis")) if job.get("analysis") is not None else None,
+        )
+
+    def _write_rows(self, connection, rows):
+        connection.executemany(
+            "INSERT OR REPLACE INTO jobs "
+            "(job_id, status, created_score, updated_score, expires_at, fields, result, analysis) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    @staticmethod
+    def _decode_row(fields, result, analysis, include_large: bool) -> dict:
+        job = json.loads(fields)
+        if include_large:
+            job["result"] = json.loads(result) if result is not None else None
+            job["analysis"] = json.loads(analysis) if analysis is not None else None
+        return job
+
+    def _publish(self, jobs: List[dict]):
+        """Job events for committed changes, in one round trip; failures never fail the write"""
+        if not self.redis_client or not jobs:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for job in jobs:
+                publish_job_event(pipe, job)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to publish job events: {e}")
+
+    def save_many(self, jobs: List[dict]):
+        connection = self._connection()
+        jobs = [normalize_job(job) for job in jobs]
+        rows = [self._row(job) for job in jobs]
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._write_rows(connection, rows)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self._publish(jobs)
+
+    def update_many(self, updates: Dict[str, dict]) -> Dict[str, dict]:
+        connection = self._connection()
+        results = {}
+        # One write transaction for the whole batch
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._select(connection, list(updates), include_large=True, include_expired=False)
+            rows = []
+            for job_id, fields in updates.items():
+                job = existing.get(job_id)
+                if job is None:
+                    continue
+                job.update(normalize_job(fields))
+                if "updated_at" not in fields:
+                    job["updated_at"] = _now_iso()
+                rows.append(self._row(job))
+                results[job_id] = strip_large_fields(job)
+            self._write_rows(connection, rows)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self._publish(list(results.values()))
+        return results
+
+    def _select(self, connection, job_ids: List[str], include_large: bool, include_expired: bool = False) -> dict:
+        if not job_ids:
+            return {}
+        placeholders = ",".join("?" * len(job_ids))
+        query = f"SELECT job_id, fields, result, analysis FROM jobs WHERE job_id IN ({placeholders})"
+        params = list(job_ids)
+        if not include_expired:
+            query += " AND expires_at > ?"
+            params.append(time.time())
+        return {
+            job_id: self._decode_row(fields, result, analysis, include_large)
+            for job_id, fields, result, analysis in connection.execute(query, params)
+        }
+
+    def get_many(self, job_ids: List[str], include_large: bool = True) -> List[Optional[dict]]:
+        found = self._select(self._connection(), job_ids, include_large)
+        return [found.get(job_id) for job_id in job_ids]
+
+    def _query(self, where: List[str], params: list, order: str, limit: int, include_large: bool) -> List[tuple]:
+        where = ["expires_at > ?"] + where
+        params = [time.time()] + params
+        columns = "job_id, created_score, fields, result, analysis" if include_large else "job_id, created_score, fields, NULL, NULL"
+        query = f"SELECT {columns} FROM jobs WHERE {' AND '.join(where)} ORDER BY {order} LIMIT ?"
+        return self._connection().execute(query, params + [limit]).fetchall()
+
+    def list(self, statuses=None, created_after=None, created_before=None,
+             cursor=None, limit=DEFAULT_PAGE_SIZE, include_large=True) -> dict:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = [], []
+        if statuses:
+            where.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if created_after:
+            where.append("created_score >= ?")
+            params.append(timestamp_score(created_after))
+        if created_before:
+            where.append("created_score <= ?")
+            params.append(timestamp_score(created_before))
+        if cursor:
+            score, job_id = decode_cursor(cursor)
+            where.append("(created_score < ? OR (created_score = ? AND job_id < ?))")
+            params.extend([score, score, job_id])
+
+        rows = self._query(where, params, "created_score DESC, job_id DESC", limit + 1, include_large)
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+        return {
+            "jobs": [self._decode_row(fields, result, analysis, include_large) for _, _, fields, result, analysis in page],
+            "next_cursor": next_cursor,
+        }
+
+    def list_by_status(self, status: str, include_large: bool = False) -> List[dict]:
+        rows = self._query(["status = ?"], [status], "created_score DESC", -1, include_large)
+        return [self._decode_row(fields, result, analysis, include_large) for _, _, fields, result, analysis in rows]
+
+    def list_updated_since(self, since, limit: int = 50, include_large: bool = False) -> List[dict]:
+        rows = self._query(["updated_score >= ?"], [timestamp_score(since)], "updated_score DESC", limit, include_large)
+        return [self._decode_row(fields, result, analysis, include_large) for _, _, fields, result, analysis in rows]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def delete(self, job_ids: List[str]):
+        if job_ids:
+            self._connection().execute(
+                f"DELETE FROM jobs WHERE job_id IN ({','.join('?' * len(job_ids))})", list(job_ids)
+            )
+
+    def prune_expired(self) -> int:
+        return self._connection().execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+def create_job_store(redis_client=None, backend: str = JOB_STORE_BACKEND) -> JobStore:
+    """Job store selected by JOB_STORE (redis, sqlite or memory)"""
+    backend = (backend or ("redis" if redis_client else "memory")).lower()
+    if backend == "redis":
+        if not redis_client:
+            raise ValueError("JOB_STORE=redis requires a Redis connection")
+        return RedisJobStore(redis_client)
+    if backend == "sqlite":
+        return SQLiteJobStore(redis_client=redis_client)
+    if backend == "memory":
+        return MemoryJobStore()
+    raise ValueError(f"Unknown job store backend: {backend}. Valid backends: redis, sqlite, memory")
+
+
+class CoalescingJobWriter:
+    """
+    Buffers field updates for one job and writes them as a single update at
+    most every `min_interval` seconds. Status changes, errors and large
+    fields flush immediately. Safe to call from worker threads.
+    """
+
+    def __init__(self, store: JobStore, job_id: str, min_interval: float = PROGRESS_FLUSH_SECONDS):
+        self.store = store
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._pending = {}
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self._pending.update(fields)
+            urgent = any(field in URGENT_FIELDS for field in fields)
+            if urgent or time.monotonic() - self._last_flush >= self.min_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        fields, self._pending = self._pending, {}
+        self._last_flush = time.monotonic()
+        try:
+            self.store.update(self.job_id, **fields)
+        except Exception as e:
+            logger.warning(f"Failed to write progress for job {self.job_id}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
@@ -0,0 +1,187 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Provider quotas per minute; 0 disables a dimension.
+# Whisper is limited by requests and seconds of audio, Gemini by requests and tokens.
+PROVIDER_LIMITS = {
+    "openai": {
+        "requests": float(os.getenv("OPENAI_RPM", "500")),
+        "audio_seconds": float(os.getenv("OPENAI_AUDIO_MINUTES_PER_MINUTE", "0")) * 60,
+    },
+    "gemini": {
+        "requests": float(os.getenv("GEMINI_RPM", "2000")),
+        "tokens": float(os.getenv("GEMINI_TPM", "4000000")),
+    },
+}
+
+# Aim slightly under quota so clock skew and in-flight requests never tip us into 429s
+RATE_LIMIT_HEADROOM = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+# Bucket size in seconds of quota: small bursts pass immediately, sustained load is paced
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+# Callers give up after this long (below the task soft time limit)
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "600"))
+
+# Re-check at least this often while waiting, since other workers may drain or refill the buckets
+MAX_SLEEP_SECONDS = 5.0
+
+
+class RateLimitTimeoutError(Exception):
+    """Raised when capacity did not free up within the maximum wait"""
+    pass
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)"""
+    return len(text or "") // 4 + 1
+
+
+class RateLimiter:
+    """
+    Token buckets for one provider, shared by every worker through Redis
+    (a process-wide fallback without it).
+
+    Each dimension (requests, audio seconds, tokens) refills continuously at
+    its per-minute quota times RATE_LIMIT_HEADROOM. acquire() takes capacity
+    from all dimensions at once, sleeping until enough has refilled, so
+    throughput stays just under quota instead of bursting into 429s.
+    A request larger than a bucket is let through when the bucket is full and
+    leaves it in debt, which later requests wait out.
+    """
+
+    # In-memory fallback shared by every instance in the process: key -> [tokens, updated_at]
+    _memory_buckets = {}
+    _memory_lock = threading.Lock()
+
+    def __init__(self, provider: str, redis_client=None, limits: Optional[Dict[str, float]] = None,
+                 headroom: float = RATE_LIMIT_HEADROOM, burst_seconds: float = RATE_LIMIT_BURST_SECONDS,
+                 max_wait_seconds: float = RATE_LIMIT_MAX_WAIT_SECONDS):
+        self.provider = provider
+        self.redis_client = redis_client
+        self.max_wait_seconds = max_wait_seconds
+        limits = PROVIDER_LIMITS.get(provider, {}) if limits is None else limits
+        # dimension -> (refill per second, capacity)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        for dimension, per_minute in limits.items():
+            if per_minute > 0:
+                rate = per_minute * headroom / 60
+                self._buckets[dimension] = (rate, max(rate * burst_seconds, 1.0))
+
+    def tracks(self, dimension: str) -> bool:
+        return dimension in self._buckets
+
+    def _key(self, dimension: str) -> str:
+        return f"ratelimit:{self.provider}:{dimension}"
+
+    def acquire(self, **costs: float):
+        """Block until every dimension has capacity for its cost, then take it"""
+        costs = {dimension: cost for dimension, cost in costs.items() if dimension in self._buckets and cost > 0}
+        if not costs:
+            return
+
+        deadline = time.monotonic() + self.max_wait_seconds
+        waited = 0.0
+        while True:
+            try:
+                wait = self._try_acquire(costs)
+            except redis.RedisError as e:
+                # Never block provider calls on a Redis outage
+                logger.warning(f"Rate limiter unavailable for {self.provider}, proceeding: {e}")
+                return
+            if wait <= 0:
+                if waited:
+                    logger.info(f"Waited {waited:.1f}s for {self.provider} capacity")
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeoutError(f"{self.provider} rate limit capacity not available within {self.max_wait_seconds:.0f}s")
+            # Jitter keeps workers that woke together from contending on the same refill
+            sleep = min(wait, MAX_SLEEP_SECONDS) + random.uniform(0, 0.05)
+            time.sleep(sleep)
+            waited += sleep
+
+    def drain(self):
+        """Empty the buckets after a 429, so every worker backs off until they refill"""
+        try:
+            if self.redis_client:
+                now = self._redis_now(self.redis_client)
+                pipe = self.redis_client.pipeline()
+                for dimension in self._buckets:
+                    pipe.hset(self._key(dimension), mapping={"tokens": 0, "updated_at": now})
+                pipe.execute()
+            else:
+                with self._memory_lock:
+                    for dimension in self._buckets:
+                        self._memory_buckets[self._key(dimension)] = [0.0, time.monotonic()]
+        except redis.RedisError as e:
+            logger.warning(f"Failed to drain {self.provider} rate limit buckets: {e}")
+
+    def _level(self, dimension: str, tokens, updated_at, now: float) -> float:
+        rate, capacity = self._buckets[dimension]
+        if tokens is None:
+            return capacity
+        return min(capacity, float(tokens) + max(0.0, now - float(updated_at)) * rate)
+
+    def _wait_for(self, levels: Dict[str, float], costs: Dict[str, float]) -> float:
+        """Seconds until every bucket can cover its cost; 0 if they already can"""
+        wait = 0.0
+        for dimension, cost in costs.items():
+            rate, capacity = self._buckets[dimension]
+            need = min(cost, capacity)
+            if levels[dimension] < need:
+                wait = max(wait, (need - levels[dimension]) / rate)
+        return wait
+
+    @staticmethod
+    def _redis_now(client) -> float:
+        # Redis server time, so buckets do not depend on worker clocks agreeing
+        seconds, microseconds = client.time()
+        return seconds + microseconds / 1_000_000
+
+    def _try_acquire(self, costs: Dict[str, float]) -> float:
+        if not self.redis_client:
+            return self._try_acquire_memory(costs)
+
+        keys = [self._key(dimension) for dimension in costs]
+        with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*keys)
+                    now = self._redis_now(pipe)
+                    levels = {}
+                    for dimension, key in zip(costs, keys):
+                        tokens, updated_at = pipe.hmget(key, "tokens", "updated_at")
+                        levels[dimension] = self._level(dimension, tokens, updated_at, now)
+                    wait = self._wait_for(levels, costs)
+                    if wait > 0:
+                        pipe.unwatch()
+                        return wait
+                    pipe.multi()
+                    for dimension, key in zip(costs, keys):
+                        pipe.hset(key, mapping={"tokens": levels[dimension] - costs[dimension], "updated_at": now})
+                        pipe.expire(key, 3600)
+                    pipe.execute()
+                    return 0.0
+                except redis.WatchError:
+                    # Another worker took capacity in between; re-read the buckets
+                    continue
+
+    def _try_acquire_memory(self, costs: Dict[str, float]) -> float:
+        with self._memory_lock:
+            now = time.monotonic()
+            levels = {}
+            for dimension in costs:
+                tokens, updated_at = self._memory_buckets.get(self._key(dimension), (None, None))
+                levels[dimension] = self._level(dimension, tokens, updated_at, now)
+            wait = self._wait_for(levels, costs)
+            if wait > 0:
+                return wait
+            for dimension, cost in costs.items():
+                self._memory_buckets[self._key(dimension)] = [levels[dimension] - cost, now]
+            return 0.0
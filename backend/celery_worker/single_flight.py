@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# The leader's lock is renewed while it runs, so this only bounds how long a
+# crashed leader blocks the key
+SINGLE_FLIGHT_LOCK_SECONDS = int(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", "60"))
+# Followers give up and make their own call after this long (below the task soft time limit)
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", str(20 * 60)))
+# Followers that subscribe just after the leader published still find the result here
+RESULT_TTL_SECONDS = 60
+
+_RETRY = object()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: one caller (the leader)
+    runs the function while the others wait for its result instead of
+    repeating the provider call.
+
+    With Redis this works across workers: the leader holds a lock key,
+    renewed while it runs, and publishes the result on a channel. Without
+    Redis, calls are coalesced within the process. Results must be JSON
+    serializable.
+    """
+
+    # In-process flights shared by every instance: key -> {"done", "shared", "result"}
+    _local_flights = {}
+    _local_lock = threading.Lock()
+
+    def __init__(self, redis_client=None, lock_seconds: int = SINGLE_FLIGHT_LOCK_SECONDS,
+                 wait_seconds: int = SINGLE_FLIGHT_WAIT_SECONDS):
+        self.redis_client = redis_client
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"singleflight:{key}:lock"
+
+    @staticmethod
+    def _result_key(key: str) -> str:
+        return f"singleflight:{key}:result"
+
+    @staticmethod
+    def _channel(key: str) -> str:
+        return f"singleflight:{key}"
+
+    def run(self, key: str, func: Callable[[], Any], share: Optional[Callable[[Any], bool]] = None):
+        """
+        Return func() if no identical call is in flight, otherwise the
+        in-flight call's result. share(result) decides whether followers may
+        use a result (e.g. not provider errors); if not, they call func themselves.
+        """
+        if not self.redis_client:
+            return self._run_local(key, func, share)
+
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            try:
+                token = self._acquire(key)
+                outcome = _RETRY if token else self._follow(key, deadline)
+            except Exception as e:
+                logger.warning(f"Single-flight coordination failed for {key}, calling directly: {e}")
+                break
+            if token:
+                return self._lead(key, token, func, share)
+            if outcome is not _RETRY:
+                logger.info(f"Reused in-flight result for {key}")
+                return outcome
+        return func()
+
+    def _acquire(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self.redis_client.set(self._lock_key(key), token, nx=True, ex=self.lock_seconds):
+            # Followers of this flight must not pick up the previous flight's result
+            self.redis_client.delete(self._result_key(key))
+            return token
+        return None
+
+    def _owns_lock(self, pipe, key: str, token: str) -> bool:
+        current = pipe.get(self._lock_key(key))
+        if isinstance(current, bytes):
+            current = current.decode("utf-8")
+        return current == token
+
+    def _renew_or_release(self, key: str, token: str, release: bool):
+        """Extend or delete the lock, only while this caller still holds it"""
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(self._lock_key(key))
+                if not self._owns_lock(pipe, key, token):
+                    return
+                pipe.multi()
+                if release:
+                    pipe.delete(self._lock_key(key))
+                else:
+                    pipe.expire(self._lock_key(key), self.lock_seconds)
+                pipe.execute()
+            except redis.WatchError:
+                pass
+
+    def _keep_lock(self, key: str, token: str, stop: threading.Event):
+        while not stop.wait(self.lock_seconds / 3):
+            try:
+                self._renew_or_release(key, token, release=False)
+            except Exception as e:
+                logger.warning(f"Failed to renew single-flight lock for {key}: {e}")
+
+    def _lead(self, key: str, token: str, func, share):
+        stop = threading.Event()
+        threading.Thread(target=self._keep_lock, args=(key, token, stop), daemon=True).start()
+        payload = {"shared": False, "result": None}
+        try:
+            result = func()
+            payload = {"shared": bool(share(result)) if share else True, "result": result}
+            return result
+        finally:
+            stop.set()
+            try:
+                # Publish before releasing, so a follower that sees the lock gone finds the result
+                message = json.dumps(payload)
+                pipe = self.redis_client.pipeline()
+                pipe.setex(self._result_key(key), RESULT_TTL_SECONDS, message)
+                pipe.publish(self._channel(key), message)
+                pipe.execute()
+                self._renew_or_release(key, token, release=True)
+            except Exception as e:
+                logger.warning(f"Failed to publish single-flight result for {key}: {e}")
+
+    def _read_result(self, key: str):
+        message = self.redis_client.get(self._result_key(key))
+        return json.loads(message) if message is not None else None
+
+    def _follow(self, key: str, deadline: float):
+        """Wait for the leader. Returns its result, or _RETRY to try leading (leader failed or gone)."""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self._channel(key))
+            payload = self._read_result(key)
+            while payload is None and time.monotonic() < deadline:
+                message = pubsub.get_message(timeout=1.0)
+                if message and message["type"] == "message":
+                    payload = json.loads(message["data"])
+                elif not self.redis_client.exists(self._lock_key(key)):
+                    payload = self._read_result(key)
+                    if payload is None:
+                        return _RETRY
+        finally:
+            pubsub.close()
+
+        if payload is None or not payload["shared"]:
+            return _RETRY
+        return payload["result"]
+
+    def _run_local(self, key: str, func, share):
+        with self._local_lock:
+            flight = self._local_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._local_flights[key] = {"done": threading.Event(), "shared": False, "result": None}
+
+        if not leader:
+            if flight["done"].wait(self.wait_seconds) and flight["shared"]:
+                return flight["result"]
+            return func()
+
+        try:
+            result = func()
+            flight["result"] = result
+            flight["shared"] = bool(share(result)) if share else True
+            return result
+        finally:
+            with self._local_lock:
+                self._local_flights.pop(key, None)
+            flight["done"].set()
@@ -1,9 +1,20 @@
-from celery import Celery
+from celery import Celery, chain
+from celery.signals import worker_process_init
 import os
+import hashlib
 import tempfile
+import threading
 from typing import Optional
-from .whisper_client import WhisperClient
+from .whisper_client import WhisperClient, WHISPER_MODEL
 from .gemini_client import GeminiClient
+from .transcript_cache import TranscriptCache
+from .analysis_cache import AnalysisCache
+from .single_flight import SingleFlight
+from .rate_limiter import RateLimiter
+from .audio_transcoder import AudioTranscoder
+from .job_store import CoalescingJobWriter, create_job_store
+from .job_events import AnalysisDeltaPublisher
+from .job_index import stage_failure_fields
 from google.cloud import storage as gcs
 import redis
 import fakeredis
@@ -65,11 +76,54 @@ celery_app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
-# Initialize GCS client
-gcs_client = gcs.Client()
+# Each pipeline stage has its own queue so I/O-bound (fetch, transcribe, analyze,
+# finalize) and CPU-bound (transcode) worker pools can be sized independently, e.g.
+#   celery -A celery_worker.tasks worker -Q transcription.transcode --concurrency=4
+STAGE_QUEUES = {
+    "fetch": "transcription.fetch",
+    "transcode": "transcription.transcode",
+    "transcribe": "transcription.transcribe",
+    "analyze": "transcription.analyze",
+    "finalize": "transcription.finalize",
+}
 
-# Helper function to get the appropriate Redis client
-def get_redis_client():
+celery_app.conf.task_routes = {
+    "celery_worker.tasks.process_transcription_job": {"queue": STAGE_QUEUES["fetch"]},
+    "celery_worker.tasks.fetch_audio": {"queue": STAGE_QUEUES["fetch"]},
+    "celery_worker.tasks.transcode_audio": {"queue": STAGE_QUEUES["transcode"]},
+    "celery_worker.tasks.transcribe_audio": {"queue": STAGE_QUEUES["transcribe"]},
+    "celery_worker.tasks.analyze_transcript": {"queue": STAGE_QUEUES["analyze"]},
+    "celery_worker.tasks.finalize_job": {"queue": STAGE_QUEUES["finalize"]},
+}
+
+TRANSCRIPTION_MODELS = ["openai-whisper", "whisper-plus-gemini"]
+ANALYSIS_MODELS = ["whisper-plus-gemini", "gemini-analysis-only"]
+
+STAGE_MAX_RETRIES = 3
+STAGE_RETRY_COUNTDOWN = 60
+
+# Pipeline stages in execution order; each completed stage's output is checkpointed
+STAGES = ["fetch", "transcode", "transcribe", "analyze", "finalize"]
+
+# Checkpoints outlive the job record so a reset or late retry can still resume
+CHECKPOINT_TTL = 24 * 3600
+
+# Redis, GCS and provider clients are per worker process: created once (on
+# worker_process_init, i.e. after the prefork fork, so no connection pool is
+# shared between processes) and reused by every task the process runs.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _process_client(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+def _create_redis_client():
     """Get Redis client based on environment configuration"""
     use_local_mode = (
         os.getenv("ENVIRONMENT") == "development" or 
@@ -83,7 +137,161 @@ def get_redis_client():
     else:
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         print(f"TASKS: Using real Redis at {redis_url}")
-        return redis.from_url(redis_url)
+        return redis.from_url(redis_url, health_check_interval=30)
+
+def get_redis_client():
+    """This process's Redis client (its connection pool is shared by all tasks and threads)"""
+    return _process_client("redis", _create_redis_client)
+
+def get_job_store():
+    """Job store shared with the API (JOB_STORE selects redis, sqlite or memory)"""
+    return _process_client("job_store", lambda: create_job_store(get_redis_client()))
+
+def get_gcs_client():
+    return _process_client("gcs", gcs.Client)
+
+def get_whisper_client() -> WhisperClient:
+    return _process_client("whisper", lambda: WhisperClient(rate_limiter=RateLimiter("openai", get_redis_client())))
+
+def get_gemini_client() -> GeminiClient:
+    return _process_client(
+        "gemini",
+        lambda: GeminiClient(
+            cache=AnalysisCache(get_redis_client()),
+            single_flight=get_single_flight(),
+            rate_limiter=RateLimiter("gemini", get_redis_client()),
+        )
+    )
+
+def get_single_flight() -> SingleFlight:
+    """Coalesces identical provider calls in flight across all workers"""
+    return _process_client("single_flight", lambda: SingleFlight(get_redis_client()))
+
+@worker_process_init.connect
+def init_worker_clients(**kwargs):
+    """Set up this worker process's clients before it takes its first task"""
+    # Anything created in the parent before the fork holds sockets we must not share
+    _clients.clear()
+    for getter in (get_redis_client, get_job_store, get_gcs_client, get_whisper_client, get_gemini_client):
+        try:
+            getter()
+        except Exception as e:
+            # Tasks retry the creation lazily, and fail there with a proper job error
+            logger.warning(f"Worker client setup failed in {getter.__name__}: {e}")
+
+def update_job(job_id: str, **fields):
+    """
+    Write only the given fields of the job record, leaving the rest (and the
+    transcript and analysis, stored separately) untouched. With Redis the
+    change is also pushed to clients listening on /v1/transcripts/{job_id}/events.
+    """
+    return get_job_store().update(job_id, **fields)
+
+def get_bucket():
+    return get_gcs_client().bucket(os.getenv("GCS_BUCKET_NAME"))
+
+def download_to_temp(blob_name: str, filename: str) -> str:
+    """Download a GCS object to a temporary file and return its path"""
+    blob = get_bucket().blob(blob_name)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
+        blob.download_to_filename(temp_file.name)
+        return temp_file.name
+
+def blob_sha256(blob_name: str) -> str:
+    """SHA-256 of a GCS object, streamed without touching local disk"""
+    digest = hashlib.sha256()
+    with get_bucket().blob(blob_name).open("rb", chunk_size=8 * 1024 * 1024) as reader:
+        while True:
+            chunk = reader.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def checkpoint_key(job_id: str) -> str:
+    return f"job:{job_id}:checkpoints"
+
+def save_checkpoint(redis_client, job_id: str, stage: str, ctx: dict):
+    """Persist a stage's output so retries and resets resume after it"""
+    pipe = redis_client.pipeline()
+    pipe.hset(checkpoint_key(job_id), stage, json.dumps(ctx))
+    pipe.expire(checkpoint_key(job_id), CHECKPOINT_TTL)
+    pipe.execute()
+
+def load_checkpoint(redis_client, job_id: str, stage: str):
+    """Output of a completed stage, or None if the stage has not completed"""
+    checkpoint = redis_client.hget(checkpoint_key(job_id), stage)
+    return json.loads(checkpoint) if checkpoint else None
+
+def clear_analysis_checkpoints(redis_client, job_id: str):
+    """Forget the analyze and finalize stages, so a reset job re-runs the analysis (transcription stays reused)"""
+    redis_client.hdel(checkpoint_key(job_id), "analyze", "finalize")
+
+def latest_checkpoint(redis_client, job_id: str):
+    """
+    The last completed stage and its output.
+    Returns: (stage, ctx), or (None, None) when nothing has completed yet
+    """
+    checkpoints = redis_client.hgetall(checkpoint_key(job_id))
+    completed = {
+        (stage.decode() if isinstance(stage, bytes) else stage): value
+        for stage, value in checkpoints.items()
+    }
+    for stage in reversed(STAGES):
+        if stage in completed:
+            return stage, json.loads(completed[stage])
+    return None, None
+
+def handle_stage_failure(task, ctx: dict, stage: str, exc: Exception):
+    """Retry only the failed stage; mark the job failed once retries are exhausted"""
+    job_id = ctx["job_id"]
+    logger.error(f"Job {job_id} failed in {stage} stage: {str(exc)}")
+    
+    retries_left = task.request.retries < STAGE_MAX_RETRIES
+    try:
+        update_job(job_id, **stage_failure_fields(stage, str(exc), will_retry=retries_left))
+    except Exception:
+        pass
+    
+    # Re-raise the exception for Celery to handle
+    raise task.retry(exc=exc, countdown=STAGE_RETRY_COUNTDOWN, max_retries=STAGE_MAX_RETRIES)
+
+def run_stage(task, ctx: dict, stage: str, work, resumable: bool = True, checkpoint_if=None):
+    """
+    Run one pipeline stage with checkpointing.
+    A resumable stage that already completed for this job (redelivered
+    message, job reset) returns its saved output instead of doing the work again.
+    checkpoint_if(ctx) decides whether an output is worth resuming from.
+    """
+    redis_client = get_redis_client()
+    checkpoint = load_checkpoint(redis_client, ctx["job_id"], stage) if resumable else None
+    if checkpoint is not None:
+        logger.info(f"Job {ctx['job_id']} {stage} stage already completed, resuming from checkpoint")
+        return checkpoint
+    
+    try:
+        if task.request.retries:
+            # Back from "retrying" for the duration of the new attempt
+            update_job(ctx["job_id"], status="processing", message=f"Retrying {stage}...", stage=stage)
+        ctx = work(redis_client, ctx)
+        if checkpoint_if is None or checkpoint_if(ctx):
+            save_checkpoint(redis_client, ctx["job_id"], stage, ctx)
+        return ctx
+    except Exception as e:
+        handle_stage_failure(task, ctx, stage, e)
+
+def build_transcription_pipeline(ctx: dict, start_stage: str = "fetch"):
+    """fetch -> transcode -> transcribe -> analyze -> finalize, each stage on its own queue"""
+    stage_tasks = {
+        "fetch": fetch_audio,
+        "transcode": transcode_audio,
+        "transcribe": transcribe_audio,
+        "analyze": analyze_transcript,
+        "finalize": finalize_job,
+    }
+    remaining = STAGES[STAGES.index(start_stage):]
+    first, rest = remaining[0], remaining[1:]
+    return chain(stage_tasks[first].s(ctx), *[stage_tasks[stage].s() for stage in rest])
 
 @celery_app.task(bind=True)
 def process_transcription_job(
@@ -93,10 +301,12 @@ def process_transcription_job(
     filename: str,
     model: str = "openai-whisper",
     set_list: Optional[str] = None,
-    custom_prompt: Optional[str] = None
+    custom_prompt: Optional[str] = None,
+    audio_sha256: Optional[str] = None
 ):
     """
-    Process a transcription job using Celery.
+    Start the staged pipeline for a transcription job, resuming after the
+    last checkpointed stage if the job has run before.
     
     Args:
         job_id: Unique job identifier
@@ -105,109 +315,189 @@ def process_transcription_job(
         model: AI model to use
         set_list: Optional setlist for comparison
         custom_prompt: Optional custom analysis prompt
+        audio_sha256: SHA-256 of the uploaded audio, used to reuse existing transcripts
     """
-    try:
-        # Update job status to processing
-        redis_client = get_redis_client()
-        job_data = {
-            "job_id": job_id,
-            "filename": filename,
-            "status": "processing",
-            "progress": 10,
-            "message": "Downloading audio file...",
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-        }
-        redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
+    ctx = {
+        "job_id": job_id,
+        "gcs_file_path": gcs_file_path,
+        "filename": filename,
+        "model": model,
+        "set_list": set_list or "",
+        "custom_prompt": custom_prompt or "",
+        "audio_sha256": audio_sha256,
+        "transcoded": False,
+        "transcript": None,
+        "analysis": None,
+    }
+    
+    start_stage = "fetch"
+    last_stage, checkpoint = latest_checkpoint(get_redis_client(), job_id)
+    if last_stage:
+        # A fully checkpointed job only needs its final record rewritten
+        start_stage = STAGES[min(STAGES.index(last_stage) + 1, len(STAGES) - 1)]
+        ctx = checkpoint
+        logger.info(f"Job {job_id} resuming at {start_stage} stage")
+    
+    pipeline = build_transcription_pipeline(ctx, start_stage).apply_async()
+    logger.info(f"Job {job_id} pipeline started ({pipeline.id})")
+    return pipeline.id
+
+@celery_app.task(bind=True)
+def fetch_audio(self, ctx: dict):
+    """
+    Locate the upload, make sure its content hash is known and reuse an
+    existing transcript of the same audio when there is one.
+    """
+    def work(redis_client, ctx):
+        update_job(
+            ctx["job_id"],
+            status="processing", progress=10, message="Fetching audio file...", stage="fetch"
+        )
+        
+        if ctx["model"] not in TRANSCRIPTION_MODELS:
+            return ctx
+        
+        if not ctx["audio_sha256"]:
+            ctx["audio_sha256"] = blob_sha256(ctx["gcs_file_path"])
+        
+        cached_transcript = TranscriptCache(redis_client).get(ctx["audio_sha256"], WHISPER_MODEL)
+        if cached_transcript is not None:
+            ctx["transcript"] = cached_transcript
+            update_job(ctx["job_id"], progress=70, message="Reused existing transcript...")
+        
+        return ctx
+    
+    return run_stage(self, ctx, "fetch", work)
+
+@celery_app.task(bind=True)
+def transcode_audio(self, ctx: dict):
+    """Produce the 16 kHz mono artifact in shared storage (transcoded/ in GCS)"""
+    def work(redis_client, ctx):
+        if ctx["model"] not in TRANSCRIPTION_MODELS or ctx["transcript"] is not None:
+            return ctx
         
-        # Download file from GCS
-        bucket_name = os.getenv("GCS_BUCKET_NAME")
-        bucket = gcs_client.bucket(bucket_name)
-        blob = bucket.blob(gcs_file_path)
+        update_job(
+            ctx["job_id"],
+            progress=20, message="Optimizing audio for transcription...", stage="transcode"
+        )
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-            blob.download_to_filename(temp_file.name)
-            temp_file_path = temp_file.name
+        transcoder = AudioTranscoder(bucket=get_bucket())
+        if transcoder.fetch_cached(ctx["audio_sha256"]):
+            ctx["transcoded"] = True
+            return ctx
         
+        temp_file_path = download_to_temp(ctx["gcs_file_path"], ctx["filename"])
         try:
-            result = {}
-            
-            # Update progress
-            job_data["progress"] = 30
-            job_data["message"] = "Transcribing audio..."
-            job_data["updated_at"] = datetime.utcnow().isoformat()
-            redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-            
-            # Transcription step
-            if model in ["openai-whisper", "whisper-plus-gemini"]:
-                whisper_client = WhisperClient()
-                transcript = whisper_client.transcribe_audio(temp_file_path)
-                result["transcript"] = transcript
-                
-                # Update progress
-                job_data["progress"] = 70
-                job_data["message"] = "Transcription complete..."
-                job_data["updated_at"] = datetime.utcnow().isoformat()
-                redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-            
-            # Analysis step
-            if model in ["whisper-plus-gemini", "gemini-analysis-only"]:
-                job_data["progress"] = 80
-                job_data["message"] = "Analyzing with Gemini..."
-                job_data["updated_at"] = datetime.utcnow().isoformat()
-                redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-                
-                gemini_client = GeminiClient()
-                
-                # Use existing transcript or empty string
-                transcript_for_analysis = result.get("transcript", "")
-                
-                analysis = gemini_client.analyze_comedy_performance(
-                    transcript_for_analysis,
-                    set_list or "",
-                    custom_prompt
-                )
-                result["analysis"] = analysis
-            
-            # Update job as completed
-            job_data.update({
-                "status": "completed",
-                "progress": 100,
-                "message": "Processing complete",
-                "result": result,
-                "updated_at": datetime.utcnow().isoformat()
-            })
-            redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-            
-            logger.info(f"Job {job_id} completed successfully")
-            return result
-            
+            transcoded_path = transcoder.transcode(temp_file_path, ctx["audio_sha256"])
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            os.unlink(temp_file_path)
+        
+        # If transcoding fell back to the original file, the transcribe stage downloads the upload itself
+        ctx["transcoded"] = transcoded_path != temp_file_path
+        return ctx
     
-    except Exception as e:
-        logger.error(f"Job {job_id} failed: {str(e)}")
-        
-        # Update job as failed
-        job_data = {
-            "job_id": job_id,
-            "filename": filename,
-            "status": "failed",
-            "progress": 0,
-            "message": f"Processing failed: {str(e)}",
-            "error": str(e),
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-        }
+    return run_stage(self, ctx, "transcode", work)
+
+@celery_app.task(bind=True)
+def transcribe_audio(self, ctx: dict):
+    """Run Whisper on the transcoded artifact and record the transcript in the index"""
+    def work(redis_client, ctx):
+        if ctx["model"] not in TRANSCRIPTION_MODELS or ctx["transcript"] is not None:
+            return ctx
         
+        update_job(ctx["job_id"], progress=30, message="Transcribing audio...", stage="transcribe")
+        whisper_client = get_whisper_client()
+        
+        def on_chunk_done(done, total):
+            progress_writer.update(
+                progress=30 + int(40 * done / total),
+                message=f"Transcribing audio ({done}/{total} parts)..."
+            )
+        
+        def transcribe():
+            temp_file_path = None
+            audio_path = None
+            if ctx["transcoded"]:
+                audio_path = AudioTranscoder(bucket=get_bucket()).fetch_cached(ctx["audio_sha256"])
+            if not audio_path:
+                temp_file_path = download_to_temp(ctx["gcs_file_path"], ctx["filename"])
+                audio_path = temp_file_path
+            try:
+                transcript = whisper_client.transcribe_audio(audio_path, on_progress=on_chunk_done)
+            finally:
+                if temp_file_path and os.path.exists(temp_file_path):
+                    os.unlink(temp_file_path)
+            
+            if not whisper_client.mock_mode:
+                TranscriptCache(redis_client).put(ctx["audio_sha256"], whisper_client.model, transcript)
+            return transcript
+        
+        # Parallel chunk completions arrive in bursts; coalesce them into few writes
+        progress_writer = CoalescingJobWriter(get_job_store(), ctx["job_id"])
         try:
-            redis_client = get_redis_client()
-            redis_client.setex(f"job:{job_id}", 3600, json.dumps(job_data))
-        except:
-            pass
+            # A job for the same audio already transcribing elsewhere (reset, double submit) is awaited, not repeated
+            ctx["transcript"] = get_single_flight().run(
+                f"whisper:{whisper_client.model}:{ctx['audio_sha256']}", transcribe
+            )
+        finally:
+            progress_writer.flush()
         
-        # Re-raise the exception for Celery to handle
-        raise self.retry(exc=e, countdown=60, max_retries=3)
\ No newline at end of file
+        update_job(ctx["job_id"], progress=70, message="Transcription complete...")
+        return ctx
+    
+    return run_stage(self, ctx, "transcribe", work)
+
+def analysis_succeeded(ctx: dict) -> bool:
+    """True unless the stage produced a failed analysis (skipped analyses count as done)"""
+    analysis = ctx.get("analysis")
+    return not isinstance(analysis, dict) or analysis.get("success", True)
+
+@celery_app.task(bind=True)
+def analyze_transcript(self, ctx: dict):
+    """Gemini comedy analysis of the transcript"""
+    def work(redis_client, ctx):
+        if ctx["model"] not in ANALYSIS_MODELS:
+            return ctx
+        
+        update_job(ctx["job_id"], progress=80, message="Analyzing with Gemini...", stage="analyze")
+        
+        gemini_client = get_gemini_client()
+        
+        # Use existing transcript or empty string; partial output is relayed as job events
+        analysis = gemini_client.analyze_comedy_performance(
+            ctx["transcript"] or "",
+            ctx["set_list"],
+            ctx["custom_prompt"],
+            on_delta=AnalysisDeltaPublisher(redis_client, ctx["job_id"]).publish
+        )
+        
+        # Retry provider errors (the transcript stays checkpointed); keep the error result on the last attempt
+        if not analysis.get("success") and self.request.retries < STAGE_MAX_RETRIES:
+            raise Exception(f"Gemini analysis failed: {analysis.get('error')}")
+        
+        ctx["analysis"] = analysis
+        return ctx
+    
+    # A failed analysis is passed on to finalize but not checkpointed, so a reset calls Gemini again
+    return run_stage(self, ctx, "analyze", work, checkpoint_if=analysis_succeeded)
+
+@celery_app.task(bind=True)
+def finalize_job(self, ctx: dict):
+    """Mark the job completed with its transcript and analysis"""
+    def work(redis_client, ctx):
+        update_job(
+            ctx["job_id"],
+            status="completed",
+            progress=100,
+            message="Processing complete",
+            stage="finalize",
+            result=ctx["transcript"],
+            analysis=ctx["analysis"],
+            error=None,
+            completed_at=datetime.utcnow().isoformat()
+        )
+        logger.info(f"Job {ctx['job_id']} completed successfully")
+        return ctx
+    
+    # Always rewrite the final record, even when resuming a finished job
+    return run_stage(self, ctx, "finalize", work, resumable=False, checkpoint_if=analysis_succeeded)
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Transcripts are keyed by audio content, so they stay valid far longer than job records
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", str(30 * 24 * 3600)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """SHA-256 of a file, read in bounded chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    (audio_hash, transcription model) -> transcript index.
+
+    Backed by Redis so the API and every worker share entries and hit/miss
+    counters; without Redis it falls back to a process-wide dictionary.
+    """
+
+    STATS_KEY = "transcript_cache:stats"
+
+    # In-memory fallback shared by every instance in the process
+    _memory_entries = {}
+    _memory_stats = {"hits": 0, "misses": 0}
+    _memory_lock = threading.Lock()
+
+    def __init__(self, redis_client=None, ttl_seconds: int = TRANSCRIPT_CACHE_TTL):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _key(audio_hash: str, model: str) -> str:
+        return f"transcript:{model}:{audio_hash}"
+
+    def _record(self, outcome: str):
+        if self.redis_client:
+            try:
+                self.redis_client.hincrby(self.STATS_KEY, outcome, 1)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to record transcript cache {outcome}: {e}")
+        with self._memory_lock:
+            self._memory_stats[outcome] += 1
+
+    def get(self, audio_hash: str, model: str):
+        """Return the stored transcript or None, counting the lookup as a hit or miss"""
+        if not audio_hash:
+            return None
+
+        transcript = None
+        key = self._key(audio_hash, model)
+        if self.redis_client:
+            try:
+                cached = self.redis_client.get(key)
+                if cached is not None:
+                    transcript = cached.decode("utf-8") if isinstance(cached, bytes) else cached
+            except Exception as e:
+                logger.warning(f"Transcript cache lookup failed: {e}")
+        else:
+            transcript = self._memory_entries.get(key)
+
+        self._record("hits" if transcript is not None else "misses")
+        if transcript is not None:
+            logger.info(f"Transcript cache hit for {model}:{audio_hash[:12]}")
+        return transcript
+
+    def put(self, audio_hash: str, model: str, transcript: str):
+        if not audio_hash or not transcript:
+            return
+        key = self._key(audio_hash, model)
+        if self.redis_client:
+            try:
+                self.redis_client.setex(key, self.ttl_seconds, transcript)
+            except Exception as e:
+                logger.warning(f"Failed to store transcript in cache: {e}")
+            return
+        with self._memory_lock:
+            self._memory_entries[key] = transcript
+
+    def stats(self) -> dict:
+        if self.redis_client:
+            try:
+                raw = self.redis_client.hgetall(self.STATS_KEY)
+                counts = {
+                    (k.decode() if isinstance(k, bytes) else k): int(v)
+                    for k, v in raw.items()
+                }
+            except Exception as e:
+                logger.warning(f"Failed to read transcript cache stats: {e}")
+                counts = {}
+        else:
+            with self._memory_lock:
+                counts = dict(self._memory_stats)
+
+        hits = counts.get("hits", 0)
+        misses = counts.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,9 +1,31 @@
 import os
+import shutil
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from . import audio_splitter
+
+logger = logging.getLogger(__name__)
+
+# OpenAI transcription model - also part of the transcript cache key
+WHISPER_MODEL = "whisper-1"
+
+# Long sets are split at silences into chunks of about this length and transcribed in parallel
+WHISPER_CHUNK_SECONDS = int(os.getenv("WHISPER_CHUNK_SECONDS", "600"))
+WHISPER_MAX_PARALLEL = int(os.getenv("WHISPER_MAX_PARALLEL", "6"))
+
+# OpenAI rejects uploads over 25 MB; keep chunks safely below it
+WHISPER_MAX_FILE_BYTES = 24 * 1024 * 1024
 
 class WhisperClient:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, rate_limiter=None):
         # Get API key from parameter or environment
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.model = WHISPER_MODEL
+        # Optional RateLimiter shared by all workers; every request takes capacity first
+        self.rate_limiter = rate_limiter
         
         # Enable mock mode if no API key or explicitly set to "test"
         self.mock_mode = not self.api_key or self.api_key == "test"
@@ -11,16 +33,27 @@ class WhisperClient:
         if not self.mock_mode:
             try:
                 # Import openai only when needed to avoid version conflicts
+                import httpx
                 import openai
-                # Initialize OpenAI client with minimal parameters
-                self.client = openai.OpenAI(api_key=self.api_key)
+                # Keep-alive pool sized for the parallel chunk uploads, reused across jobs
+                self.client = openai.OpenAI(
+                    api_key=self.api_key,
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=WHISPER_MAX_PARALLEL * 2,
+                            max_keepalive_connections=WHISPER_MAX_PARALLEL,
+                            keepalive_expiry=120,
+                        )
+                    ),
+                )
             except Exception as e:
                 # Fall back to mock mode if client initialization fails
                 self.mock_mode = True
     
-    def transcribe_audio(self, file_path: str) -> str:
+    def transcribe_audio(self, file_path: str, on_progress: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Transcribe audio file using OpenAI Whisper API or mock transcription
+        on_progress(done, total) is called as chunks of a split recording finish.
         """
         if self.mock_mode:
             # Mock transcription for testing without API key
@@ -29,10 +62,14 @@ class WhisperClient:
             filename = os.path.basename(file_path)
             return f"[MOCK TRANSCRIPTION] This is a simulated transcription of {filename}. The streaming upload performance optimization is working correctly! In production, this would be real speech-to-text from OpenAI Whisper API."
         
+        if self._should_split(file_path):
+            return self.transcribe_long_audio(file_path, on_progress)["text"]
+        
         try:
+            self._acquire_capacity(file_path)
             with open(file_path, "rb") as audio_file:
                 transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
+                    model=self.model,
                     file=audio_file,
                     response_format="text",
                     timeout=120  # 2 minutes timeout
@@ -40,6 +77,7 @@ class WhisperClient:
                 return transcript
                 
         except Exception as e:
+            self._on_provider_error(e)
             raise Exception(f"Whisper transcription failed: {str(e)}")
     
     def transcribe_audio_detailed(self, file_path: str) -> dict:
@@ -47,9 +85,10 @@ class WhisperClient:
         Transcribe with detailed response including timestamps
         """
         try:
+            self._acquire_capacity(file_path)
             with open(file_path, "rb") as audio_file:
                 transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
+                    model=self.model,
                     file=audio_file,
                     response_format="verbose_json",
                     timestamp_granularities=["word"],
@@ -62,4 +101,97 @@ class WhisperClient:
                 }
                 
         except Exception as e:
-            raise Exception(f"Whisper detailed transcription failed: {str(e)}")
\ No newline at end of file
+            self._on_provider_error(e)
+            raise Exception(f"Whisper detailed transcription failed: {str(e)}")
+    
+    def _acquire_capacity(self, file_path: str, duration: Optional[float] = None):
+        """Take one request and the audio's length from the shared OpenAI quota"""
+        if not self.rate_limiter:
+            return
+        if duration is None and self.rate_limiter.tracks("audio_seconds") and audio_splitter.is_available():
+            try:
+                duration = audio_splitter.probe_duration(file_path)
+            except Exception as e:
+                logger.warning(f"Could not probe audio duration for rate limiting: {e}")
+        self.rate_limiter.acquire(requests=1, audio_seconds=duration or 0)
+    
+    def _on_provider_error(self, error: Exception):
+        # A 429 means our pacing overshot (or another client shares the key); back off everywhere
+        if self.rate_limiter and getattr(error, "status_code", None) == 429:
+            self.rate_limiter.drain()
+    
+    def _chunk_seconds_for(self, file_path: str, duration: float) -> float:
+        """Target chunk length, shortened if the file's bitrate would push a chunk past the API limit"""
+        bytes_per_second = os.path.getsize(file_path) / max(duration, 1.0)
+        max_seconds_by_size = WHISPER_MAX_FILE_BYTES * 0.9 / max(bytes_per_second, 1.0)
+        return min(WHISPER_CHUNK_SECONDS, max_seconds_by_size)
+    
+    def _should_split(self, file_path: str) -> bool:
+        if not audio_splitter.is_available():
+            return False
+        try:
+            duration = audio_splitter.probe_duration(file_path)
+        except Exception as e:
+            logger.warning(f"Could not probe audio duration, transcribing in one request: {e}")
+            return False
+        return duration > self._chunk_seconds_for(file_path, duration) * 1.25
+    
+    def transcribe_long_audio(self, file_path: str, on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        Split a long recording at silences into ~WHISPER_CHUNK_SECONDS chunks,
+        transcribe them concurrently and stitch the results back in order.
+        Returns: {"text", "duration", "segments"} with segment timestamps
+        relative to the start of the whole recording.
+        """
+        duration = audio_splitter.probe_duration(file_path)
+        chunk_seconds = self._chunk_seconds_for(file_path, duration)
+        split_points = audio_splitter.plan_split_points(
+            duration, audio_splitter.detect_silences(file_path), chunk_seconds
+        )
+        
+        work_dir = tempfile.mkdtemp(prefix="whisper_chunks_")
+        try:
+            chunks = audio_splitter.split_audio(file_path, split_points, work_dir)
+            chunk_results = [None] * len(chunks)
+            with ThreadPoolExecutor(max_workers=min(WHISPER_MAX_PARALLEL, len(chunks))) as executor:
+                futures = {executor.submit(self._transcribe_chunk, chunk): chunk["index"] for chunk in chunks}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    # Results are stored by chunk index, so completion order does not matter
+                    chunk_results[futures[future]] = future.result()
+                    if on_progress:
+                        on_progress(done, len(chunks))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        segments = [segment for chunk_segments in chunk_results for segment in chunk_segments]
+        text = " ".join(segment["text"] for segment in segments if segment["text"])
+        return {"text": text, "duration": duration, "segments": segments}
+    
+    def _transcribe_chunk(self, chunk: dict) -> list:
+        """Transcribe one chunk and shift its segment timestamps by the chunk offset"""
+        try:
+            self._acquire_capacity(chunk["path"], chunk["duration"])
+            with open(chunk["path"], "rb") as audio_file:
+                transcript = self.client.audio.transcriptions.create(
+                    model=self.model,
+                    file=audio_file,
+                    response_format="verbose_json",
+                    timestamp_granularities=["segment"],
+                    timeout=120  # 2 minutes timeout
+                )
+        except Exception as e:
+            self._on_provider_error(e)
+            raise Exception(f"Whisper transcription failed for chunk {chunk['index']}: {str(e)}")
+        
+        offset = chunk["offset"]
+        segments = getattr(transcript, "segments", None) or []
+        if not segments:
+            return [{"start": offset, "end": offset + chunk["duration"], "text": transcript.text.strip()}]
+        return [
+            {
+                "start": round(segment.start + offset, 3),
+                "end": round(segment.end + offset, 3),
+                "text": segment.text.strip(),
+            }
+            for segment in segments
+        ]
@@ -5,13 +5,14 @@ import sys
 sys.path.append('.')
 import os
 import uuid
+import datetime
 
 # Setup
 from api.config import settings
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.google_drive_credentials_path
 
 # Import and setup
-from api.main import jobs_db, JobStatus, update_job_status
+from api.main import job_store, JobStatus, update_job_status
 
 def debug_process_transcription_direct(job_id: str, file_path: str, model: str = "openai-whisper", set_list: str = "", custom_prompt: str = ""):
     """Debug version of process_transcription_direct with extensive logging"""
@@ -23,16 +24,17 @@ def debug_process_transcription_direct(job_id: str, file_path: str, model: str =
     print(f"Custom prompt: '{custom_prompt}'")
     
     # Initialize job
-    jobs_db[job_id] = {
+    job_store.save({
         'job_id': job_id,
         'status': JobStatus.QUEUED,
         'result': None,
-        'analysis': None
-    }
+        'analysis': None,
+        'created_at': datetime.datetime.now().isoformat()
+    })
     
     try:
         print(f"\n--- Starting processing ---")
-        jobs_db[job_id]["status"] = JobStatus.PROCESSING
+        job_store.update(job_id, status=JobStatus.PROCESSING)
         result = {}
         
         # Transcription step
@@ -100,15 +102,17 @@ def debug_process_transcription_direct(job_id: str, file_path: str, model: str =
             update_job_status(job_id, JobStatus.COMPLETED, result=result.get("transcript", ""))
         else:
             print("Using Gemini final update")
-            jobs_db[job_id]["result"] = result.get("transcript", "")
-            jobs_db[job_id]["analysis"] = {
-                "success": True,
-                "analysis": result.get("analysis"),
-                "error": None
-            }
-            jobs_db[job_id]["status"] = JobStatus.COMPLETED
-            import datetime
-            jobs_db[job_id]["completed_at"] = datetime.datetime.now().isoformat()
+            job_store.update(
+                job_id,
+                result=result.get("transcript", ""),
+                analysis={
+                    "success": True,
+                    "analysis": result.get("analysis"),
+                    "error": None
+                },
+                status=JobStatus.COMPLETED,
+                completed_at=datetime.datetime.now().isoformat()
+            )
         
         print("Processing completed successfully")
         
@@ -132,7 +136,7 @@ debug_process_transcription_direct(
 
 # Check final result
 print(f"\n=== FINAL JOB STATE ===")
-job = jobs_db.get(job_id, {})
+job = job_store.get(job_id) or {}
 for key, value in job.items():
     if key == 'analysis' and value:
         print(f"{key}: {str(value)[:150]}...")
@@ -0,0 +1,49 @@
+import pytest
+
+from celery_worker.analysis_cache import AnalysisCache, analysis_cache_key
+
+
+@pytest.fixture(autouse=True)
+def fresh_memory(monkeypatch):
+    # The in-memory fallback is shared by every instance in the process
+    monkeypatch.setattr(AnalysisCache, "_memory_caches", {})
+
+
+RESULT = {"success": True, "analysis": "labeled"}
+
+
+def test_key_ignores_whitespace_differences():
+    assert analysis_cache_key("a  b\n", "x\n\n y", "prompt", "m") == analysis_cache_key("a b", "x\ny", " prompt", "m")
+    assert analysis_cache_key("a b", "", "prompt", "m") != analysis_cache_key("a b", "", "prompt", "other")
+
+
+def test_memory_round_trip_and_stats():
+    cache = AnalysisCache()
+    assert cache.get("k") is None
+    cache.put("k", RESULT)
+    cache.put("failed", {"success": False})
+    assert AnalysisCache().get("k") == RESULT
+    assert cache.get("failed") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_ratio": 0.333, "entries": 1}
+
+
+def test_memory_evicts_least_recently_used():
+    cache = AnalysisCache(max_entries=2)
+    cache.put("a", RESULT)
+    cache.put("b", RESULT)
+    cache.get("a")
+    cache.put("c", RESULT)
+    assert cache.get("b") is None
+    assert cache.get("a") == RESULT
+
+
+def test_key_prefix_separates_caches():
+    backend = AnalysisCache()
+    standalone = AnalysisCache(key_prefix="transcribe_analysis")
+    backend.put("k", RESULT)
+    assert standalone.get("k") is None
+    assert backend.stats()["entries"] == 1
+    assert standalone._entry_key("k") == "transcribe_analysis:k"
+    assert standalone.lru_key == "transcribe_analysis_cache:lru"
+    assert backend._entry_key("k") == "analysis:k"
+    assert backend.stats_key == "analysis_cache:stats"
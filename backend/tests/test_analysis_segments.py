@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from celery_worker.analysis_segments import (
+    IncrementalSegmentParser, merge_window_segments, parse_segments, plan_windows,
+    render_labeled_transcript, sentence_offsets
+)
+
+TRANSCRIPT = "First joke setup. Punchline here! Second bit starts. It goes on. Riff with the crowd. Closing line."
+# Sentence offsets: 0, 18, 34, 53, 65, 86; length 99
+
+
+def segment(label, title, start, end):
+    return {"label": label, "title": title, "start_char": start, "end_char": end}
+
+
+def test_sentence_offsets():
+    assert sentence_offsets(TRANSCRIPT) == [0, 18, 34, 53, 65, 86]
+
+
+def test_parse_segments_snaps_and_orders():
+    response = json.dumps([
+        {"label": "riff", "title": "ignored", "start_char": 66, "end_char": 86},
+        {"label": "Joke", "title": " Opener ", "start_char": 1, "end_char": 33},
+        {"label": "new-bit", "title": "Second bit", "start_char": 34, "end_char": 65},
+    ])
+    assert parse_segments(response, TRANSCRIPT) == [
+        segment("joke", "Opener", 0, 34),
+        segment("new_bit", "Second bit", 34, 65),
+        segment("riff", "", 65, 86),
+    ]
+
+
+def test_parse_segments_accepts_code_fence_and_object():
+    response = '```json\n{"segments": [{"label": "joke", "title": "A", "start_char": 0, "end_char": 34}]}\n```'
+    assert parse_segments(response, TRANSCRIPT) == [segment("joke", "A", 0, 34)]
+
+
+def test_parse_segments_clips_overlaps_and_drops_invalid():
+    response = json.dumps([
+        {"label": "joke", "title": "A", "start_char": 0, "end_char": 53},
+        {"label": "new_bit", "title": "B", "start_char": 34, "end_char": 86},
+        {"label": "bogus", "start_char": 86, "end_char": 99},
+        {"label": "riff", "start_char": "x", "end_char": 99},
+        "not a segment",
+    ])
+    assert parse_segments(response, TRANSCRIPT) == [
+        segment("joke", "A", 0, 53),
+        segment("new_bit", "B", 53, 86),
+    ]
+
+
+@pytest.mark.parametrize("response", ["not json", '"a string"', '[{"label": "bogus", "start_char": 0, "end_char": 10}]'])
+def test_parse_segments_rejects_unusable_responses(response):
+    with pytest.raises(ValueError):
+        parse_segments(response, TRANSCRIPT)
+
+
+def test_parse_segments_empty_list():
+    assert parse_segments("[]", TRANSCRIPT) == []
+
+
+def test_incremental_parser_matches_render():
+    segments = [segment("joke", "Opener", 0, 34), segment("riff", "", 65, 86)]
+    response = json.dumps(segments)
+    parser = IncrementalSegmentParser(TRANSCRIPT)
+    # Fed in small pieces, so objects arrive split across calls
+    streamed = "".join(parser.feed(response[i:i + 7]) for i in range(0, len(response), 7)) + parser.finish()
+    assert streamed == render_labeled_transcript(TRANSCRIPT, segments)
+    assert streamed.startswith("**Joke: Opener**\nFirst joke setup. Punchline here!")
+
+
+def test_incremental_parser_emits_only_completed_segments():
+    parser = IncrementalSegmentParser(TRANSCRIPT)
+    assert parser.feed('[{"label": "joke", "title": "Opener", "start_char": 0, ') == ""
+    assert parser.feed('"end_char": 34}, {"label"') == "**Joke: Opener**\nFirst joke setup. Punchline here!"
+    assert parser.finish() == "\n\nSecond bit starts. It goes on. Riff with the crowd. Closing line."
+
+
+def test_plan_windows_short_transcript_is_one_window():
+    assert plan_windows(TRANSCRIPT, 100, 20) == [(0, len(TRANSCRIPT))]
+
+
+def test_plan_windows_cover_the_transcript_at_sentence_boundaries():
+    windows = plan_windows(TRANSCRIPT, 30, 10)
+    assert windows == [(0, 34), (18, 53), (34, 65), (53, 86), (86, 99)]
+    boundaries = set(sentence_offsets(TRANSCRIPT) + [len(TRANSCRIPT)])
+    assert all(start in boundaries and end in boundaries for start, end in windows)
+    assert windows[0][0] == 0 and windows[-1][1] == len(TRANSCRIPT)
+    assert all(next_start <= end for (_, end), (next_start, _) in zip(windows, windows[1:]))
+
+
+def test_merge_window_segments_splits_overlap_and_joins_cut_bits():
+    windows = [(0, 65), (34, 99)]
+    window_segments = [
+        # Window-relative offsets
+        [segment("joke", "Opener", 0, 34), segment("new_bit", "Second bit", 34, 65)],
+        [segment("new_bit", "Other title", 0, 31), segment("riff", "", 31, 52)],
+    ]
+    assert merge_window_segments(TRANSCRIPT, windows, window_segments) == [
+        segment("joke", "Opener", 0, 34),
+        # Cut at the overlap's middle boundary (53) and joined, keeping the first window's title
+        segment("new_bit", "Second bit", 34, 65),
+        segment("riff", "", 65, 86),
+    ]
+
+
+@pytest.mark.parametrize("second_title, expected", [
+    ("B", [segment("joke", "A", 18, 53), segment("joke", "B", 53, 65)]),
+    ("a", [segment("joke", "A", 18, 65)]),
+])
+def test_merge_window_segments_joins_jokes_only_with_the_same_title(second_title, expected):
+    windows = [(0, 65), (34, 99)]
+    window_segments = [
+        [segment("joke", "A", 18, 53)],
+        [segment("joke", second_title, 0, 31)],
+    ]
+    assert merge_window_segments(TRANSCRIPT, windows, window_segments) == expected
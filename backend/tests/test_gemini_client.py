@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("redis")
+
+from celery_worker.gemini_client import GeminiClient, GeminiEmptyResponseError
+
+
+def chunk(*texts, finish_reason=None, block_reason=None):
+    parts = [SimpleNamespace(text=text) for text in texts]
+    candidates = [SimpleNamespace(content=SimpleNamespace(parts=parts), finish_reason=finish_reason)]
+    if block_reason:
+        candidates = []
+    return SimpleNamespace(candidates=candidates, prompt_feedback=SimpleNamespace(block_reason=block_reason))
+
+
+class FakeModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        return iter(self.chunks) if stream else self.chunks[0]
+
+
+def generate(chunks, stream=True):
+    relayed = []
+    text = GeminiClient(api_key="key")._generate(FakeModel(chunks), "prompt", 10, relayed.append if stream else None)
+    return text, relayed
+
+
+def test_stream_skips_chunks_without_text():
+    text, relayed = generate([chunk("Hello "), chunk(), chunk("world", finish_reason="STOP")])
+    assert text == "Hello world"
+    assert relayed == ["Hello ", "world"]
+
+
+@pytest.mark.parametrize("chunks, message", [
+    ([chunk(block_reason="SAFETY")], "prompt blocked: SAFETY"),
+    ([chunk("partial "), chunk(finish_reason="SAFETY")], "output blocked: SAFETY"),
+    ([chunk(finish_reason="STOP")], "empty response"),
+])
+def test_blocked_or_empty_stream_is_its_own_error(chunks, message):
+    with pytest.raises(GeminiEmptyResponseError, match=message):
+        generate(chunks)
+
+
+def test_unstreamed_response_reads_the_parts():
+    assert generate([chunk("All ", "at once", finish_reason="STOP")], stream=False) == ("All at once", [])
+    with pytest.raises(GeminiEmptyResponseError):
+        generate([chunk(block_reason="OTHER")], stream=False)
+
+
+def test_blocked_segment_output_is_not_reported_as_unusable():
+    client = GeminiClient(api_key="key", output_mode="segments")
+    client._model_client = FakeModel([chunk(block_reason="SAFETY")])
+    result = client.analyze_transcript("A short set. With two lines.")
+    assert result == {"success": False, "error": "Gemini response prompt blocked: SAFETY"}
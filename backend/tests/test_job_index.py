@@ -0,0 +1,121 @@
+import pytest
+
+from celery_worker.job_index import (
+    JOB_STATUSES, collect_rows_after, decode_cursor, encode_cursor, job_ids_in_range, list_memory_job_page, merge_page,
+    page_job_ids, stage_failure_fields, status_index_key, timestamp_score
+)
+
+
+class FakeSortedSets:
+    """The ZREVRANGEBYSCORE subset of a Redis client the index readers use"""
+
+    def __init__(self, indexes):
+        self.indexes = indexes  # index key -> {member: score}
+
+    def zrevrangebyscore(self, name, max, min, start=None, num=None, withscores=False):
+        low = float("-inf") if min == "-inf" else float(min)
+        high = float("inf") if max == "+inf" else float(max)
+        rows = sorted(
+            ((member.encode(), score) for member, score in self.indexes.get(name, {}).items() if low <= score <= high),
+            key=lambda row: (row[1], row[0]), reverse=True,
+        )
+        if start is not None:
+            rows = rows[start:start + num]
+        return rows if withscores else [member for member, _ in rows]
+
+
+def job(job_id, created_at, status="completed"):
+    return {"job_id": job_id, "created_at": created_at, "status": status}
+
+
+def test_cursor_round_trip():
+    score = timestamp_score("2026-03-01T12:00:00.123456")
+    assert decode_cursor(encode_cursor(score, "job:with:colons")) == (score, "job:with:colons")
+
+
+@pytest.mark.parametrize("cursor", ["", "no-separator", "not-a-number:job"])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_timestamp_score_treats_naive_as_utc():
+    assert timestamp_score("2026-01-01T00:00:00") == timestamp_score("2026-01-01T00:00:00Z") == 1767225600.0
+
+
+def test_collect_rows_after_skips_up_to_the_cursor_on_ties():
+    rows = [(b"c", 5.0), (b"b", 5.0), (b"a", 5.0), (b"z", 4.0)]
+    results = []
+    collect_rows_after(rows, (5.0, "b"), results, limit=10)
+    assert results == [("a", 5.0), ("z", 4.0)]
+
+
+def test_merge_page_orders_newest_first_and_sets_cursor():
+    candidates = [("a", 1.0), ("c", 3.0), ("b", 3.0), ("d", 2.0)]
+    job_ids, next_cursor = merge_page(candidates, limit=3)
+    assert job_ids == ["c", "b", "d"]
+    assert decode_cursor(next_cursor) == (2.0, "d")
+
+
+def test_merge_page_last_page_has_no_cursor():
+    assert merge_page([("a", 1.0), ("b", 2.0)], limit=2) == (["b", "a"], None)
+    assert merge_page([], limit=2) == ([], None)
+
+
+def test_page_job_ids_walks_every_job_once_across_status_indexes():
+    # Several jobs share a creation time, so paging must break ties by id
+    indexes = {
+        status_index_key("completed"): {"a": 1.0, "b": 2.0, "c": 2.0, "d": 4.0},
+        status_index_key("failed"): {"e": 2.0, "f": 3.0},
+        status_index_key("queued"): {"g": 5.0},
+    }
+    client = FakeSortedSets(indexes)
+    seen, cursor = [], None
+    while True:
+        job_ids, cursor = page_job_ids(client, statuses=["completed", "failed"], cursor=cursor, limit=2)
+        seen.extend(job_ids)
+        if cursor is None:
+            break
+    assert seen == ["d", "f", "e", "c", "b", "a"]
+
+
+def test_page_job_ids_filters_by_creation_time():
+    client = FakeSortedSets({status_index_key("completed"): {"a": 1.0, "b": 2.0, "c": 3.0}})
+    job_ids, cursor = page_job_ids(client, statuses=["completed"], created_after=2.0, created_before=3.0)
+    assert (job_ids, cursor) == (["c", "b"], None)
+
+
+def test_job_ids_in_range():
+    client = FakeSortedSets({"index": {"a": 1.0, "b": 2.0, "c": 3.0}})
+    assert job_ids_in_range(client, "index") == ["c", "b", "a"]
+    assert job_ids_in_range(client, "index", min_score=2.0, limit=1) == ["c"]
+
+
+def test_list_memory_job_page_pages_with_the_same_cursor_format():
+    jobs = [
+        job("a", "2026-01-01T00:00:01"),
+        job("b", "2026-01-01T00:00:02", status="failed"),
+        job("c", "2026-01-01T00:00:02"),
+        job("d", "2026-01-01T00:00:03"),
+    ]
+    first = list_memory_job_page(jobs, limit=3)
+    assert [j["job_id"] for j in first["jobs"]] == ["d", "c", "b"]
+    assert decode_cursor(first["next_cursor"]) == (timestamp_score("2026-01-01T00:00:02"), "b")
+
+    second = list_memory_job_page(jobs, cursor=first["next_cursor"], limit=3)
+    assert [j["job_id"] for j in second["jobs"]] == ["a"]
+    assert second["next_cursor"] is None
+
+    failed = list_memory_job_page(jobs, statuses=["failed"])
+    assert [j["job_id"] for j in failed["jobs"]] == ["b"]
+
+
+def test_stage_failure_fields_retrying_then_failed():
+    retrying = stage_failure_fields("transcribe", "timeout", will_retry=True)
+    assert retrying == {"status": "retrying", "message": "Transcribe failed, retrying: timeout", "stage": "transcribe"}
+
+    failed = stage_failure_fields("transcribe", "timeout", will_retry=False, completed_at="2026-01-01T00:00:00")
+    assert failed["status"] == "failed"
+    assert failed["error"] == "timeout"
+    assert failed["completed_at"] == "2026-01-01T00:00:00"
+    assert {retrying["status"], failed["status"]} <= set(JOB_STATUSES)
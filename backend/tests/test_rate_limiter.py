@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("redis")
+
+from celery_worker import rate_limiter
+from celery_worker.rate_limiter import RateLimiter, RateLimitTimeoutError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    monkeypatch.setattr(rate_limiter, "random", SimpleNamespace(uniform=lambda low, high: 0.0))
+    # The in-memory buckets are shared by every instance in the process
+    monkeypatch.setattr(RateLimiter, "_memory_buckets", {})
+    return clock
+
+
+def limiter(**kwargs):
+    # 60 requests per minute at full quota: one per second, a bucket of 10
+    options = {"limits": {"requests": 60}, "headroom": 1.0, "burst_seconds": 10}
+    options.update(kwargs)
+    return RateLimiter("test", **options)
+
+
+def test_full_bucket_allows_a_burst_then_asks_to_wait(clock):
+    bucket = limiter()
+    assert bucket._try_acquire({"requests": 10}) == 0.0
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_the_quota_rate(clock):
+    bucket = limiter()
+    bucket._try_acquire({"requests": 10})
+    clock.now += 0.5
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket._try_acquire({"requests": 1}) == 0.0
+
+
+def test_refill_never_exceeds_capacity(clock):
+    bucket = limiter()
+    bucket._try_acquire({"requests": 10})
+    clock.now += 3600
+    assert bucket._try_acquire({"requests": 10}) == 0.0
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(1.0)
+
+
+def test_headroom_scales_the_refill_rate(clock):
+    bucket = limiter(headroom=0.5)
+    bucket._try_acquire({"requests": 5})
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(2.0)
+
+
+def test_oversized_request_passes_when_full_and_leaves_debt(clock):
+    bucket = limiter()
+    assert bucket._try_acquire({"requests": 25}) == 0.0
+    # 15 in debt, so one more request waits for 16 tokens
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(16.0)
+
+
+def test_waits_for_the_slowest_dimension(clock):
+    bucket = limiter(limits={"requests": 60, "tokens": 600})
+    bucket._try_acquire({"requests": 1, "tokens": 100})
+    # tokens refill 10 per second from 0: 5 seconds for 50
+    assert bucket._try_acquire({"requests": 1, "tokens": 50}) == pytest.approx(5.0)
+
+
+def test_acquire_sleeps_until_capacity_refills(clock):
+    bucket = limiter()
+    bucket.acquire(requests=10)
+    bucket.acquire(requests=3)
+    assert sum(clock.sleeps) == pytest.approx(3.0)
+    assert all(sleep <= rate_limiter.MAX_SLEEP_SECONDS for sleep in clock.sleeps)
+
+
+def test_acquire_ignores_untracked_dimensions(clock):
+    limiter().acquire(audio_seconds=1e9)
+    assert clock.sleeps == []
+
+
+def test_acquire_gives_up_past_the_maximum_wait(clock):
+    bucket = limiter(max_wait_seconds=2)
+    bucket.acquire(requests=10)
+    with pytest.raises(RateLimitTimeoutError):
+        bucket.acquire(requests=5)
+
+
+def test_drain_empties_the_buckets(clock):
+    bucket = limiter()
+    bucket.drain()
+    assert bucket._try_acquire({"requests": 1}) == pytest.approx(1.0)
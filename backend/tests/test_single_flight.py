@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+pytest.importorskip("redis")
+
+from celery_worker.single_flight import SingleFlight
+
+
+class CountingEvent(threading.Event):
+    """An Event that counts the threads that have started waiting on it"""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = 0
+        self._counted = threading.Condition()
+
+    def wait(self, timeout=None):
+        with self._counted:
+            self.waiters += 1
+            self._counted.notify_all()
+        return super().wait(timeout)
+
+    def wait_for_waiters(self, count: int):
+        with self._counted:
+            assert self._counted.wait_for(lambda: self.waiters >= count, timeout=5)
+
+
+def run_concurrently(flight, key, func, followers=4, share=None):
+    """Start a leader blocked in func, then followers on the same key; returns every caller's result"""
+    results = []
+    lock = threading.Lock()
+
+    def call():
+        result = flight.run(key, func, share)
+        with lock:
+            results.append(result)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert func.started.wait(5)
+    done = flight._local_flights[key]["done"] = CountingEvent()
+    threads = [threading.Thread(target=call) for _ in range(followers)]
+    for thread in threads:
+        thread.start()
+    done.wait_for_waiters(followers)
+    func.release.set()
+    for thread in [leader] + threads:
+        thread.join(5)
+    return results
+
+
+class BlockingCall:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+
+def test_concurrent_calls_share_one_result():
+    func = BlockingCall({"success": True})
+    results = run_concurrently(SingleFlight(), "same-key", func)
+    assert func.calls == 1
+    assert results == [{"success": True}] * 5
+
+
+def test_unshared_results_are_recomputed_by_followers():
+    func = BlockingCall({"success": False})
+    results = run_concurrently(SingleFlight(), "failing-key", func, followers=2, share=lambda result: result["success"])
+    assert func.calls == 3
+    assert len(results) == 3
+
+
+def test_sequential_calls_are_not_coalesced():
+    calls = []
+    flight = SingleFlight()
+    for _ in range(2):
+        flight.run("key", lambda: calls.append(1) or len(calls))
+    assert calls == [1, 1]
+    assert "key" not in flight._local_flights
+
+
+def test_leader_failure_propagates_and_clears_the_flight():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        flight.run("key", fail)
+    assert flight.run("key", lambda: "ok") == "ok"
@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip("redis")
+
+from celery_worker.job_events import job_event_channel
+from celery_worker.job_store import SQLiteJobStore
+
+
+class RecordingRedis:
+    """Collects what the store publishes through a pipeline"""
+
+    def __init__(self):
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def publish(self, channel, message):
+        self.published.append(channel)
+
+    def execute(self):
+        return []
+
+
+def job(job_id, created_at, status="queued", **fields):
+    return dict({"job_id": job_id, "status": status, "created_at": created_at}, **fields)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_save_and_get_with_and_without_large_fields(store):
+    store.save(job("a", "2026-01-01T00:00:00", result={"text": "hi"}))
+    assert store.get("a")["result"] == {"text": "hi"}
+    assert "result" not in store.get("a", include_large=False)
+    assert store.get("missing") is None
+
+
+def test_update_merges_fields_and_skips_unknown_jobs(store):
+    store.save(job("a", "2026-01-01T00:00:00", message="queued"))
+    updated = store.update("a", status="processing", progress=30)
+    assert updated["status"] == "processing"
+    assert updated["message"] == "queued"
+    assert updated["updated_at"]
+    assert store.update("missing", progress=10) is None
+    assert store.get("missing") is None
+
+
+def test_list_pages_newest_first(store):
+    store.save_many([
+        job("a", "2026-01-01T00:00:01"),
+        job("b", "2026-01-01T00:00:02", status="failed"),
+        job("c", "2026-01-01T00:00:02"),
+        job("d", "2026-01-01T00:00:03"),
+    ])
+    first = store.list(limit=3)
+    assert [j["job_id"] for j in first["jobs"]] == ["d", "c", "b"]
+    second = store.list(cursor=first["next_cursor"], limit=3)
+    assert [j["job_id"] for j in second["jobs"]] == ["a"]
+    assert second["next_cursor"] is None
+    assert [j["job_id"] for j in store.list(statuses=["failed"])["jobs"]] == ["b"]
+    assert [j["job_id"] for j in store.list_by_status("queued")] == ["d", "c", "a"]
+
+
+def test_expired_jobs_are_hidden_and_pruned(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"), ttl_seconds=-1)
+    store.save(job("a", "2026-01-01T00:00:00"))
+    assert store.get("a") is None
+    assert store.count() == 0
+    assert store.update("a", progress=5) is None
+    assert store.prune_expired() == 1
+
+
+def test_delete(store):
+    store.save_many([job("a", "2026-01-01T00:00:00"), job("b", "2026-01-01T00:00:01")])
+    store.delete(["a"])
+    assert store.get_many(["a", "b"])[0] is None
+    assert store.count() == 1
+
+
+def test_changes_are_published_when_redis_is_configured(tmp_path):
+    redis_client = RecordingRedis()
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"), redis_client=redis_client)
+    store.save(job("a", "2026-01-01T00:00:00"))
+    store.update("a", progress=50)
+    store.update("missing", progress=50)
+    assert redis_client.published == [job_event_channel("a")] * 2
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Local Whisper Engine Benchmark
+Compares real-time factor (processing time / audio duration) and word error
+rate of the engines in api/whisper_engines.py on one audio file.
+
+Usage: python benchmark_engines.py --audio set.mp3 --reference set.txt
+                                   [--model tiny] [--engines whisper,whisper-int8,faster-whisper] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+from typing import Dict, List
+
+from api.whisper_engines import ENGINES, audio_duration_seconds, load_engine
+
+
+def normalize_words(text: str) -> List[str]:
+    """Lowercase words without punctuation, so WER counts only recognition errors"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """(substitutions + deletions + insertions) / reference words, by word-level edit distance"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def benchmark_engine(engine_name: str, model_name: str, audio_path: str, reference: str,
+                     audio_seconds: float, runs: int) -> Dict:
+    load_start = time.time()
+    engine = load_engine(model_name, engine_name)
+    load_time = time.time() - load_start
+
+    # The first run warms caches and thread pools; it is not timed
+    engine.transcribe(audio_path)
+
+    times = []
+    text = ""
+    for _ in range(runs):
+        start = time.time()
+        text = engine.transcribe(audio_path)["text"]
+        times.append(time.time() - start)
+
+    median = statistics.median(times)
+    return {
+        'engine': engine_name,
+        'load_seconds': round(load_time, 2),
+        'median_seconds': round(median, 3),
+        'real_time_factor': round(median / audio_seconds, 4) if audio_seconds else None,
+        'wer': round(word_error_rate(reference, text), 4),
+        'transcript': text.strip(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare local Whisper engines")
+    parser.add_argument('--audio', required=True, help="Recording to transcribe")
+    parser.add_argument('--reference', required=True, help="Human transcript of the recording, for WER")
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--engines', default=','.join(ENGINES))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for path in (args.audio, args.reference):
+        if not os.path.isfile(path):
+            parser.error(f"{path} does not exist")
+    with open(args.reference) as f:
+        reference = f.read()
+    if not normalize_words(reference):
+        parser.error(f"{args.reference} has no words to compare against")
+    try:
+        audio_seconds = audio_duration_seconds(args.audio)
+    except ImportError:
+        raise
+    except Exception as e:
+        parser.error(f"{args.audio} could not be decoded as audio: {e}")
+    if audio_seconds <= 0:
+        parser.error(f"{args.audio} contains no audio")
+
+    print(f"🎯 Local Whisper Engine Benchmark")
+    print(f"🎧 Audio: {args.audio} ({audio_seconds:.1f}s), model: {args.model}, runs: {args.runs}")
+    print("=" * 80)
+
+    results = []
+    for engine_name in args.engines.split(','):
+        engine_name = engine_name.strip()
+        print(f"\n⚙️  {engine_name}...")
+        try:
+            result = benchmark_engine(engine_name, args.model, args.audio, reference, audio_seconds, args.runs)
+        except Exception as e:
+            print(f"❌ {engine_name} failed: {e}")
+            results.append({'engine': engine_name, 'error': str(e)})
+            continue
+        results.append(result)
+        print(f"  Load: {result['load_seconds']}s  Median: {result['median_seconds']}s  "
+              f"RTF: {result['real_time_factor']}  WER: {result['wer']:.2%}")
+
+    print("\n📈 SUMMARY (lower is better)")
+    print("=" * 80)
+    print(f"  {'Engine':<16}{'RTF':>10}{'WER':>10}{'Load (s)':>12}")
+    for result in results:
+        if 'error' in result:
+            print(f"  {result['engine']:<16}{'failed':>10}")
+        else:
+            print(f"  {result['engine']:<16}{result['real_time_factor']:>10}{result['wer']:>10.2%}{result['load_seconds']:>12}")
+
+    report = {'audio': args.audio, 'audio_seconds': audio_seconds, 'model': args.model, 'runs': args.runs, 'results': results}
+    with open('engine_benchmark_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Detailed report saved to: engine_benchmark_report.json")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import JobStatus from './JobStatus';
 import { transcriptionAPI } from '../services/api';
 
 const JobList = ({ newJob, refreshTrigger }) => {
   const [jobs, setJobs] = useState([]);
   const [loading, setLoading] = useState(true);
+  // Open event streams by job id, and jobs whose stream failed and fall back to polling
+  const subscriptions = useRef({});
+  const [pollingJobIds, setPollingJobIds] = useState([]);
 
   const fetchJobs = async () => {
     try {
@@ -63,10 +66,54 @@ const JobList = ({ newJob, refreshTrigger }) => {
     }
   }, [newJob]);
 
-  // Poll processing jobs every 3 seconds
+  const isActive = (job) =>
+    job.status === 'queued' || job.status === 'processing' || job.status === 'retrying';
+
+  // Follow active jobs over Server-Sent Events
+  useEffect(() => {
+    jobs.filter(isActive).forEach(job => {
+      const jobId = job.job_id;
+      if (subscriptions.current[jobId] || pollingJobIds.includes(jobId)) {
+        return;
+      }
+      subscriptions.current[jobId] = transcriptionAPI.subscribeToJob(
+        jobId,
+        (event) => {
+          if (event.type === 'analysis_delta') {
+            setJobs(prevJobs =>
+              prevJobs.map(j => (j.job_id === jobId
+                ? { ...j, partial_analysis: (j.partial_analysis || '').slice(0, event.offset) + event.text }
+                : j))
+            );
+            return;
+          }
+          setJobs(prevJobs =>
+            prevJobs.map(j => (j.job_id === jobId ? { ...j, ...event } : j))
+          );
+          if (event.status === 'completed' || event.status === 'failed') {
+            delete subscriptions.current[jobId];
+            // Events carry progress only; fetch the transcript and analysis once
+            pollJobStatus(jobId);
+          }
+        },
+        () => {
+          delete subscriptions.current[jobId];
+          setPollingJobIds(prev => [...prev, jobId]);
+        }
+      );
+    });
+  }, [jobs, pollingJobIds]);
+
+  // Close open streams on unmount
+  useEffect(() => () => {
+    Object.values(subscriptions.current).forEach(close => close());
+    subscriptions.current = {};
+  }, []);
+
+  // Poll jobs without a working event stream every 3 seconds
   useEffect(() => {
     const processingJobs = jobs.filter(job => 
-      job.status === 'queued' || job.status === 'processing'
+      isActive(job) && pollingJobIds.includes(job.job_id)
     );
 
     if (processingJobs.length > 0) {
@@ -78,7 +125,7 @@ const JobList = ({ newJob, refreshTrigger }) => {
 
       return () => clearInterval(interval);
     }
-  }, [jobs]);
+  }, [jobs, pollingJobIds]);
 
   if (loading) {
     return (
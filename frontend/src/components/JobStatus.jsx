@@ -172,6 +172,15 @@ const JobStatus = ({ job, onJobUpdate }) => {
         </div>
       )}
 
+      {job.status !== 'completed' && job.status !== 'failed' && job.partial_analysis && (
+        <div className="job-analysis">
+          <strong>Comedy Analysis (in progress):</strong>
+          <div className="analysis-content">
+            <pre className="analysis-text">{job.partial_analysis}</pre>
+          </div>
+        </div>
+      )}
+
       {job.status === 'completed' && job.analysis && (
         <div className="job-analysis">
           <strong>Comedy Analysis (Gemini Flash 2.0):</strong>
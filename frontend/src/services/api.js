@@ -71,6 +71,28 @@ export const transcriptionAPI = {
     return response.data;
   },
 
+  // Subscribe to live job progress over Server-Sent Events.
+  // Returns a function that closes the stream.
+  subscribeToJob: (jobId, onEvent, onError) => {
+    const source = new EventSource(`${API_BASE}/v1/transcripts/${jobId}/events`);
+    source.addEventListener('progress', (message) => {
+      const event = JSON.parse(message.data);
+      onEvent(event);
+      if (event.status === 'completed' || event.status === 'failed') {
+        source.close();
+      }
+    });
+    // Partial Gemini output while the job is being analyzed
+    source.addEventListener('analysis', (message) => {
+      onEvent(JSON.parse(message.data));
+    });
+    source.onerror = (error) => {
+      source.close();
+      if (onError) onError(error);
+    };
+    return () => source.close();
+  },
+
   // List all jobs (for development)
   listJobs: async () => {
     const response = await api.get('/v1/jobs');
@@ -1,17 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
-import whisper
 import tempfile
 import os
 import logging
 import sys
-import time
 import asyncio
-import gc
 import psutil
 import google.generativeai as genai
 from dotenv import load_dotenv
+from api.whisper_models import ModelMemoryError, WhisperModelRegistry
 
 # Load environment variables
 load_dotenv()
@@ -49,24 +47,16 @@ app.add_middleware(
 )
 logger.info("DEPLOYMENT: CORS middleware added successfully")
 
-# Memory-optimized approach: Load model per request for Render's 512MB limit
-def load_model_for_transcription():
-    """Load model just-in-time to minimize memory usage"""
-    try:
-        logger.info("DEPLOYMENT: Loading Whisper model (tiny.en for memory optimization)...")
-        start_time = time.time()
-        
-        # Use smallest English-only model for Render's 512MB memory limit
-        model = whisper.load_model("tiny.en")
-        
-        load_time = time.time() - start_time
-        logger.info(f"DEPLOYMENT: Whisper model loaded in {load_time:.2f}s")
-        
-        return model
-        
-    except Exception as e:
-        logger.error(f"DEPLOYMENT: Failed to load Whisper model: {e}")
-        raise Exception(f"Failed to load transcription model: {e}")
+# Whisper models are loaded on first use and kept resident within WHISPER_RSS_BUDGET_MB,
+# instead of loading (and freeing) tiny.en on every request. Set the budget to fit
+# Render's 512MB limit; tiny.en stays the default and is never evicted
+BACKUP_MODEL_NAME = os.getenv("WHISPER_MODEL_NAME", "tiny.en")
+whisper_models = WhisperModelRegistry(pinned=BACKUP_MODEL_NAME)
+
+def transcribe_with_model(model_size: str, audio_path: str) -> dict:
+    """Transcribe with a resident model, loading it first if needed"""
+    with whisper_models.use(model_size) as engine:
+        return engine.transcribe(audio_path)
 
 def analyze_comedy_with_gemini(transcription_text):
     """Analyze comedy content using Gemini AI"""
@@ -250,7 +240,7 @@ async def api_status():
     return {"message": "Comedy Transcription API", "status": "running"}
 
 @app.post("/api/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(file: UploadFile = File(...), model_size: str = Form(BACKUP_MODEL_NAME)):
     logger.info("Transcribe endpoint accessed")
     if not file:
         logger.error("No file uploaded")
@@ -266,20 +256,16 @@ async def transcribe_audio(file: UploadFile = File(...)):
                 detail="Invalid file type. Please upload an audio file (MP3, WAV, M4A, FLAC, OGG, WEBM)"
             )
     
+    if model_size not in whisper_models.allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model size '{model_size}'. Available: {', '.join(whisper_models.allowed)}"
+        )
+    
     temp_path = None
     try:
         logger.info(f"Processing file: {file.filename}")
         
-        # Load model just-in-time to minimize memory usage
-        try:
-            whisper_model = load_model_for_transcription()
-        except Exception as model_error:
-            logger.error(f"Model loading failed: {model_error}")
-            raise HTTPException(
-                status_code=503, 
-                detail="Transcription service temporarily unavailable. Please try again in a few minutes."
-            )
-        
         # Save uploaded file to temporary location
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
             content = await file.read()
@@ -291,27 +277,28 @@ async def transcribe_audio(file: UploadFile = File(...)):
         
         logger.info(f"File saved to {temp_path}, starting transcription...")
         
-        # Transcribe the audio file with timeout and memory management
+        # Transcribe off the event loop with the resident model
         try:
             # Log memory usage before transcription
             memory_mb = psutil.Process().memory_info().rss / 1024 / 1024
             logger.info(f"Memory usage before transcription: {memory_mb:.1f}MB")
             
-            # Set a reasonable timeout for transcription
-            result = whisper_model.transcribe(temp_path)
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, transcribe_with_model, model_size, temp_path
+            )
             logger.info("Transcription completed successfully")
             
-            # Immediately free model memory after transcription
-            del whisper_model
-            gc.collect()
-            
             memory_mb = psutil.Process().memory_info().rss / 1024 / 1024
-            logger.info(f"Memory usage after cleanup: {memory_mb:.1f}MB")
+            logger.info(f"Memory usage after transcription: {memory_mb:.1f}MB")
             
+        except ModelMemoryError as memory_error:
+            logger.error(f"No room to load Whisper {model_size}: {memory_error}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"Not enough memory to load the {model_size} model right now. Please try a smaller model or retry shortly."
+            )
         except Exception as transcribe_error:
             logger.error(f"Whisper transcription failed: {transcribe_error}")
-            # Clean up memory on error
-            gc.collect()
             raise HTTPException(
                 status_code=500, 
                 detail=f"Audio processing failed. Please try with a shorter audio file or different format."
@@ -321,6 +308,7 @@ async def transcribe_audio(file: UploadFile = File(...)):
             "filename": file.filename,
             "transcription": result["text"],
             "language": result.get("language", "unknown"),
+            "model": model_size,
             "success": True
         }
         
@@ -346,27 +334,32 @@ async def health_check():
     return {
         "status": "healthy",
         "memory_optimized": True,
-        "model_type": "tiny.en (load-per-request)"
+        "model_type": f"{BACKUP_MODEL_NAME} (resident)",
+        "models": whisper_models.status()
     }
 
 @app.post("/api/preload-model")
-async def preload_model():
-    """Test model loading (no persistent preload in memory-optimized mode)"""
-    logger.info("Model preload endpoint accessed - testing model loading capability")
+async def preload_model(model_size: str = Form(BACKUP_MODEL_NAME)):
+    """Load a model ahead of the first request; it stays resident within the memory budget"""
+    logger.info(f"Model preload endpoint accessed - loading {model_size}")
     try:
-        # Test load and immediately free
-        test_model = load_model_for_transcription()
-        del test_model
-        gc.collect()
+        def load():
+            with whisper_models.use(model_size):
+                pass
+        
+        await asyncio.get_running_loop().run_in_executor(None, load)
         
         return {
-            "message": "Model loading test successful (memory-optimized mode)",
-            "model_type": "tiny.en",
-            "memory_optimized": True
+            "message": "Model loaded and resident",
+            "model_type": model_size,
+            "memory_optimized": True,
+            "models": whisper_models.status()
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Model loading test failed: {e}")
+        logger.error(f"Model loading failed: {e}")
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to test model loading: {str(e)}"
+            status_code=503 if isinstance(e, ModelMemoryError) else 500,
+            detail=f"Failed to load model: {str(e)}"
         )
\ No newline at end of file